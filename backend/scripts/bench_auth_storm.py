@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк входа под нагрузкой: шторм параллельных /v1/auth/login и задержки обычного эндпойнта на запущенном API
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+def pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+async def login_worker(client, args, stop, stats):
+    body = {"email": args.email, "password": args.password}
+    while not stop.is_set():
+        t = time.perf_counter()
+        try:
+            r = await client.post("/v1/auth/login", json=body)
+            code = r.status_code
+        except httpx.HTTPError:
+            code = "error"
+        stats["login_ms"].append((time.perf_counter() - t) * 1000)
+        stats["codes"][code] = stats["codes"].get(code, 0) + 1
+
+async def probe_worker(client, args, stop, stats):
+    while not stop.is_set():
+        t = time.perf_counter()
+        try:
+            await client.get(args.probe_path)
+        except httpx.HTTPError:
+            pass
+        stats["probe_ms"].append((time.perf_counter() - t) * 1000)
+        await asyncio.sleep(args.probe_interval)
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0, limits=limits) as client:
+        baseline = {"probe_ms": []}
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_worker(client, args, stop, baseline))
+        await asyncio.sleep(min(5.0, args.duration / 3))
+        stop.set()
+        await probe
+
+        stats = {"login_ms": [], "probe_ms": [], "codes": {}}
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(login_worker(client, args, stop, stats)) for _ in range(args.concurrency)]
+        tasks.append(asyncio.create_task(probe_worker(client, args, stop, stats)))
+        t0 = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    ok = stats["codes"].get(200, 0)
+    print(f"logins: {sum(stats['codes'].values())} in {elapsed:.1f}s, ok={ok} ({ok / elapsed:.1f}/s), codes={stats['codes']}")
+    print(f"login latency: p50={pct(stats['login_ms'], 0.5):.0f}ms p99={pct(stats['login_ms'], 0.99):.0f}ms")
+    print(f"{args.probe_path} idle:  p50={pct(baseline['probe_ms'], 0.5):.1f}ms p99={pct(baseline['probe_ms'], 0.99):.1f}ms n={len(baseline['probe_ms'])}")
+    print(f"{args.probe_path} storm: p50={pct(stats['probe_ms'], 0.5):.1f}ms p99={pct(stats['probe_ms'], 0.99):.1f}ms n={len(stats['probe_ms'])}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--email", required=True)
+    ap.add_argument("--password", required=True)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--probe-path", default="/health")
+    ap.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк времени импорта сервисных модулей: каждый модуль импортируется в чистом процессе, Qdrant указывает на недоступный адрес
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "src.services.vector.qdrant_service",
+    "src.api.construct",
+    "src.main",
+]
+
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - t0)
+"""
+
+def import_time(module: str, env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", PROBE, module], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else f"import {module} failed")
+    return float(out.stdout.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--qdrant-url", default="http://10.255.255.1:6333", help="недоступный адрес: импорт не должен его ждать")
+    ap.add_argument("modules", nargs="*", default=MODULES)
+    args = ap.parse_args()
+
+    env = dict(os.environ, QDRANT_URL=args.qdrant_url, PYTHONDONTWRITEBYTECODE="1")
+    for module in args.modules:
+        try:
+            times = [import_time(module, env) for _ in range(args.runs)]
+        except Exception as e:
+            print(f"{module}: failed ({e})")
+            continue
+        print(f"{module}: median {statistics.median(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms over {args.runs} runs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк потоковой загрузки документов: синтетический корпус заданного размера, пропускная способность и пиковая память
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.workers.ingestion import ingest_stream
+
+WORDS = [
+    "линейные", "квадратные", "уравнения", "неравенства", "функции", "логарифмы", "производная", "интеграл",
+    "системы", "дроби", "проценты", "вероятность", "статистика", "геометрия", "треугольники", "окружность",
+    "equation", "function", "derivative", "integral", "vector", "matrix", "limit", "sequence",
+]
+
+class SyntheticCorpus:
+    def __init__(self, size_mb: int, seed: int = 1):
+        self.left = size_mb * 1024 * 1024
+        self.total = self.left
+        self.rnd = random.Random(seed)
+
+    def read(self, n: int = -1) -> bytes:
+        if self.left <= 0:
+            return b""
+        n = self.left if n < 0 else min(n, self.left)
+        words = []
+        size = 0
+        while size < n:
+            w = self.rnd.choice(WORDS)
+            words.append(w)
+            size += len(w.encode("utf-8")) + 1
+        data = " ".join(words).encode("utf-8")
+        data = data[:n].rsplit(b" ", 1)[0] + b" " if len(data) > n else data + b" "
+        self.left -= len(data)
+        return data
+
+class NullSink:
+    def __init__(self):
+        self.points = 0
+
+    def get_collections(self):
+        from types import SimpleNamespace
+        return SimpleNamespace(collections=[SimpleNamespace(name="kb_chunks")])
+
+    def create_collection(self, *a, **k):
+        pass
+
+    def upsert(self, collection_name, points):
+        self.points += len(points)
+
+    def delete(self, collection_name, points_selector):
+        pass
+
+def peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024 if sys.platform != "darwin" else kb / 1024 / 1024
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=500)
+    ap.add_argument("--batch-size", type=int, default=256)
+    ap.add_argument("--max-inflight", type=int, default=2)
+    ap.add_argument("--sink", choices=["null", "qdrant"], default="null")
+    ap.add_argument("--collection", default="kb_chunks_bench")
+    args = ap.parse_args()
+
+    corpus = SyntheticCorpus(args.size_mb)
+    client = NullSink() if args.sink == "null" else None
+    rss0 = peak_rss_mb()
+    t0 = time.perf_counter()
+    res = ingest_stream("bench", "bench-doc", corpus, collection=args.collection, batch_size=args.batch_size, max_inflight=args.max_inflight, client=client)
+    elapsed = time.perf_counter() - t0
+    mb = corpus.total / 1024 / 1024
+    print(f"ingested {mb:.0f} MB in {elapsed:.1f}s: {mb / elapsed:.1f} MB/s, chunks={res['chunks']} ({res['chunks'] / elapsed:.0f}/s), upserted={res['upserted']}")
+    print(f"peak RSS: {peak_rss_mb():.0f} MB (before ingestion {rss0:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк встроенного векторного индекса: построение и поиск в режимах полного перебора и графа NSW
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.vector.base import VectorPoint
+from src.services.vector.local_index import LocalVectorIndex
+
+def run(vecs, queries, graph_min: int, top_k: int):
+    idx = LocalVectorIndex(path=tempfile.mkdtemp(prefix="kb_vectors_bench_"), collection="bench", dim=vecs.shape[1], graph_min=graph_min)
+    t0 = time.perf_counter()
+    for i in range(0, len(vecs), 1000):
+        idx.upsert([VectorPoint(f"c{j}", vecs[j].tolist(), {}) for j in range(i, min(i + 1000, len(vecs)))])
+    build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    found = [{i for i, _ in idx.search(q.tolist(), top_k=top_k)} for q in queries]
+    search_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    mode = idx.health()["mode"]
+    idx.close()
+    return mode, build, search_ms, found
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--clusters", type=int, default=100, help="эмбеддинги концептов кластеризуются по темам; 0 - равномерный шум")
+    args = ap.parse_args()
+
+    rnd = np.random.default_rng(1)
+    if args.clusters:
+        centers = rnd.normal(size=(args.clusters, args.dim))
+        vecs = (centers[rnd.integers(0, args.clusters, args.n)] + 0.5 * rnd.normal(size=(args.n, args.dim))).astype(np.float32)
+        queries = (centers[rnd.integers(0, args.clusters, args.queries)] + 0.5 * rnd.normal(size=(args.queries, args.dim))).astype(np.float32)
+    else:
+        vecs = rnd.normal(size=(args.n, args.dim)).astype(np.float32)
+        queries = rnd.normal(size=(args.queries, args.dim)).astype(np.float32)
+    _, _, _, truth = run(vecs, queries, graph_min=args.n + 1, top_k=args.top_k)
+    for graph_min in (args.n + 1, 1):
+        mode, build, search_ms, found = run(vecs, queries, graph_min=graph_min, top_k=args.top_k)
+        recall = sum(len(a & b) for a, b in zip(truth, found)) / (args.top_k * len(queries))
+        print(f"{mode}: n={args.n} dim={args.dim} build {build:.1f}s, search {search_ms:.3f} ms/query, recall@{args.top_k} {recall:.3f}")
+
+if __name__ == "__main__":
+    main()
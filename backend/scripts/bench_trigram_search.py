@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк триграммного индекса названий: построение и нечёткий поиск на синтетическом наборе
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.kb.jsonl_io import _translit_en
+from src.services.search.trigram import TrigramIndex
+
+WORDS = [
+    "линейные", "квадратные", "уравнения", "неравенства", "функции", "логарифмы", "производная", "интеграл",
+    "системы", "дроби", "проценты", "вероятность", "статистика", "геометрия", "треугольники", "окружность",
+    "векторы", "матрицы", "пределы", "последовательности", "прогрессии", "степени", "корни", "тригонометрия",
+    "синус", "косинус", "площадь", "объём", "графики", "модуль", "числа", "множества", "комбинаторика",
+]
+SYLLABLES = ["ка", "ли", "не", "ра", "то", "му", "ве", "со", "при", "ме", "за", "ро", "ни", "ло", "ст", "ва", "ге", "пе", "ди", "ор"]
+LABELS = ["Topic", "Skill", "Method", "Example", "Section"]
+
+def make_vocab(size: int, rnd: random.Random):
+    vocab = set(WORDS)
+    while len(vocab) < size:
+        vocab.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 5))))
+    return sorted(vocab)
+
+def make_entries(n: int, rnd: random.Random, vocab):
+    return [
+        {"uid": f"E-{i}", "type": rnd.choice(LABELS), "title": " ".join(rnd.sample(vocab, rnd.randint(2, 4)))}
+        for i in range(n)
+    ]
+
+def typo(s: str, rnd: random.Random) -> str:
+    if len(s) < 4:
+        return s
+    i = rnd.randrange(1, len(s) - 1)
+    return s[:i] + s[i + 1:]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entities", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=2_000)
+    ap.add_argument("--vocab", type=int, default=5_000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+    vocab = make_vocab(args.vocab, rnd)
+    entries = make_entries(args.entities, rnd, vocab)
+    t0 = time.perf_counter()
+    idx = TrigramIndex(entries)
+    print(f"build: {args.entities} entities in {time.perf_counter() - t0:.2f}s")
+    queries = []
+    for _ in range(args.queries):
+        q = rnd.choice(entries)["title"] if rnd.random() < 0.5 else " ".join(rnd.sample(vocab, rnd.randint(1, 2)))
+        r = rnd.random()
+        if r < 0.3:
+            q = _translit_en(q)
+        elif r < 0.6:
+            q = typo(q, rnd)
+        queries.append(q)
+    for q in queries[:50]:
+        idx.search(q)
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        idx.search(q, limit=20)
+        lat.append((time.perf_counter() - t) * 1000)
+    lat.sort()
+    pct = lambda p: lat[min(len(lat) - 1, int(len(lat) * p))]
+    print(f"search: n={len(lat)} p50={pct(0.5):.2f}ms p95={pct(0.95):.2f}ms p99={pct(0.99):.2f}ms max={lat[-1]:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Применение версионированных миграций Postgres (запускается при деплое до старта реплик API)
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.migrations import CODE_SCHEMA_VERSION, MIGRATIONS, check_and_gatekeep, migrate
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", type=int, default=CODE_SCHEMA_VERSION)
+    ap.add_argument("--list", action="store_true")
+    args = ap.parse_args()
+    if args.list:
+        for m in MIGRATIONS:
+            print(f"{m.version:>4}  {m.name}")
+        return
+    res = migrate(target=args.target)
+    print(f"applied: {res['applied'] or 'none'}; schema version: {res['version']}")
+    if args.target >= CODE_SCHEMA_VERSION and not check_and_gatekeep():
+        sys.exit("schema version gate failed")
+
+if __name__ == "__main__":
+    main()
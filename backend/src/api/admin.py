@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, Header, Security
 from fastapi.security import HTTPBearer
-from typing import Dict
+from pydantic import BaseModel
+from typing import Dict, List, Optional
 from src.services.graph.neo4j_repo import purge_user_artifacts
 from src.api.deps import require_admin
+from src.db.pg import outbox_list_dead, outbox_replay_dead
+from src.db.pool import pg_async
 
 router = APIRouter(prefix="/v1/admin", dependencies=[Depends(require_admin), Security(HTTPBearer())], tags=["Админка"])
 
@@ -17,3 +20,38 @@ async def purge_users(x_tenant_id: str = Header(..., alias="X-Tenant-ID")) -> Di
       - deleted_completed_rels: количество удаленных связей COMPLETED
     """
     return purge_user_artifacts()
+
+@router.get("/outbox/dead", summary="Недоставленные события", description="Возвращает события Outbox, исчерпавшие попытки публикации и перенесенные в dead-letter.")
+async def list_dead_events(event_type: Optional[str] = None, tenant_id: Optional[str] = None, limit: int = 100) -> Dict:
+    """
+    Принимает:
+      - event_type: фильтр по типу события (опционально)
+      - tenant_id: фильтр по арендатору (опционально)
+      - limit: максимальное количество записей
+
+    Возвращает:
+      - items: список {event_id, tenant_id, event_type, attempts, last_error, created_at, dead_at}
+    """
+    return {"items": await pg_async(outbox_list_dead, event_type, tenant_id, limit)}
+
+class ReplayDeadInput(BaseModel):
+    event_ids: Optional[List[str]] = None
+    event_type: Optional[str] = None
+    tenant_id: Optional[str] = None
+    limit: int = 1000
+
+@router.post("/outbox/dead/replay", summary="Повторить недоставленные события", description="Возвращает события из dead-letter в Outbox со сброшенным счетчиком попыток.")
+async def replay_dead_events(payload: ReplayDeadInput) -> Dict:
+    """
+    Принимает:
+      - event_ids: список идентификаторов событий (опционально)
+      - event_type: фильтр по типу события (опционально)
+      - tenant_id: фильтр по арендатору (опционально)
+      - limit: максимальное количество событий за вызов
+
+    Возвращает:
+      - ok: True
+      - replayed: количество событий, возвращенных в Outbox
+    """
+    n = await pg_async(outbox_replay_dead, payload.event_ids, payload.event_type, payload.tenant_id, payload.limit)
+    return {"ok": True, "replayed": n}
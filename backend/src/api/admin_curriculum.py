@@ -4,6 +4,7 @@ from pydantic import BaseModel
 from typing import Dict, List
 from src.services.curriculum.repo import create_curriculum, add_curriculum_nodes, get_graph_view
 from src.api.deps import require_admin
+from src.db.pool import pg_async
 
 router = APIRouter(prefix="/v1/admin", dependencies=[Depends(require_admin), Security(HTTPBearer())], tags=["Админка: учебные планы"])
 
@@ -27,7 +28,7 @@ async def admin_create_curriculum(payload: CreateCurriculumInput, x_tenant_id: s
       - id: идентификатор созданного плана (при успехе)
       - error: текст ошибки (если Postgres не настроен)
     """
-    return create_curriculum(payload.code, payload.title, payload.standard, payload.language)
+    return await pg_async(create_curriculum, payload.code, payload.title, payload.standard, payload.language)
 
 class CurriculumNodeInput(BaseModel):
     code: str
@@ -44,7 +45,7 @@ async def admin_add_curriculum_nodes(payload: CurriculumNodeInput, x_tenant_id:
       - ok: True/False
       - error: текст ошибки (если план не найден или Postgres не настроен)
     """
-    return add_curriculum_nodes(payload.code, payload.nodes)
+    return await pg_async(add_curriculum_nodes, payload.code, payload.nodes)
 
 @router.get("/curriculum/graph_view", summary="Просмотр плана", description="Возвращает состав учебного плана в виде списка узлов.")
 async def admin_curriculum_graph_view(code: str) -> Dict:
@@ -57,4 +58,4 @@ async def admin_curriculum_graph_view(code: str) -> Dict:
       - nodes: список узлов {kind, canonical_uid, order_index} при успехе
       - error: текст ошибки
     """
-    return get_graph_view(code)
+    return await pg_async(get_graph_view, code)
@@ -26,10 +26,12 @@ async def generate_subject(payload: GenerateSubjectInput) -> Dict:
       - subject_uid: UID предмета
       - subject_title: название предмета
       - language: язык генерации
-      - параметры глубины генерации: sections_seed, topics_per_section, skills_per_topic, methods_per_skill, examples_per_topic, concurrency
+      - параметры глубины генерации: sections_seed, topics_per_section, skills_per_topic, methods_per_skill, examples_per_topic
+      - concurrency: общий лимит одновременных запросов к LLM на все стадии генерации
 
     Возвращает:
-      - объект результата генерации (асинхронные результаты по шагам)
+      - объект результата генерации: ok (false, если хотя бы один элемент не сгенерирован), sections, topics, records,
+        stages (счетчики queued/done/failed по стадиям) и failed (стадии со сбоями)
     """
     res = await generate_subject_openai_async(
         payload.subject_uid,
@@ -51,7 +53,7 @@ async def generate_subject_import(payload: GenerateSubjectInput) -> Dict:
       - те же поля, что и generate_subject
 
     Возвращает:
-      - generated: результат генерации
+      - generated: результат генерации (если ok=false, импорт и пересчеты не выполняются)
       - sync: статистика импорта
       - weights: результаты пересчета весов
       - metrics: метрики анализа знаний
@@ -67,6 +69,9 @@ async def generate_subject_import(payload: GenerateSubjectInput) -> Dict:
         examples_per_topic=payload.examples_per_topic,
         concurrency=payload.concurrency,
     )
+    if not gen.get("ok"):
+        # неполный результат генерации в граф не импортируется
+        return {"generated": gen}
     stats = sync_from_jsonl()
     weights = compute_static_weights()
     metrics = analyze_knowledge()
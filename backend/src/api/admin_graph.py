@@ -97,11 +97,11 @@ async def create_node(payload: NodeCreateInput, x_tenant_id: str = Header(..., a
 
     repo = Neo4jRepo()
     try:
-        exists = repo.read("MATCH (n {uid:$uid}) RETURN count(n) AS c", {"uid": payload.uid})
+        exists = repo.read("MATCH (n:Entity {uid:$uid}) RETURN count(n) AS c", {"uid": payload.uid})
         if exists and int(exists[0].get("c") or 0) > 0:
             raise HTTPException(status_code=409, detail="node uid already exists")
 
-        label_str = ":".join(labels)
+        label_str = ":".join([l for l in labels if l != "Entity"] + ["Entity"])
         query = f"CREATE (n:{label_str} {{uid:$uid}}) SET n += $props RETURN n.uid AS uid"
         rows = repo.read(query, {"uid": payload.uid, "props": props})
         return {"uid": rows[0]["uid"] if rows else payload.uid}
@@ -122,7 +122,7 @@ async def get_node(uid: str) -> Dict:
     """
     repo = Neo4jRepo()
     try:
-        rows = repo.read("MATCH (n {uid:$uid}) RETURN labels(n) AS labels, properties(n) AS props", {"uid": uid})
+        rows = repo.read("MATCH (n:Entity {uid:$uid}) RETURN labels(n) AS labels, properties(n) AS props", {"uid": uid})
         if not rows:
             raise HTTPException(status_code=404, detail="node not found")
         props = rows[0].get("props") or {}
@@ -148,16 +148,16 @@ async def patch_node(uid: str, payload: NodePatchInput, x_tenant_id: str = Heade
 
     repo = Neo4jRepo()
     try:
-        rows = repo.read("MATCH (n {uid:$uid}) RETURN count(n) AS c", {"uid": uid})
+        rows = repo.read("MATCH (n:Entity {uid:$uid}) RETURN count(n) AS c", {"uid": uid})
         if not rows or int(rows[0].get("c") or 0) == 0:
             raise HTTPException(status_code=404, detail="node not found")
 
         set_props = _validate_props(payload.set)
-        repo.write("MATCH (n {uid:$uid}) SET n += $set", {"uid": uid, "set": set_props})
+        repo.write("MATCH (n:Entity {uid:$uid}) SET n += $set", {"uid": uid, "set": set_props})
         for k in payload.unset:
             if k == "uid":
                 continue
-            repo.write(f"MATCH (n {{uid:$uid}}) REMOVE n.{k}", {"uid": uid})
+            repo.write(f"MATCH (n:Entity {{uid:$uid}}) REMOVE n.{k}", {"uid": uid})
         return {"ok": True}
     finally:
         repo.close()
@@ -175,19 +175,19 @@ async def delete_node(uid: str, detach: bool = False, x_tenant_id: str = Header(
     """
     repo = Neo4jRepo()
     try:
-        rows = repo.read("MATCH (n {uid:$uid}) RETURN count(n) AS c", {"uid": uid})
+        rows = repo.read("MATCH (n:Entity {uid:$uid}) RETURN count(n) AS c", {"uid": uid})
         if not rows or int(rows[0].get("c") or 0) == 0:
             raise HTTPException(status_code=404, detail="node not found")
 
         if detach:
-            repo.write("MATCH (n {uid:$uid}) DETACH DELETE n", {"uid": uid})
+            repo.write("MATCH (n:Entity {uid:$uid}) DETACH DELETE n", {"uid": uid})
             return {"ok": True}
 
-        rels = repo.read("MATCH (n {uid:$uid})-[r]-() RETURN count(r) AS c", {"uid": uid})
+        rels = repo.read("MATCH (n:Entity {uid:$uid})-[r]-() RETURN count(r) AS c", {"uid": uid})
         if rels and int(rels[0].get("c") or 0) > 0:
             raise HTTPException(status_code=409, detail="node has relationships; use detach=true")
 
-        repo.write("MATCH (n {uid:$uid}) DELETE n", {"uid": uid})
+        repo.write("MATCH (n:Entity {uid:$uid}) DELETE n", {"uid": uid})
         return {"ok": True}
     finally:
         repo.close()
@@ -215,7 +215,7 @@ async def create_edge(payload: EdgeCreateInput, x_tenant_id: str = Header(..., a
     repo = Neo4jRepo()
     try:
         ok = repo.read(
-            "MATCH (a {uid:$from}), (b {uid:$to}) RETURN count(a) AS ca, count(b) AS cb",
+            "MATCH (a:Entity {uid:$from}), (b:Entity {uid:$to}) RETURN count(a) AS ca, count(b) AS cb",
             {"from": payload.from_uid, "to": payload.to_uid},
         )
         if not ok or int(ok[0].get("ca") or 0) == 0 or int(ok[0].get("cb") or 0) == 0:
@@ -232,7 +232,7 @@ async def create_edge(payload: EdgeCreateInput, x_tenant_id: str = Header(..., a
             raise HTTPException(status_code=409, detail="edge uid already exists")
 
         query = (
-            f"MATCH (a {{uid:$from}}), (b {{uid:$to}}) "
+            f"MATCH (a:Entity {{uid:$from}}), (b:Entity {{uid:$to}}) "
             f"CREATE (a)-[r:{rel_type} {{uid:$edge_uid}}]->(b) "
             f"SET r += $props "
             f"RETURN r.uid AS uid"
@@ -293,12 +293,12 @@ async def list_edges(from_uid: str, to_uid: str, type: Optional[str] = None) ->
         if type:
             rel_type = _validate_edge_type(type)
             query = (
-                f"MATCH (a {{uid:$from}})-[r:{rel_type}]->(b {{uid:$to}}) "
+                f"MATCH (a:Entity {{uid:$from}})-[r:{rel_type}]->(b:Entity {{uid:$to}}) "
                 f"RETURN r.uid AS edge_uid, properties(r) AS props"
             )
         else:
             query = (
-                "MATCH (a {uid:$from})-[r]->(b {uid:$to}) "
+                "MATCH (a:Entity {uid:$from})-[r]->(b:Entity {uid:$to}) "
                 "RETURN r.uid AS edge_uid, type(r) AS type, properties(r) AS props"
             )
 
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Literal
-from src.config.settings import settings
 from src.services.graph.neo4j_repo import relation_context, neighbors
 from src.services.roadmap_planner import plan_route
 from src.api.analytics import stats as analytics_stats
 from src.services.questions import select_examples_for_topics, all_topic_uids_from_examples
-from src.api.common import ApiError
+from src.api.common import ApiError, llm_http_error, sse_answer, wants_stream
+from src.core.context import get_tenant_id
+from src.services.llm.answer_cache import cached_answer, streamed_answer
+from src.services.llm.gateway import chat as llm_chat, stream as llm_stream
 
 router = APIRouter(prefix="/v1/assistant", tags=["ИИ ассистент"])
 
@@ -66,12 +68,19 @@ class AssistantChatInput(BaseModel):
         503: {"model": ApiError, "description": "Сервис LLM недоступен"},
     }
 )
-async def chat(payload: AssistantChatInput) -> Dict:
+async def chat(
+    payload: AssistantChatInput,
+    request: Request,
+    response: Response,
+    stream: bool = Query(False, description="Потоковая выдача ответа LLM (SSE) для explain_relation и свободного диалога; то же, что Accept: text/event-stream."),
+):
     """
     Принимает:
       - action: одно из [explain_relation, viewport, roadmap, analytics, questions] или None для свободного ответа
       - message: текст вопроса
       - context-поля: from_uid/to_uid/center_uid/depth/subject_uid/progress и параметры генерации
+      - заголовок Cache-Control: no-cache/no-store отключает кэш ответов explain_relation
+      - stream=true или Accept: text/event-stream: ответ LLM потоком SSE (остальные action отвечают JSON)
 
     Возвращает:
       - В зависимости от action:
@@ -81,27 +90,36 @@ async def chat(payload: AssistantChatInput) -> Dict:
         - analytics: метрики графа
         - questions: {questions}
       - Свободный ответ: {answer, usage}
+      - В режиме SSE: события delta {text} и итоговое done {answer, usage[, context]}; error при сбое LLM
     """
+    streaming = wants_stream(request, stream)
     if payload.action == "explain_relation":
         if not payload.from_uid or not payload.to_uid:
             raise HTTPException(status_code=400, detail="from_uid/to_uid required")
         ctx = relation_context(payload.from_uid, payload.to_uid)
+        tenant_id = get_tenant_id()
+        messages = [
+            {"role": "system", "content": "Ты эксперт по графу. Объясни, почему существует связь, используя метаданные."},
+            {
+                "role": "user",
+                "content": f"Вопрос: {payload.message}\nОт: {ctx.get('from_title','')} ({payload.from_uid})\nК: {ctx.get('to_title','')} ({payload.to_uid})\nСвязь: {ctx.get('rel','')}\nСвойства: {ctx.get('props',{})}",
+            },
+        ]
+
+        if streaming:
+            items, hit = await streamed_answer(tenant_id, "gpt-4o-mini", messages, lambda: llm_stream(messages, model="gpt-4o-mini", tenant_id=tenant_id), cache_control=request.headers.get("cache-control"))
+            return await sse_answer(items, context=ctx, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+        async def ask() -> Dict:
+            resp = await llm_chat(messages, model="gpt-4o-mini", tenant_id=tenant_id)
+            return {"answer": resp["content"], "usage": resp["usage"]}
+
         try:
-            from openai import AsyncOpenAI
-            oai = AsyncOpenAI(api_key=settings.openai_api_key.get_secret_value())
-            messages = [
-                {"role": "system", "content": "Ты эксперт по графу. Объясни, почему существует связь, используя метаданные."},
-                {
-                    "role": "user",
-                    "content": f"Вопрос: {payload.message}\nОт: {ctx.get('from_title','')} ({payload.from_uid})\nК: {ctx.get('to_title','')} ({payload.to_uid})\nСвязь: {ctx.get('rel','')}\nСвойства: {ctx.get('props',{})}",
-                },
-            ]
-            resp = await oai.chat.completions.create(model="gpt-4o-mini", messages=messages)
-            answer = resp.choices[0].message.content if resp.choices else ""
-            usage = resp.usage or None
-            return {"answer": answer, "usage": (usage.model_dump() if hasattr(usage, "model_dump") else None), "context": ctx}
-        except Exception:
-            raise HTTPException(status_code=502, detail="LLM request failed")
+            res, hit = await cached_answer(tenant_id, "gpt-4o-mini", messages, ask, cache_control=request.headers.get("cache-control"))
+        except Exception as e:
+            raise llm_http_error(e)
+        response.headers["X-Cache"] = "HIT" if hit else "MISS"
+        return {**res, "context": ctx}
 
     if payload.action == "viewport":
         if not payload.center_uid:
@@ -128,16 +146,14 @@ async def chat(payload: AssistantChatInput) -> Dict:
         )
         return {"questions": examples}
 
+    messages = [
+        {"role": "system", "content": "Ты ассистент платформы KnowledgeBase: помогаешь с графом, планом обучения и вопросами."},
+        {"role": "user", "content": payload.message},
+    ]
+    if streaming:
+        return await sse_answer(llm_stream(messages, model="gpt-4o-mini", tenant_id=get_tenant_id()))
     try:
-        from openai import AsyncOpenAI
-        oai = AsyncOpenAI(api_key=settings.openai_api_key.get_secret_value())
-        messages = [
-            {"role": "system", "content": "Ты ассистент платформы KnowledgeBase: помогаешь с графом, планом обучения и вопросами."},
-            {"role": "user", "content": payload.message},
-        ]
-        resp = await oai.chat.completions.create(model="gpt-4o-mini", messages=messages)
-        answer = resp.choices[0].message.content if resp.choices else ""
-        usage = resp.usage or None
-        return {"answer": answer, "usage": (usage.model_dump() if hasattr(usage, "model_dump") else None)}
-    except Exception:
-        raise HTTPException(status_code=502, detail="LLM request failed")
+        resp = await llm_chat(messages, model="gpt-4o-mini", tenant_id=get_tenant_id())
+    except Exception as e:
+        raise llm_http_error(e)
+    return {"answer": resp["content"], "usage": resp["usage"]}
@@ -3,7 +3,8 @@ import psycopg2
 from pydantic import BaseModel
 
 from src.services.auth.jwt_tokens import create_access_token, create_refresh_token, decode_token
-from src.services.auth.passwords import hash_password, verify_password
+from src.db.pool import pg_async
+from src.services.auth.passwords import PasswordHasherBusy, hash_password_async, verify_password_async
 from src.services.auth.users_repo import create_user, get_user_by_email, get_user_by_id
 from pydantic import BaseModel
 
@@ -63,6 +64,9 @@ class MeResponse(BaseModel):
         }
     }
 
+def _auth_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="authentication is busy, retry later", headers={"Retry-After": "1"})
+
 def _bearer_token(authorization: str | None) -> str | None:
     if not authorization:
         return None
@@ -75,7 +79,7 @@ def _bearer_token(authorization: str | None) -> str | None:
 
 
 @router.post("/register", summary="Регистрация", description="Создает пользователя и возвращает его идентификатор и email.", response_model=RegisterResponse)
-def register(payload: RegisterPayload):
+async def register(payload: RegisterPayload):
     """
     Принимает:
       - email: почта пользователя
@@ -87,20 +91,24 @@ def register(payload: RegisterPayload):
       - email: почта пользователя
     """
     try:
-        existing = get_user_by_email(payload.email)
+        existing = await pg_async(get_user_by_email, payload.email)
     except RuntimeError:
         raise HTTPException(status_code=503, detail="postgres not configured")
     if existing is not None:
         raise HTTPException(status_code=409, detail="user already exists")
     try:
-        user = create_user(email=payload.email, password_hash=hash_password(payload.password), role="user")
+        password_hash = await hash_password_async(payload.password)
+    except PasswordHasherBusy:
+        raise _auth_busy()
+    try:
+        user = await pg_async(create_user, email=payload.email, password_hash=password_hash, role="user")
     except psycopg2.Error:
         raise HTTPException(status_code=500, detail="db error")
     return {"ok": True, "id": user.id, "email": user.email}
 
 
 @router.post("/login", summary="Вход", description="Проверяет учетные данные и возвращает пару токенов (access/refresh).", response_model=LoginResponse)
-def login(payload: LoginPayload):
+async def login(payload: LoginPayload):
     """
     Принимает:
       - email: почта пользователя
@@ -112,14 +120,18 @@ def login(payload: LoginPayload):
       - token_type: 'bearer'
     """
     try:
-        user = get_user_by_email(payload.email)
+        user = await pg_async(get_user_by_email, payload.email)
     except RuntimeError:
         raise HTTPException(status_code=503, detail="postgres not configured")
     if user is None:
         raise HTTPException(status_code=401, detail="invalid credentials")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="user disabled")
-    if not verify_password(payload.password, user.password_hash):
+    try:
+        ok = await verify_password_async(payload.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise _auth_busy()
+    if not ok:
         raise HTTPException(status_code=401, detail="invalid credentials")
     return {
         "access_token": create_access_token(user_id=user.id, role=user.role),
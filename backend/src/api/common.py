@@ -1,5 +1,8 @@
+import json
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 
 class ApiError(BaseModel):
     code: str = Field(..., description="Код ошибки, пригодный для автоматической обработки (например, 'invalid_parameters', 'not_found', 'internal_error').")
@@ -23,3 +26,52 @@ class ApiError(BaseModel):
             ]
         }
     }
+
+def llm_http_error(e: Exception) -> HTTPException:
+    from src.services.llm.gateway import LLMError, LLMUnavailable
+    if not isinstance(e, LLMError):
+        return HTTPException(status_code=502, detail="OpenAI request failed")
+    if e.status in (401, 403):
+        return HTTPException(status_code=503, detail="OpenAI authentication failed (invalid API key)")
+    if e.status == 429:
+        return HTTPException(status_code=503, detail="OpenAI rate limit exceeded")
+    if isinstance(e, LLMUnavailable) and e.status is None:
+        return HTTPException(status_code=503, detail="OpenAI is unreachable or not configured")
+    if e.status and e.status >= 500:
+        return HTTPException(status_code=503, detail="OpenAI service error")
+    return HTTPException(status_code=502, detail="OpenAI request failed")
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    return stream or "text/event-stream" in request.headers.get("accept", "").lower()
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def sse_answer(items: AsyncIterator[Dict], context: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    # первый фрагмент ждем до отправки заголовков: ошибки LLM до начала генерации остаются обычными 502/503
+    try:
+        first = await anext(items, None)
+    except Exception as e:
+        await items.aclose()  # type: ignore
+        raise llm_http_error(e)
+
+    async def body():
+        item = first
+        try:
+            while item is not None:
+                if item.get("done"):
+                    final: Dict[str, Any] = {"answer": item.get("content", ""), "usage": item.get("usage")}
+                    if context is not None:
+                        final["context"] = context
+                    yield sse_event("done", final)
+                else:
+                    yield sse_event("delta", {"text": item["delta"]})
+                item = await anext(items, None)
+        except Exception as e:
+            err = llm_http_error(e)
+            yield sse_event("error", {"code": "llm_error", "message": err.detail})
+        finally:
+            # при отключении клиента Starlette отменяет эту корутину; закрытие генератора отменяет запрос к LLM
+            await items.aclose()  # type: ignore
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})})
@@ -2,7 +2,9 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Dict, List
 import uuid
+import numpy as np
 from pydantic import Field
+from src.core.canonical import canonical_hash_from_text, hash_sha256
 
 router = APIRouter(prefix="/v1/construct")
 
@@ -16,6 +18,30 @@ class ProposeInput(BaseModel):
     text: str = Field(..., min_length=20)
     language: str = "ru"
 
+# порог косинусной близости, начиная с которого концепт считается дубликатом существующего
+MERGE_SIMILARITY = 0.92
+
+def _concept_uid(topic_uid: str, title: str) -> str:
+    # 64 бита хэша: при 100k корзин разные концепты одной темы сливались бы в один узел уже на сотнях названий
+    return f"CN-{topic_uid}-{hash_sha256(canonical_hash_from_text(title.casefold()))[:16]}"
+
+def _dedupe_in_batch(titles: List[str], embeddings: List[List[float]] | None) -> List[int | None]:
+    # для каждого концепта - индекс более раннего концепта той же пачки, в который он сливается
+    keys = [canonical_hash_from_text(t.casefold()) for t in titles]
+    sims = None
+    if embeddings:
+        m = np.asarray(embeddings, dtype=np.float32)
+        m /= np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+        sims = m @ m.T
+    owner: List[int | None] = []
+    kept: List[int] = []
+    for i, key in enumerate(keys):
+        dup = next((j for j in kept if keys[j] == key or (sims is not None and sims[i, j] >= MERGE_SIMILARITY)), None)
+        owner.append(dup)
+        if dup is None:
+            kept.append(i)
+    return owner
+
 @router.post("/magic_fill")
 async def magic_fill(payload: MagicFillInput) -> Dict:
     try:
@@ -23,25 +49,40 @@ async def magic_fill(payload: MagicFillInput) -> Dict:
     except Exception:
         return {"ok": False, "error": "ai engine not available"}
     bundle = await generate_concepts_and_skills(payload.topic_title, payload.language)
+    concepts = bundle.concepts
+    if not concepts:
+        return {"ok": True, "results": []}
+    texts = [c.title + " " + c.definition for c in concepts]
+    embeddings: List[List[float]] | None = None
+    sims: List[List] = [[] for _ in concepts]
+    try:
+        from src.services.vector.qdrant_service import embed_texts, query_similar_many
+        embeddings = await embed_texts(texts)
+        sims = await query_similar_many(embeddings, top_k=3)
+    except Exception:
+        pass
+    owners = _dedupe_in_batch([c.title for c in concepts], embeddings)
+    uids: List[str | None] = [None] * len(concepts)
     created: List[Dict] = []
-    for c in bundle.concepts:
+    fresh = []
+    for i, c in enumerate(concepts):
+        if sims[i] and sims[i][0][1] >= MERGE_SIMILARITY:
+            created.append({"merged_into": sims[i][0][0], "title": c.title})
+            uids[i] = sims[i][0][0]
+        elif owners[i] is not None:
+            uids[i] = uids[owners[i]]
+            created.append({"merged_into": uids[i], "title": c.title})
+        else:
+            uids[i] = _concept_uid(payload.topic_uid, c.title)
+            created.append({"created": uids[i], "title": c.title})
+            if embeddings:
+                fresh.append((uids[i], c.title, c.definition, embeddings[i]))
+    if fresh:
         try:
-            from src.services.vector.qdrant_service import embed_text, query_similar, upsert_concept
-            emb = await embed_text(c.title + " " + c.definition)
-            sims = query_similar(emb, top_k=3)
+            from src.services.vector.qdrant_service import upsert_concepts
+            await upsert_concepts(fresh)
         except Exception:
-            sims = []
-        if sims and sims[0][1] >= 0.92:
-            created.append({"merged_into": sims[0][0], "title": c.title})
-        else:
-            uid = f"CN-{payload.topic_uid}-{abs(hash(c.title))%100000}"
-            try:
-                from src.services.vector.qdrant_service import upsert_concept
-                emb = emb if 'emb' in locals() else []
-                await upsert_concept(uid, c.title, c.definition, emb)
-            except Exception:
-                pass
-            created.append({"created": uid, "title": c.title})
+            pass
     return {"ok": True, "results": created}
 
 @router.post("/magic_fill/queue")
@@ -1,7 +1,7 @@
-from fastapi import Header, HTTPException
+from fastapi import Header, HTTPException, Request
 
-from src.services.auth.jwt_tokens import decode_token
-from src.services.auth.users_repo import get_user_by_id
+from src.core.context import bearer_claims
+from src.services.auth.principal_cache import get_cached_user
 
 
 def _bearer_token(authorization: str | None) -> str | None:
@@ -15,30 +15,31 @@ def _bearer_token(authorization: str | None) -> str | None:
     return parts[1].strip() or None
 
 
-def get_current_user(authorization: str | None = Header(default=None)):
+def get_current_user(request: Request, authorization: str | None = Header(default=None)):
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
     token = _bearer_token(authorization)
     if not token:
         raise HTTPException(status_code=401, detail="missing token")
-    try:
-        data = decode_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="invalid token")
-    if data.get("type") != "access":
+    data = bearer_claims(request)
+    if not data or data.get("type") != "access":
         raise HTTPException(status_code=401, detail="invalid token")
     try:
         user_id = int(data.get("sub"))
     except Exception:
         raise HTTPException(status_code=401, detail="invalid token")
-    user = get_user_by_id(user_id)
+    user = get_cached_user(user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="invalid token")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="user disabled")
+    request.state.user = user
     return user
 
 
-def require_admin(authorization: str | None = Header(default=None)):
-    user = get_current_user(authorization)
+def require_admin(request: Request, authorization: str | None = Header(default=None)):
+    user = get_current_user(request, authorization)
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="forbidden")
     return user
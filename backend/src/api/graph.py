@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
 from src.services.graph.neo4j_repo import relation_context, neighbors, get_node_details
-from src.config.settings import settings
 from src.services.roadmap_planner import plan_route
 from src.services.questions import select_examples_for_topics, all_topic_uids_from_examples
-from src.api.common import ApiError
+from src.api.common import ApiError, llm_http_error, sse_answer, wants_stream
+from src.core.context import get_tenant_id
+from src.services.search.title_search import search_entities, autocomplete
+from src.services.search.trigram import fuzzy_search
+from src.services.llm.answer_cache import cached_answer, streamed_answer
+from src.services.llm.gateway import chat as llm_chat, stream as llm_stream
 
 router = APIRouter(prefix="/v1/graph", tags=["Интеграция с LMS"])
 
@@ -43,12 +47,93 @@ class ViewportResponse(BaseModel):
     }
 
 @router.get("/node/{uid}")
-async def get_node(uid: str) -> Dict:
-    data = get_node_details(uid)
+async def get_node(uid: str, limit_per_rel: int = Query(50, ge=0, le=500, description="Максимум соседей на каждый тип связи.")) -> Dict:
+    """
+    Принимает:
+      - uid: UID узла
+      - limit_per_rel: максимальное число соседей в списке для каждого типа связи
+
+    Возвращает:
+      - свойства узла, labels и kind
+      - incoming/outgoing: плоские списки {rel, uid, title, kind} (не более limit_per_rel на тип связи)
+      - incoming_groups/outgoing_groups: списки {rel, count, items}, сгруппированные по типу связи
+      - incoming_count/outgoing_count: полное число входящих/исходящих связей
+    """
+    data = get_node_details(uid, limit_per_rel=limit_per_rel)
     if not data:
         raise HTTPException(status_code=404, detail="Node not found")
     return data
 
+class SearchItem(BaseModel):
+    uid: str
+    type: Optional[str] = None
+    title: Optional[str] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    items: List[SearchItem]
+    source: str
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "items": [{"uid": "TOP-LINEINYE-URAVNENIYA-5cf38f", "type": "Topic", "title": "Линейные уравнения", "score": 3.12}],
+                    "source": "neo4j",
+                }
+            ]
+        }
+    }
+
+@router.get(
+    "/search",
+    summary="Поиск узлов по названию",
+    description="Ранжированный полнотекстовый или нечёткий триграммный поиск по названиям узлов с фильтром по типам и учётом арендатора.",
+    response_model=SearchResponse,
+)
+async def search(
+    q: str = Query(..., min_length=1, description="Поисковая строка."),
+    labels: Optional[List[str]] = Query(None, description="Фильтр по типам узлов (Topic, Skill, ...)."),
+    limit: int = Query(20, ge=1, le=100, description="Максимальное число результатов."),
+    fuzzy: bool = Query(False, description="Нечёткий поиск по триграммам с учётом транслитерации (кириллица/латиница)."),
+) -> Dict:
+    """
+    Принимает:
+      - q: поисковая строка (на кириллице или в латинской транслитерации)
+      - labels: список типов узлов для фильтрации (по умолчанию все)
+      - limit: максимальное число результатов
+      - fuzzy: использовать нечёткий триграммный индекс вместо полнотекстового
+
+    Возвращает:
+      - items: список объектов {uid, type, title, score}, отсортированный по релевантности
+      - source: источник результатов (neo4j — полнотекстовый индекс, kb — локальный индекс, trigram — триграммный индекс)
+    """
+    if fuzzy:
+        return fuzzy_search(q, labels=labels, tenant_id=get_tenant_id(), limit=limit)
+    return search_entities(q, labels=labels, tenant_id=get_tenant_id(), limit=limit)
+
+@router.get(
+    "/autocomplete",
+    summary="Автодополнение названий",
+    description="Префиксный поиск по названиям узлов для подсказок при вводе.",
+    response_model=SearchResponse,
+)
+async def autocomplete_titles(
+    q: str = Query(..., min_length=1, description="Введённый префикс."),
+    labels: Optional[List[str]] = Query(None, description="Фильтр по типам узлов."),
+    limit: int = Query(10, ge=1, le=50, description="Максимальное число подсказок."),
+) -> Dict:
+    """
+    Принимает:
+      - q: введённый префикс (последнее слово дополняется)
+      - labels: список типов узлов для фильтрации
+      - limit: максимальное число подсказок
+
+    Возвращает:
+      - items: список объектов {uid, type, title, score}
+      - source: источник результатов (neo4j или kb)
+    """
+    return autocomplete(q, labels=labels, tenant_id=get_tenant_id(), limit=limit)
+
 @router.get("/viewport")
 async def viewport(center_uid: str, depth: int = 1) -> Dict:
     """
@@ -108,50 +193,48 @@ class ChatResponse(BaseModel):
         503: {"model": ApiError, "description": "Сервис LLM недоступен"},
     },
 )
-async def chat(payload: ChatInput) -> Dict:
+async def chat(
+    payload: ChatInput,
+    request: Request,
+    response: Response,
+    stream: bool = Query(False, description="Потоковая выдача ответа (SSE); то же, что заголовок Accept: text/event-stream."),
+):
     """
     Принимает:
       - question: текст вопроса о связи
       - from_uid: UID исходного узла
       - to_uid: UID целевого узла
+      - заголовок Cache-Control: no-cache (не брать ответ из кэша) или no-store (не использовать кэш)
+      - stream=true или Accept: text/event-stream: ответ потоком SSE
 
     Возвращает:
-      - answer: текстовое объяснение от LLM
+      - answer: текстовое объяснение от LLM (из кэша, если граф не менялся; заголовок X-Cache: HIT/MISS)
       - usage: метаданные использования токенов модели (если доступны)
       - context: метаданные связи {rel, props, from_title, to_title}
+      - в режиме SSE: события delta {text} по мере генерации и итоговое done {answer, usage, context}; error при сбое LLM
     """
-    try:
-        from openai import AsyncOpenAI
-        from openai import APIConnectionError, APIStatusError, AuthenticationError, RateLimitError
-    except Exception:
-        raise HTTPException(status_code=503, detail="OpenAI client is not available")
-
     ctx = relation_context(payload.from_uid, payload.to_uid)
-    oai = AsyncOpenAI(api_key=settings.openai_api_key.get_secret_value())
+    tenant_id = get_tenant_id()
     messages = [
         {"role": "system", "content": "You are a graph expert. Explain why the relationship exists using provided metadata."},
         {"role": "user", "content": f"Q: {payload.question}\nFrom: {ctx.get('from_title','')} ({payload.from_uid})\nTo: {ctx.get('to_title','')} ({payload.to_uid})\nRelation: {ctx.get('rel','')}\nProps: {ctx.get('props',{})}"},
     ]
 
+    if wants_stream(request, stream):
+        items, hit = await streamed_answer(tenant_id, "gpt-4o-mini", messages, lambda: llm_stream(messages, model="gpt-4o-mini", tenant_id=tenant_id), cache_control=request.headers.get("cache-control"))
+        return await sse_answer(items, context=ctx, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+    async def ask() -> Dict:
+        resp = await llm_chat(messages, model="gpt-4o-mini", tenant_id=tenant_id)
+        return {"answer": resp["content"], "usage": resp["usage"]}
+
     try:
-        resp = await oai.chat.completions.create(model="gpt-4o-mini", messages=messages)
-    except AuthenticationError:
-        raise HTTPException(status_code=503, detail="OpenAI authentication failed (invalid API key)")
-    except RateLimitError:
-        raise HTTPException(status_code=503, detail="OpenAI rate limit exceeded")
-    except APIConnectionError:
-        raise HTTPException(status_code=503, detail="OpenAI is unreachable")
-    except APIStatusError as e:
-        status = getattr(e, "status_code", None)
-        if status and 500 <= int(status) < 600:
-            raise HTTPException(status_code=503, detail="OpenAI service error")
-        raise HTTPException(status_code=502, detail="OpenAI request failed")
-    except Exception:
-        raise HTTPException(status_code=502, detail="OpenAI request failed")
-
-    usage = resp.usage or None
-    answer = resp.choices[0].message.content if resp.choices else ""
-    return {"answer": answer, "usage": (usage.model_dump() if hasattr(usage, 'model_dump') else None), "context": ctx}
+        res, hit = await cached_answer(tenant_id, "gpt-4o-mini", messages, ask, cache_control=request.headers.get("cache-control"))
+    except Exception as e:
+        raise llm_http_error(e)
+
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return {**res, "context": ctx}
 
 class RoadmapInput(BaseModel):
     subject_uid: Optional[str] = Field(None, description="UID предмета (например, 'MATH-EGE'). Если None — поиск глобально (не рекомендуется).")
@@ -1,7 +1,20 @@
 import strawberry
+from strawberry.extensions import ParserCache, ValidationCache
 from strawberry.fastapi import GraphQLRouter
-from typing import Optional, List
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from strawberry.types import Info
+from typing import Annotated, Dict, Optional, List
 from src.services.graph.neo4j_repo import get_driver
+from src.services.graph.batch_loaders import GraphLoaders
+from src.services.graph.graphql_cost import QueryCostLimiter
+from src.services.graph.persisted_queries import (
+    PersistedQueryMismatch,
+    PersistedQueryNotFound,
+    PersistedResultCache,
+    registry as persisted_queries,
+    resolve_persisted_query,
+)
 from src.services.curriculum.repo import get_graph_view
 import os
 import json
@@ -113,88 +126,83 @@ class Example:
     title: str
     statement: str
     difficulty: float
+
+def _norm_difficulty(x) -> float:
+    try:
+        xf = float(x)
+    except Exception:
+        return 0.6
+    return xf if xf <= 1.0 else max(0.0, min(1.0, xf / 5.0))
+
+def _examples(rows: List[Dict], fallback_key: str, fallback_match) -> List[Example]:
+    if rows:
+        return [Example(uid=r.get('uid') or '', title=r.get('title') or '', statement=r.get('statement') or '', difficulty=_norm_difficulty(r.get('difficulty', 3))) for r in rows]
+    ex_json = [e for e in _load_jsonl('examples.jsonl') if fallback_match(e, fallback_key)]
+    return [Example(uid=e.get('uid',''), title=e.get('title',''), statement=e.get('statement',''), difficulty=float(e.get('difficulty', 3))) for e in ex_json]
+
+def _loaders(info: Info) -> GraphLoaders:
+    return info.context["loaders"]
+
 @strawberry.type
 class ErrorNode:
     uid: str
     title: str
-    triggers: List[Node]
-    examples: List[Example]
+
+    @strawberry.field
+    async def triggers(self, info: Info) -> List[Node]:
+        rows = await _loaders(info).error_triggers.load(self.uid)
+        return [Node(uid=r["uid"], title=r["title"], type="skill") for r in rows]
+
+    @strawberry.field
+    async def examples(self, info: Info) -> List[Example]:
+        rows = await _loaders(info).error_examples.load(self.uid)
+        return _examples(rows, self.uid, lambda e, k: k in (e.get('error_uids') or []))
 
 @strawberry.type
 class TopicDetails:
     uid: str
     title: str
-    prereqs: List[Node]
-    goals: List[Goal]
-    objectives: List[Objective]
-    methods: List[Node]
-    examples: List[Example]
-    errors: List[Node]
-
-def _topic_details(uid: str) -> TopicDetails:
-    drv = get_driver()
-    t_title = ""
-    prereqs: List[Node] = []
-    goals: List[Goal] = []
-    objectives: List[Objective] = []
-    methods: List[Node] = []
-    with drv.session() as s:
-        row = s.run("MATCH (t:Topic {uid:$u}) RETURN t.title AS title", {"u": uid}).single()
-        t_title = (row["title"] if row else "") or ""
-        pr = s.run("MATCH (t:Topic {uid:$u})-[:PREREQ]->(p:Topic) RETURN p.uid AS uid, p.title AS title", {"u": uid})
-        prereqs = [Node(uid=r["uid"], title=r["title"], type="topic") for r in pr]
-        tg = s.run("MATCH (t:Topic {uid:$u})-[:TARGETS]->(g:Goal) RETURN g.uid AS uid, g.title AS title", {"u": uid})
-        goals = [Goal(uid=r["uid"], title=r["title"]) for r in tg]
-        obj = s.run("MATCH (t:Topic {uid:$u})-[:TARGETS]->(o:Objective) RETURN o.uid AS uid, o.title AS title", {"u": uid})
-        objectives = [Objective(uid=r["uid"], title=r["title"]) for r in obj]
-        ms = s.run("MATCH (t:Topic {uid:$u})-[:USES_SKILL]->(sk:Skill)-[:LINKED]->(m:Method) RETURN DISTINCT m.uid AS uid, m.title AS title", {"u": uid})
-        methods = [Node(uid=r["uid"], title=r["title"], type="method") for r in ms]
-        ex_rows = s.run("MATCH (t:Topic {uid:$u})-[:HAS_QUESTION]->(q) RETURN q.uid AS uid, q.title AS title, q.statement AS statement, q.difficulty AS difficulty", {"u": uid}).data()
-    if not ex_rows:
-        ex_json = [e for e in _load_jsonl('examples.jsonl') if e.get('topic_uid') == uid]
-        examples = [Example(uid=e.get('uid',''), title=e.get('title',''), statement=e.get('statement',''), difficulty=float(e.get('difficulty', 3))) for e in ex_json]
-    else:
-        def _norm(x):
-            try:
-                xf = float(x)
-            except Exception:
-                return 0.6
-            return xf if xf <= 1.0 else max(0.0, min(1.0, xf / 5.0))
-        examples = [Example(uid=r.get('uid',''), title=r.get('title',''), statement=r.get('statement',''), difficulty=_norm(r.get('difficulty', 3))) for r in ex_rows]
-    errors = []
-    with drv.session() as s2:
-        err_rows = s2.run(
-            "MATCH (t:Topic {uid:$u})-[:USES_SKILL]->(sk:Skill)<-[:TRIGGERS]-(e:Error) RETURN DISTINCT e.uid AS uid, e.title AS title",
-            {"u": uid}
-        )
-        errors = [Node(uid=r["uid"], title=r["title"], type="error") for r in err_rows]
-    drv.close()
-    return TopicDetails(uid=uid, title=t_title, prereqs=prereqs, goals=goals, objectives=objectives, methods=methods, examples=examples, errors=errors)
 
-def _error_details(uid: str) -> ErrorNode:
-    drv = get_driver()
-    title = ""
-    triggers: List[Node] = []
-    examples: List[Example] = []
-    with drv.session() as s:
-        row = s.run("MATCH (e:Error {uid:$u}) RETURN e.title AS title", {"u": uid}).single()
-        title = (row["title"] if row else "") or ""
-        trs = s.run("MATCH (e:Error {uid:$u})-[:TRIGGERS]->(sk:Skill) RETURN sk.uid AS uid, sk.title AS title", {"u": uid})
-        triggers = [Node(uid=r["uid"], title=r["title"], type="skill") for r in trs]
-        exq = s.run("MATCH (e:Error {uid:$u})-[:ILLUSTRATED_BY]->(q) RETURN q.uid AS uid, q.title AS title, q.statement AS statement, q.difficulty AS difficulty", {"u": uid}).data()
-    if not exq:
-        ex_json = [e for e in _load_jsonl('examples.jsonl') if uid in (e.get('error_uids') or [])]
-        examples = [Example(uid=e.get('uid',''), title=e.get('title',''), statement=e.get('statement',''), difficulty=float(e.get('difficulty', 3))) for e in ex_json]
-    else:
-        def _norm(x):
-            try:
-                xf = float(x)
-            except Exception:
-                return 0.6
-            return xf if xf <= 1.0 else max(0.0, min(1.0, xf / 5.0))
-        examples = [Example(uid=r.get('uid',''), title=r.get('title',''), statement=r.get('statement',''), difficulty=_norm(r.get('difficulty', 3))) for r in exq]
-    drv.close()
-    return ErrorNode(uid=uid, title=title, triggers=triggers, examples=examples)
+    @strawberry.field
+    async def prereqs(self, info: Info) -> List[Node]:
+        rows = await _loaders(info).topic_prereqs.load(self.uid)
+        return [Node(uid=r["uid"], title=r["title"], type="topic") for r in rows]
+
+    @strawberry.field
+    async def goals(self, info: Info) -> List[Goal]:
+        rows = await _loaders(info).topic_targets.load(self.uid)
+        return [Goal(uid=r["uid"], title=r["title"]) for r in rows if not r.get("objective")]
+
+    @strawberry.field
+    async def objectives(self, info: Info) -> List[Objective]:
+        rows = await _loaders(info).topic_targets.load(self.uid)
+        return [Objective(uid=r["uid"], title=r["title"]) for r in rows if r.get("objective")]
+
+    @strawberry.field
+    async def methods(self, info: Info) -> List[Node]:
+        rows = await _loaders(info).topic_methods.load(self.uid)
+        return [Node(uid=r["uid"], title=r["title"], type="method") for r in rows]
+
+    @strawberry.field
+    async def examples(self, info: Info) -> List[Example]:
+        rows = await _loaders(info).topic_examples.load(self.uid)
+        return _examples(rows, self.uid, lambda e, k: e.get('topic_uid') == k)
+
+    @strawberry.field
+    async def errors(self, info: Info) -> List[Node]:
+        rows = await _loaders(info).topic_errors.load(self.uid)
+        return [Node(uid=r["uid"], title=r["title"], type="error") for r in rows]
+
+async def _error_nodes(loaders: GraphLoaders, rows: List[Dict]) -> List[ErrorNode]:
+    out: List[ErrorNode] = []
+    seen = set()
+    for r in rows:
+        if r["uid"] in seen:
+            continue
+        seen.add(r["uid"])
+        loaders.errors.prime(r["uid"], {"key": r["uid"], "title": r["title"]})
+        out.append(ErrorNode(uid=r["uid"], title=r["title"] or ""))
+    return out
 
 @strawberry.type
 class Query:
@@ -202,38 +210,63 @@ class Query:
     def graph(self, subject_uid: Optional[str] = None) -> GraphView:
         return _graph_from_subject(subject_uid)
 
+    @strawberry.field
     def curriculum(self, code: str) -> Curriculum:
         res = get_graph_view(code)
         nodes = [CurriculumNode(kind=n["kind"], canonical_uid=n["canonical_uid"], order_index=int(n["order_index"])) for n in res.get("nodes", [])]
         return Curriculum(code=code, nodes=nodes)
-    def topic(self, uid: str) -> TopicDetails:
-        return _topic_details(uid)
-    def error(self, uid: str) -> ErrorNode:
-        return _error_details(uid)
-    def errorsBySkill(self, skill_uid: str) -> List[ErrorNode]:
-        drv = get_driver()
-        out: List[ErrorNode] = []
-        with drv.session() as s:
-            rows = s.run("MATCH (e:Error)-[:TRIGGERS]->(sk:Skill {uid:$u}) RETURN e.uid AS uid", {"u": skill_uid}).data()
-            for r in rows:
-                out.append(_error_details(r["uid"]))
-        drv.close()
-        return out
-    def errorsByTopic(self, topic_uid: str) -> List[ErrorNode]:
-        drv = get_driver()
-        out: List[ErrorNode] = []
-        with drv.session() as s:
-            rows = s.run(
-                "MATCH (t:Topic {uid:$u})-[:USES_SKILL]->(sk:Skill)<-[:TRIGGERS]-(e:Error) RETURN DISTINCT e.uid AS uid",
-                {"u": topic_uid}
-            ).data()
-            for r in rows:
-                out.append(_error_details(r["uid"]))
-        drv.close()
-        return out
-    def examplesByError(self, error_uid: str) -> List[Example]:
-        e = _error_details(error_uid)
-        return e.examples
-
-schema = strawberry.Schema(Query)
-router = GraphQLRouter(schema)
+
+    @strawberry.field
+    async def topic(self, info: Info, uid: str) -> TopicDetails:
+        row = await _loaders(info).topics.load(uid)
+        return TopicDetails(uid=uid, title=((row or {}).get("title") or ""))
+
+    @strawberry.field
+    async def error(self, info: Info, uid: str) -> ErrorNode:
+        row = await _loaders(info).errors.load(uid)
+        return ErrorNode(uid=uid, title=((row or {}).get("title") or ""))
+
+    @strawberry.field
+    async def errorsBySkill(self, info: Info, skill_uid: Annotated[str, strawberry.argument(name="skill_uid")]) -> List[ErrorNode]:
+        loaders = _loaders(info)
+        return await _error_nodes(loaders, await loaders.skill_errors.load(skill_uid))
+
+    @strawberry.field
+    async def errorsByTopic(self, info: Info, topic_uid: Annotated[str, strawberry.argument(name="topic_uid")]) -> List[ErrorNode]:
+        loaders = _loaders(info)
+        return await _error_nodes(loaders, await loaders.topic_errors.load(topic_uid))
+
+    @strawberry.field
+    async def examplesByError(self, info: Info, error_uid: Annotated[str, strawberry.argument(name="error_uid")]) -> List[Example]:
+        rows = await _loaders(info).error_examples.load(error_uid)
+        return _examples(rows, error_uid, lambda e, k: k in (e.get('error_uids') or []))
+
+async def get_context():
+    loaders = GraphLoaders()
+    try:
+        yield {"loaders": loaders}
+    finally:
+        loaders.close()
+
+class PersistedQueryRouter(GraphQLRouter):
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        data = await super().parse_http_body(request)
+        extensions = None
+        if "application/json" in (request.content_type or ""):
+            body = self.parse_json(await request.get_body())
+            extensions = body.get("extensions") if isinstance(body, dict) else None
+        elif request.method == "GET" and request.query_params.get("extensions"):
+            extensions = json.loads(request.query_params["extensions"])
+        try:
+            data.query = resolve_persisted_query(persisted_queries, data.query, extensions)
+        except PersistedQueryNotFound as e:
+            raise HTTPException(404, str(e))
+        except PersistedQueryMismatch as e:
+            raise HTTPException(400, str(e))
+        return data
+
+schema = strawberry.Schema(
+    Query,
+    extensions=[ParserCache(maxsize=512), ValidationCache(maxsize=512), PersistedResultCache, QueryCostLimiter],
+)
+router = PersistedQueryRouter(schema, context_getter=get_context)
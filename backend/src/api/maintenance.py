@@ -4,6 +4,7 @@ from typing import Dict, Optional
 from pydantic import BaseModel
 from src.services.jobs.rebuild import start_rebuild_async, get_job_status
 from src.services.graph.utils import recompute_relationship_weights
+from src.workers.entity_backfill import run_once as run_entity_backfill
 from src.workers.integrity_async import process_once
 from src.workers.outbox_publisher import process_once as outbox_publish_once
 
@@ -233,6 +234,22 @@ async def recompute_links(x_tenant_id: str = Header(..., alias="X-Tenant-ID")) -
     stats = recompute_relationship_weights()
     return {"ok": True, "stats": stats}
 
+@router.post("/graph/backfill_entity_label", summary="Миграция метки Entity", description="Порциями проставляет общую метку :Entity существующим узлам графа, продолжая с сохраненного курсора, и создает индексы (uid) и (tenant_id, uid).", response_model=Dict[str, Dict])
+async def graph_backfill_entity_label(batch_size: int = 5000, max_batches: Optional[int] = None, x_tenant_id: str = Header(..., alias="X-Tenant-ID")) -> Dict:
+    """
+    Принимает:
+      - batch_size: размер порции узлов на одну транзакцию
+      - max_batches: ограничение числа порций за один запуск (None — до конца)
+
+    Возвращает:
+      - ok: True
+      - stats: {scanned, batches, done, pending}; busy=True, если проход уже ведет другой процесс
+    """
+    if batch_size < 1 or batch_size > 100000:
+        raise HTTPException(status_code=400, detail="batch_size must be in 1..100000")
+    stats = run_entity_backfill(batch_size=batch_size, max_batches=max_batches)
+    return {"ok": True, "stats": stats}
+
 @router.post("/proposals/run_integrity_async", summary="Асинхронная проверка целостности заявок", description="Запускает проверку заявок на целостность в фоне.", response_model=ProcessedResponse)
 async def run_integrity_async(limit: int = 20, x_tenant_id: str = Header(..., alias="X-Tenant-ID")) -> Dict:
     """
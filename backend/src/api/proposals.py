@@ -3,7 +3,8 @@ from fastapi.security import HTTPBearer
 from typing import Dict, Optional
 from pydantic import BaseModel, Field
 from src.schemas.proposal import Proposal, Operation, ProposalStatus
-from src.db.pg import get_conn, ensure_tables
+from src.db.pg import insert_proposal
+from src.db.pool import pg_async
 from src.services.proposal_service import create_draft_proposal
 from src.core.context import get_tenant_id
 from src.workers.commit import commit_proposal
@@ -51,24 +52,16 @@ async def create_proposal(payload: Dict, tenant_id: str = Depends(require_tenant
     try:
         ops = [Operation.model_validate(o) for o in (payload.get("operations") or [])]
         base_graph_version = int(payload.get("base_graph_version") or 0)
-        ensure_tables()
         p = create_draft_proposal(tenant_id, base_graph_version, ops)
-        conn = get_conn()
-        conn.autocommit = True
-        import json
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO proposals (proposal_id, tenant_id, base_graph_version, proposal_checksum, status, operations_json) VALUES (%s,%s,%s,%s,%s,%s)",
-                (
-                    p.proposal_id,
-                    p.tenant_id,
-                    p.base_graph_version,
-                    p.proposal_checksum,
-                    ProposalStatus.DRAFT.value,
-                    json.dumps(p.model_dump()["operations"]),
-                ),
-            )
-        conn.close()
+        await pg_async(
+            insert_proposal,
+            p.proposal_id,
+            p.tenant_id,
+            p.base_graph_version,
+            p.proposal_checksum,
+            ProposalStatus.DRAFT.value,
+            p.model_dump()["operations"],
+        )
         return {"proposal_id": p.proposal_id, "proposal_checksum": p.proposal_checksum, "status": ProposalStatus.DRAFT.value}
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
@@ -113,7 +106,7 @@ async def get(proposal_id: str, tenant_id: str = Depends(require_tenant)) -> Dic
     Возвращает:
       - объект заявки из БД: {tenant_id, base_graph_version, status, operations_json}
     """
-    p = get_proposal(proposal_id)
+    p = await pg_async(get_proposal, proposal_id)
     if not p or p["tenant_id"] != tenant_id:
         raise HTTPException(status_code=404, detail="proposal not found")
     return p
@@ -134,7 +127,7 @@ async def list(status: str | None = None, limit: int = 20, offset: int = 0, tena
       - items: список заявок
       - limit, offset: параметры пагинации
     """
-    items = list_proposals(tenant_id, status, limit, offset)
+    items = await pg_async(list_proposals, tenant_id, status, limit, offset)
     return {"items": items, "limit": limit, "offset": offset}
 
 @router.post(
@@ -151,10 +144,10 @@ async def approve(proposal_id: str, tenant_id: str = Depends(require_tenant), x_
     Возвращает:
       - результат коммита (см. /commit): {ok, status, graph_version, ...}
     """
-    p = get_proposal(proposal_id)
+    p = await pg_async(get_proposal, proposal_id)
     if not p or p["tenant_id"] != tenant_id:
         raise HTTPException(status_code=404, detail="proposal not found")
-    set_proposal_status(proposal_id, ProposalStatus.APPROVED.value)
+    await pg_async(set_proposal_status, proposal_id, ProposalStatus.APPROVED.value)
     res = commit_proposal(proposal_id)
     if not res.get("ok"):
         status = res.get("status") or "FAILED"
@@ -176,10 +169,10 @@ async def reject(proposal_id: str, tenant_id: str = Depends(require_tenant), x_t
       - ok: True
       - status: REJECTED
     """
-    p = get_proposal(proposal_id)
+    p = await pg_async(get_proposal, proposal_id)
     if not p or p["tenant_id"] != tenant_id:
         raise HTTPException(status_code=404, detail="proposal not found")
-    set_proposal_status(proposal_id, ProposalStatus.REJECTED.value)
+    await pg_async(set_proposal_status, proposal_id, ProposalStatus.REJECTED.value)
     return {"ok": True, "status": ProposalStatus.REJECTED.value}
 
 @router.get(
@@ -195,7 +188,7 @@ async def diff(proposal_id: str, tenant_id: str = Depends(require_tenant)) -> Di
     Возвращает:
       - diff: объект различий (до/после) и фрагменты доказательств (evidence)
     """
-    p = get_proposal(proposal_id)
+    p = await pg_async(get_proposal, proposal_id)
     if not p or p["tenant_id"] != tenant_id:
         raise HTTPException(status_code=404, detail="proposal not found")
     return build_diff(proposal_id)
@@ -214,7 +207,7 @@ async def impact(proposal_id: str, depth: int = 1, tenant_id: str = Depends(requ
     Возвращает:
       - подграф влияния: узлы и связи, затрагиваемые предложенными изменениями
     """
-    p = get_proposal(proposal_id)
+    p = await pg_async(get_proposal, proposal_id)
     if not p or p["tenant_id"] != tenant_id:
         raise HTTPException(status_code=404, detail="proposal not found")
     return impact_subgraph_for_proposal(proposal_id, depth=depth)
@@ -12,6 +12,11 @@ class AppEnv(StrEnum):
     prod = "prod"
 
 
+class VectorBackend(StrEnum):
+    qdrant = "qdrant"
+    local = "local"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=(os.getenv("ENV_FILE", "../.env"), "../.env.dev", "../.env.stage", "../.env.prod"),
@@ -36,6 +41,10 @@ class Settings(BaseSettings):
     redis_url: AnyUrl = Field(default="redis://redis:6379/0", alias="REDIS_URL")
     qdrant_collection_name: str = Field(default="kb_entities", alias="QDRANT_COLLECTION")
     qdrant_default_vector_dim: int = Field(default=16, alias="QDRANT_DEFAULT_VECTOR_DIM")
+    qdrant_concepts_collection: str = Field(default="concepts", alias="QDRANT_CONCEPTS_COLLECTION")
+    qdrant_concepts_dim: int = Field(default=1536, alias="QDRANT_CONCEPTS_DIM")
+    vector_backend: VectorBackend = Field(default=VectorBackend.qdrant, alias="VECTOR_BACKEND")
+    vector_local_path: str = Field(default="", alias="VECTOR_LOCAL_PATH")
 
     prometheus_enabled: bool = Field(default=False, alias="PROMETHEUS_ENABLED")
 
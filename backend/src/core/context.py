@@ -1,8 +1,7 @@
 from contextvars import ContextVar
 from typing import Optional
-import jwt
 from fastapi import Request
-from src.config.settings import settings
+from src.services.auth.jwt_tokens import decode_token
 
 tenant_id_var: ContextVar[Optional[str]] = ContextVar("tenant_id", default=None)
 
@@ -12,18 +11,36 @@ def set_tenant_id(tenant_id: Optional[str]) -> None:
 def get_tenant_id() -> Optional[str]:
     return tenant_id_var.get()
 
+_UNSET = object()
+
+def bearer_token(request: Request) -> Optional[str]:
+    auth = request.headers.get("Authorization") or ""
+    if not auth.lower().startswith("bearer "):
+        return None
+    return auth.split(" ", 1)[1].strip() or None
+
+def bearer_claims(request: Request) -> Optional[dict]:
+    cached = getattr(request.state, "token_claims", _UNSET)
+    if cached is not _UNSET:
+        return cached
+    claims = None
+    token = bearer_token(request)
+    if token:
+        # decode_token отказывает при пустом JWT_SECRET_KEY: PyJWT принял бы токен, подписанный пустым ключом
+        try:
+            claims = decode_token(token)
+        except Exception:
+            claims = None
+    request.state.token_claims = claims
+    return claims
+
 def extract_tenant_id_from_request(request: Request) -> Optional[str]:
     h = request.headers.get("X-Tenant-ID")
     if h:
         return h.strip() or None
-    auth = request.headers.get("Authorization") or ""
-    if auth.lower().startswith("bearer "):
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            payload = jwt.decode(token, settings.jwt_secret_key.get_secret_value(), algorithms=["HS256"])
-            tid = payload.get("tenant_id") or payload.get("tid")
-            if isinstance(tid, str) and tid.strip():
-                return tid.strip()
-        except Exception:
-            return None
+    payload = bearer_claims(request)
+    if payload:
+        tid = payload.get("tenant_id") or payload.get("tid")
+        if isinstance(tid, str) and tid.strip():
+            return tid.strip()
     return None
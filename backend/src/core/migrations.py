@@ -1,6 +1,187 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.core.logging import logger
 from src.db.pg import ensure_schema_version, get_schema_version, get_tenant_schema_version
+from src.db.pool import pg_conn
 
-CODE_SCHEMA_VERSION = 1
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", (
+        """
+        CREATE TABLE IF NOT EXISTS proposals (
+          proposal_id TEXT PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          base_graph_version BIGINT NOT NULL,
+          proposal_checksum TEXT NOT NULL,
+          status TEXT NOT NULL,
+          operations_json JSONB NOT NULL,
+          created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_proposals_tenant_status ON proposals (tenant_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_proposals_created_at ON proposals (created_at DESC)",
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+          tx_id TEXT PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          proposal_id TEXT NOT NULL,
+          operations_applied JSONB NOT NULL,
+          revert_operations JSONB NOT NULL,
+          correlation_id TEXT DEFAULT '',
+          created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_proposal_id ON audit_log (proposal_id)",
+        """
+        CREATE TABLE IF NOT EXISTS tenant_graph_version (
+          tenant_id TEXT PRIMARY KEY,
+          graph_version BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS graph_changes (
+          tenant_id TEXT NOT NULL,
+          graph_version BIGINT NOT NULL,
+          target_id TEXT NOT NULL,
+          change_type TEXT NOT NULL DEFAULT '',
+          PRIMARY KEY (tenant_id, graph_version, target_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS events_outbox (
+          event_id TEXT PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          event_type TEXT NOT NULL,
+          payload JSONB NOT NULL,
+          published BOOLEAN NOT NULL DEFAULT FALSE,
+          attempts INTEGER NOT NULL DEFAULT 0,
+          last_error TEXT DEFAULT '',
+          created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        "ALTER TABLE audit_log ADD COLUMN IF NOT EXISTS correlation_id TEXT DEFAULT ''",
+        "ALTER TABLE proposals ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW()",
+        "ALTER TABLE events_outbox ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0",
+        "ALTER TABLE events_outbox ADD COLUMN IF NOT EXISTS last_error TEXT DEFAULT ''",
+        "ALTER TABLE graph_changes ADD COLUMN IF NOT EXISTS change_type TEXT DEFAULT ''",
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'user',
+            is_active BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+    )),
+    Migration(2, "outbox_backoff_dead_letter", (
+        "ALTER TABLE events_outbox ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW()",
+        "CREATE INDEX IF NOT EXISTS events_outbox_claim_idx ON events_outbox (next_attempt_at, created_at) WHERE published = FALSE",
+        """
+        CREATE TABLE IF NOT EXISTS events_outbox_dead (
+          event_id TEXT PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          event_type TEXT NOT NULL,
+          payload JSONB NOT NULL,
+          attempts INTEGER NOT NULL,
+          last_error TEXT DEFAULT '',
+          created_at TIMESTAMP,
+          dead_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS events_outbox_dead_type_idx ON events_outbox_dead (event_type, dead_at)",
+    )),
+    Migration(3, "document_chunk_manifest", (
+        """
+        CREATE TABLE IF NOT EXISTS document_chunks (
+          tenant_id TEXT NOT NULL,
+          doc_id TEXT NOT NULL,
+          chunk_id TEXT NOT NULL,
+          run_id TEXT NOT NULL,
+          created_at TIMESTAMP DEFAULT NOW(),
+          PRIMARY KEY (tenant_id, doc_id, chunk_id)
+        )
+        """,
+    )),
+    Migration(4, "entity_label_backfill_progress", (
+        """
+        CREATE TABLE IF NOT EXISTS entity_label_backfill (
+          label TEXT PRIMARY KEY,
+          last_uid TEXT NOT NULL DEFAULT '',
+          scanned BIGINT NOT NULL DEFAULT 0,
+          done BOOLEAN NOT NULL DEFAULT FALSE,
+          updated_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+    )),
+]
+
+CODE_SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# ключ pg_advisory_lock: несколько реплик при одновременном старте применяют миграции по очереди
+MIGRATION_LOCK_KEY = 0x4B42_0001
+
+_APPLIED_IN_PROCESS = 0
+
+def _bump_schema_version(cur, version: int) -> None:
+    cur.execute(
+        "INSERT INTO schema_version (id, version) VALUES (1, %s) "
+        "ON CONFLICT (id) DO UPDATE SET version=GREATEST(schema_version.version, EXCLUDED.version)",
+        (version,),
+    )
+    cur.execute(
+        "INSERT INTO schema_version_tenant (tenant_id, version) VALUES ('system', %s) "
+        "ON CONFLICT (tenant_id) DO UPDATE SET version=GREATEST(schema_version_tenant.version, EXCLUDED.version)",
+        (version,),
+    )
+
+def migrate(target: Optional[int] = None) -> Dict:
+    global _APPLIED_IN_PROCESS
+    target = CODE_SCHEMA_VERSION if target is None else target
+    if _APPLIED_IN_PROCESS >= target:
+        return {"applied": [], "version": _APPLIED_IN_PROCESS}
+    ensure_schema_version()
+    applied: List[int] = []
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW())"
+                )
+                cur.execute("SELECT version FROM schema_migrations")
+                done = {int(r[0]) for r in cur.fetchall()}
+            conn.autocommit = False
+            for m in MIGRATIONS:
+                if m.version in done or m.version > target:
+                    continue
+                try:
+                    with conn.cursor() as cur:
+                        for stmt in m.statements:
+                            cur.execute(stmt)
+                        cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (m.version, m.name))
+                        _bump_schema_version(cur, m.version)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error("schema_migration_failed", version=m.version, name=m.name)
+                    raise
+                applied.append(m.version)
+                logger.info("schema_migration_applied", version=m.version, name=m.name)
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    _APPLIED_IN_PROCESS = max(_APPLIED_IN_PROCESS, target)
+    return {"applied": applied, "version": target}
 
 def check_and_gatekeep(tenant_id: str | None = None) -> bool:
     ensure_schema_version()
@@ -1,6 +1,9 @@
+import json
+import uuid
 import psycopg2
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from src.config.settings import settings
+from src.db.pool import pg_conn, pg_tx
 
 def get_conn():
     dsn = str(settings.pg_dsn)
@@ -9,116 +12,32 @@ def get_conn():
     return psycopg2.connect(dsn)
 
 def ensure_tables():
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS proposals (
-              proposal_id TEXT PRIMARY KEY,
-              tenant_id TEXT NOT NULL,
-              base_graph_version BIGINT NOT NULL,
-              proposal_checksum TEXT NOT NULL,
-              status TEXT NOT NULL,
-              operations_json JSONB NOT NULL,
-              created_at TIMESTAMP DEFAULT NOW()
-            )
-            """
-        )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_proposals_tenant_status ON proposals (tenant_id, status)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_proposals_created_at ON proposals (created_at DESC)")
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS audit_log (
-              tx_id TEXT PRIMARY KEY,
-              tenant_id TEXT NOT NULL,
-              proposal_id TEXT NOT NULL,
-              operations_applied JSONB NOT NULL,
-              revert_operations JSONB NOT NULL,
-              correlation_id TEXT DEFAULT '',
-              created_at TIMESTAMP DEFAULT NOW()
-            )
-            """
-        )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_proposal_id ON audit_log (proposal_id)")
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tenant_graph_version (
-              tenant_id TEXT PRIMARY KEY,
-              graph_version BIGINT NOT NULL DEFAULT 0
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS graph_changes (
-              tenant_id TEXT NOT NULL,
-              graph_version BIGINT NOT NULL,
-              target_id TEXT NOT NULL,
-              change_type TEXT NOT NULL DEFAULT '',
-              PRIMARY KEY (tenant_id, graph_version, target_id)
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events_outbox (
-              event_id TEXT PRIMARY KEY,
-              tenant_id TEXT NOT NULL,
-              event_type TEXT NOT NULL,
-              payload JSONB NOT NULL,
-              published BOOLEAN NOT NULL DEFAULT FALSE,
-              attempts INTEGER NOT NULL DEFAULT 0,
-              last_error TEXT DEFAULT '',
-              created_at TIMESTAMP DEFAULT NOW()
-            )
-            """
-        )
-    conn.close()
-    try:
-        conn = get_conn()
-        conn.autocommit = True
-        with conn.cursor() as cur:
-            cur.execute("ALTER TABLE audit_log ADD COLUMN IF NOT EXISTS correlation_id TEXT DEFAULT ''")
-            cur.execute("ALTER TABLE proposals ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW()")
-            cur.execute("ALTER TABLE events_outbox ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0")
-            cur.execute("ALTER TABLE events_outbox ADD COLUMN IF NOT EXISTS last_error TEXT DEFAULT ''")
-            cur.execute("ALTER TABLE graph_changes ADD COLUMN IF NOT EXISTS change_type TEXT DEFAULT ''")
-        conn.close()
-    except Exception:
-        ...
+    # DDL живет в версионированных миграциях (src/core/migrations.py); оставлено для скриптов и тестов
+    from src.core.migrations import migrate
+    migrate()
 
 def get_graph_version(tenant_id: str) -> int:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT graph_version FROM tenant_graph_version WHERE tenant_id=%s", (tenant_id,))
         row = cur.fetchone()
-        conn.close()
-        return int(row[0]) if row else 0
+    return int(row[0]) if row else 0
 
 def set_graph_version(tenant_id: str, version: int) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute(
             "INSERT INTO tenant_graph_version (tenant_id, graph_version) VALUES (%s,%s) ON CONFLICT (tenant_id) DO UPDATE SET graph_version=EXCLUDED.graph_version",
             (tenant_id, version),
         )
-    conn.close()
 
 def add_graph_change(tenant_id: str, graph_version: int, target_id: str, change_type: str = "") -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute(
             "INSERT INTO graph_changes (tenant_id, graph_version, target_id, change_type) VALUES (%s,%s,%s,%s) ON CONFLICT DO NOTHING",
             (tenant_id, graph_version, target_id, change_type),
         )
-    conn.close()
 
 def get_changed_targets_since(tenant_id: str, from_version: int, change_type: str | None = None) -> list[str]:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         if change_type:
             cur.execute(
                 "SELECT target_id FROM graph_changes WHERE tenant_id=%s AND graph_version>%s AND change_type=%s",
@@ -130,13 +49,10 @@ def get_changed_targets_since(tenant_id: str, from_version: int, change_type: st
                 (tenant_id, from_version),
             )
         rows = cur.fetchall()
-        conn.close()
-        return [r[0] for r in rows]
+    return [r[0] for r in rows]
 
 def ensure_schema_version():
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS schema_version (
@@ -155,58 +71,48 @@ def ensure_schema_version():
             """
         )
         cur.execute("INSERT INTO schema_version_tenant (tenant_id, version) VALUES (%s, %s) ON CONFLICT (tenant_id) DO NOTHING", ("system", 1))
-    conn.close()
 
 def get_schema_version() -> int:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT version FROM schema_version WHERE id=1")
         row = cur.fetchone()
-    conn.close()
     return int(row[0]) if row else 0
 
 def set_schema_version(version: int) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("INSERT INTO schema_version (id, version) VALUES (1, %s) ON CONFLICT (id) DO UPDATE SET version=EXCLUDED.version", (version,))
-    conn.close()
 
 def get_tenant_schema_version(tenant_id: str) -> int:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT version FROM schema_version_tenant WHERE tenant_id=%s", (tenant_id,))
         row = cur.fetchone()
-    conn.close()
     return int(row[0]) if row else 0
 
 def set_tenant_schema_version(tenant_id: str, version: int) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("INSERT INTO schema_version_tenant (tenant_id, version) VALUES (%s, %s) ON CONFLICT (tenant_id) DO UPDATE SET version=EXCLUDED.version", (tenant_id, version))
-    conn.close()
+
+def insert_proposal(proposal_id: str, tenant_id: str, base_graph_version: int, proposal_checksum: str, status: str, operations: list) -> None:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO proposals (proposal_id, tenant_id, base_graph_version, proposal_checksum, status, operations_json) VALUES (%s,%s,%s,%s,%s,%s)",
+            (proposal_id, tenant_id, base_graph_version, proposal_checksum, status, json.dumps(operations)),
+        )
 
 def get_proposal(proposal_id: str) -> dict | None:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT proposal_id, tenant_id, base_graph_version, proposal_checksum, status, operations_json FROM proposals WHERE proposal_id=%s", (proposal_id,))
         row = cur.fetchone()
-    conn.close()
     if not row:
         return None
     return {"proposal_id": row[0], "tenant_id": row[1], "base_graph_version": int(row[2]), "proposal_checksum": row[3], "status": row[4], "operations": row[5]}
 
 def set_proposal_status(proposal_id: str, status: str) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("UPDATE proposals SET status=%s WHERE proposal_id=%s", (status, proposal_id))
-    conn.close()
 
 def list_proposals(tenant_id: str, status: str | None = None, limit: int = 20, offset: int = 0) -> list[dict]:
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         if status:
             cur.execute(
                 "SELECT proposal_id, tenant_id, base_graph_version, proposal_checksum, status, created_at FROM proposals WHERE tenant_id=%s AND status=%s ORDER BY created_at DESC LIMIT %s OFFSET %s",
@@ -218,37 +124,92 @@ def list_proposals(tenant_id: str, status: str | None = None, limit: int = 20, o
                 (tenant_id, limit, offset),
             )
         rows = cur.fetchall()
-    conn.close()
     return [{"proposal_id": r[0], "tenant_id": r[1], "base_graph_version": int(r[2]), "proposal_checksum": r[3], "status": r[4], "created_at": r[5]} for r in rows]
 
+OUTBOX_CHANNEL = "events_outbox"
+
 def outbox_add(tenant_id: str, event_type: str, payload: Dict) -> str:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
-        import uuid, json
-        eid = "EV-" + uuid.uuid4().hex[:16]
+    eid = "EV-" + uuid.uuid4().hex[:16]
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("INSERT INTO events_outbox (event_id, tenant_id, event_type, payload, published) VALUES (%s,%s,%s,%s,FALSE)", (eid, tenant_id, event_type, json.dumps(payload)))
-    conn.close()
+        cur.execute("SELECT pg_notify(%s, %s)", (OUTBOX_CHANNEL, eid))
     return eid
 
-def outbox_fetch_unpublished(limit: int = 100) -> list[dict]:
-    conn = get_conn()
-    with conn.cursor() as cur:
-        cur.execute("SELECT event_id, tenant_id, event_type, payload FROM events_outbox WHERE published=FALSE ORDER BY created_at ASC LIMIT %s", (limit,))
+def outbox_list_dead(event_type: Optional[str] = None, tenant_id: Optional[str] = None, limit: int = 100) -> list[dict]:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT event_id, tenant_id, event_type, attempts, last_error, created_at, dead_at FROM events_outbox_dead "
+            "WHERE (%s::text IS NULL OR event_type=%s) AND (%s::text IS NULL OR tenant_id=%s) ORDER BY dead_at DESC LIMIT %s",
+            (event_type, event_type, tenant_id, tenant_id, limit),
+        )
         rows = cur.fetchall()
-    conn.close()
-    return [{"event_id": r[0], "tenant_id": r[1], "event_type": r[2], "payload": r[3]} for r in rows]
-
-def outbox_mark_published(event_id: str) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
-        cur.execute("UPDATE events_outbox SET published=TRUE WHERE event_id=%s", (event_id,))
-    conn.close()
-
-def outbox_mark_failed(event_id: str, error: str | None = None) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
-        cur.execute("UPDATE events_outbox SET attempts=attempts+1, last_error=%s WHERE event_id=%s", (error or "", event_id))
-    conn.close()
+    return [{"event_id": r[0], "tenant_id": r[1], "event_type": r[2], "attempts": int(r[3]), "last_error": r[4], "created_at": r[5], "dead_at": r[6]} for r in rows]
+
+def outbox_replay_dead(event_ids: Optional[List[str]] = None, event_type: Optional[str] = None, tenant_id: Optional[str] = None, limit: int = 1000) -> int:
+    # перенос обратно в outbox со сброшенным счетчиком попыток, relay подхватит их по NOTIFY
+    with pg_tx() as conn, conn.cursor() as cur:
+        cur.execute(
+            "WITH picked AS ("
+            "  SELECT event_id FROM events_outbox_dead"
+            "  WHERE (%s::text[] IS NULL OR event_id = ANY(%s)) AND (%s::text IS NULL OR event_type=%s) AND (%s::text IS NULL OR tenant_id=%s)"
+            "  ORDER BY dead_at LIMIT %s FOR UPDATE SKIP LOCKED"
+            "), moved AS ("
+            "  DELETE FROM events_outbox_dead d USING picked p WHERE d.event_id=p.event_id"
+            "  RETURNING d.event_id, d.tenant_id, d.event_type, d.payload, d.created_at"
+            ") "
+            "INSERT INTO events_outbox (event_id, tenant_id, event_type, payload, published, attempts, last_error, created_at, next_attempt_at) "
+            "SELECT event_id, tenant_id, event_type, payload, FALSE, 0, '', created_at, LOCALTIMESTAMP FROM moved "
+            "ON CONFLICT (event_id) DO UPDATE SET published=FALSE, attempts=0, last_error='', next_attempt_at=LOCALTIMESTAMP",
+            (event_ids, event_ids, event_type, event_type, tenant_id, tenant_id, limit),
+        )
+        replayed = cur.rowcount
+        if replayed:
+            cur.execute("SELECT pg_notify(%s, %s)", (OUTBOX_CHANNEL, "replay"))
+    return replayed
+
+def chunk_manifest_touch(tenant_id: str, doc_id: str, chunk_ids: List[str], run_id: str) -> set[str]:
+    if not chunk_ids:
+        return set()
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "UPDATE document_chunks SET run_id=%s WHERE tenant_id=%s AND doc_id=%s AND chunk_id = ANY(%s) RETURNING chunk_id",
+            (run_id, tenant_id, doc_id, list(chunk_ids)),
+        )
+        return {r[0] for r in cur.fetchall()}
+
+def chunk_manifest_add(tenant_id: str, doc_id: str, chunk_ids: List[str], run_id: str) -> None:
+    if not chunk_ids:
+        return
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO document_chunks (tenant_id, doc_id, chunk_id, run_id) SELECT %s, %s, unnest(%s::text[]), %s "
+            "ON CONFLICT (tenant_id, doc_id, chunk_id) DO UPDATE SET run_id=EXCLUDED.run_id",
+            (tenant_id, doc_id, list(chunk_ids), run_id),
+        )
+
+def chunk_manifest_stale(tenant_id: str, doc_id: str, run_id: str, limit: int = 1000) -> list[str]:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT chunk_id FROM document_chunks WHERE tenant_id=%s AND doc_id=%s AND run_id <> %s ORDER BY chunk_id LIMIT %s",
+            (tenant_id, doc_id, run_id, limit),
+        )
+        return [r[0] for r in cur.fetchall()]
+
+def chunk_manifest_remove(tenant_id: str, doc_id: str, chunk_ids: List[str]) -> None:
+    if not chunk_ids:
+        return
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM document_chunks WHERE tenant_id=%s AND doc_id=%s AND chunk_id = ANY(%s)", (tenant_id, doc_id, list(chunk_ids)))
+
+def entity_backfill_progress() -> Dict[str, Dict]:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT label, last_uid, scanned, done FROM entity_label_backfill")
+        return {r[0]: {"last_uid": r[1], "scanned": int(r[2]), "done": bool(r[3])} for r in cur.fetchall()}
+
+def entity_backfill_save(label: str, last_uid: str, scanned: int, done: bool) -> None:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO entity_label_backfill (label, last_uid, scanned, done, updated_at) VALUES (%s,%s,%s,%s,NOW()) "
+            "ON CONFLICT (label) DO UPDATE SET last_uid=EXCLUDED.last_uid, scanned=EXCLUDED.scanned, done=EXCLUDED.done, updated_at=NOW()",
+            (label, last_uid, int(scanned), bool(done)),
+        )
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from psycopg2 import extensions as pg_ext
+from psycopg2.pool import ThreadedConnectionPool
+from src.config.settings import settings
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+    PG_POOL_IN_USE = Gauge("pg_pool_connections_in_use", "Postgres pool connections checked out")
+    PG_POOL_MAX = Gauge("pg_pool_connections_max", "Postgres pool size limit")
+    PG_POOL_WAITING = Gauge("pg_pool_waiting", "Callers waiting for a Postgres connection", ["side"])
+    PG_POOL_ACQUIRE_MS = Histogram("pg_pool_acquire_ms", "Time spent waiting for a Postgres pool connection, ms")
+    PG_POOL_TIMEOUT_TOTAL = Counter("pg_pool_timeout_total", "Postgres pool acquire timeouts")
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+        def dec(self, *args, **kwargs): ...
+        def set(self, *args, **kwargs): ...
+        def observe(self, *args, **kwargs): ...
+    PG_POOL_IN_USE = _Dummy()
+    PG_POOL_MAX = _Dummy()
+    PG_POOL_WAITING = _Dummy()
+    PG_POOL_ACQUIRE_MS = _Dummy()
+    PG_POOL_TIMEOUT_TOTAL = _Dummy()
+
+PG_POOL_MIN = int(os.environ.get("PG_POOL_MIN", "1"))
+PG_POOL_MAX_SIZE = int(os.environ.get("PG_POOL_MAX", "10"))
+PG_POOL_TIMEOUT_SEC = float(os.environ.get("PG_POOL_TIMEOUT_SEC", "10"))
+
+class PoolTimeout(RuntimeError):
+    pass
+
+def pg_dsn() -> str:
+    return str(settings.pg_dsn) if settings.pg_dsn else ""
+
+def pg_configured() -> bool:
+    return bool(pg_dsn())
+
+class PgPool:
+    def __init__(self, dsn: str, minconn: int = PG_POOL_MIN, maxconn: int = PG_POOL_MAX_SIZE, timeout: float = PG_POOL_TIMEOUT_SEC):
+        self.dsn = dsn
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.pid = os.getpid()
+        # ThreadedConnectionPool бросает PoolError при исчерпании, семафор превращает это в ожидание
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._pool = ThreadedConnectionPool(min(max(0, minconn), self.maxconn), self.maxconn, dsn)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        PG_POOL_MAX.set(self.maxconn)
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            self.waiting += 1
+        PG_POOL_WAITING.labels(side="sync").inc()
+        t0 = time.perf_counter()
+        try:
+            if not self._slots.acquire(timeout=self.timeout):
+                PG_POOL_TIMEOUT_TOTAL.inc()
+                raise PoolTimeout(f"no Postgres connection available within {self.timeout}s (max={self.maxconn})")
+        finally:
+            PG_POOL_WAITING.labels(side="sync").dec()
+            PG_POOL_ACQUIRE_MS.observe((time.perf_counter() - t0) * 1000)
+            with self._lock:
+                self.waiting -= 1
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        self._acquire_slot()
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        PG_POOL_IN_USE.inc()
+        try:
+            yield conn
+        finally:
+            broken = bool(conn.closed)
+            if not broken and conn.get_transaction_status() != pg_ext.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self._pool.putconn(conn, close=broken)
+            with self._lock:
+                self.in_use -= 1
+            PG_POOL_IN_USE.dec()
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"max": self.maxconn, "in_use": self.in_use, "waiting": self.waiting, "idle": len(self._pool._pool)}
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+_POOL: Optional[PgPool] = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool() -> PgPool:
+    global _POOL
+    dsn = pg_dsn()
+    if not dsn:
+        raise RuntimeError("PG_DSN is not configured")
+    pool = _POOL
+    if pool is not None and pool.dsn == dsn and pool.pid == os.getpid():
+        return pool
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.dsn != dsn or _POOL.pid != os.getpid():
+            _POOL = PgPool(dsn)
+        return _POOL
+
+def close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL.pid == os.getpid():
+            _POOL.close()
+        _POOL = None
+
+def pool_stats() -> Dict[str, int]:
+    return _POOL.stats() if _POOL is not None else {"max": PG_POOL_MAX_SIZE, "in_use": 0, "waiting": 0, "idle": 0}
+
+@contextmanager
+def pg_conn() -> Iterator[Any]:
+    with get_pool().connection() as conn:
+        conn.autocommit = True
+        yield conn
+
+@contextmanager
+def pg_tx() -> Iterator[Any]:
+    with get_pool().connection() as conn:
+        conn.autocommit = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+_ASYNC_SLOTS: Dict[int, asyncio.Semaphore] = {}
+
+def _async_slots() -> asyncio.Semaphore:
+    loop_id = id(asyncio.get_running_loop())
+    sem = _ASYNC_SLOTS.get(loop_id)
+    if sem is None:
+        sem = _ASYNC_SLOTS.setdefault(loop_id, asyncio.Semaphore(PG_POOL_MAX_SIZE))
+    return sem
+
+async def pg_async(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # очередь ожидания держится в event loop, а не в потоках: в пул уходит не больше запросов, чем соединений
+    sem = _async_slots()
+    PG_POOL_WAITING.labels(side="async").inc()
+    try:
+        await sem.acquire()
+    finally:
+        PG_POOL_WAITING.labels(side="async").dec()
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        sem.release()
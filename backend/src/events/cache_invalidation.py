@@ -0,0 +1,43 @@
+import threading
+from typing import Optional
+from src.core.logging import logger
+from src.events.consumer import decode_event
+from src.events.publisher import GRAPH_COMMITTED_STREAM, get_redis
+from src.services.graph.versioning import forget_graph_version
+
+# кэши версий графа живут в памяти каждого процесса, поэтому читаем поток без группы:
+# в группе событие получил бы только один процесс
+_LISTENER: Optional[threading.Thread] = None
+_STOP = threading.Event()
+
+def _tail_forever() -> None:
+    backoff = 1.0
+    while not _STOP.is_set():
+        try:
+            r = get_redis()
+            last = "$"
+            # пока чтения не было, коммиты могли пройти мимо
+            forget_graph_version()
+            backoff = 1.0
+            while not _STOP.is_set():
+                for _stream, entries in r.xread({GRAPH_COMMITTED_STREAM: last}, count=500, block=1000) or []:
+                    for mid, fields in entries:
+                        last = mid
+                        ev = decode_event(fields)
+                        if ev and ev.get("tenant_id"):
+                            forget_graph_version(ev["tenant_id"])
+        except Exception as e:
+            logger.warning("graph_cache_invalidation_listener_error", error=str(e))
+            _STOP.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+def start_graph_cache_listener() -> None:
+    global _LISTENER
+    if _LISTENER is not None and _LISTENER.is_alive():
+        return
+    _STOP.clear()
+    _LISTENER = threading.Thread(target=_tail_forever, name="graph-cache-invalidation", daemon=True)
+    _LISTENER.start()
+
+def stop_graph_cache_listener() -> None:
+    _STOP.set()
@@ -0,0 +1,142 @@
+import json
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import redis
+from src.core.logging import logger
+from src.events.publisher import GRAPH_COMMITTED_STREAM, get_redis
+try:
+    from prometheus_client import Counter
+    EVENTS_CONSUMED_TOTAL = Counter("events_consumed_total", "Stream events handled by consumer groups", ["group", "result"])
+    EVENTS_RECLAIMED_TOTAL = Counter("events_reclaimed_total", "Stream events reclaimed from stalled consumers", ["group"])
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    EVENTS_CONSUMED_TOTAL = _Dummy()
+    EVENTS_RECLAIMED_TOTAL = _Dummy()
+
+EVENTS_CLAIM_IDLE_MS = int(os.environ.get("EVENTS_CLAIM_IDLE_MS", "60000"))
+EVENTS_MAX_DELIVERIES = int(os.environ.get("EVENTS_MAX_DELIVERIES", "5"))
+
+Message = Tuple[bytes, Optional[Dict]]
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def decode_event(fields) -> Optional[Dict]:
+    raw = fields.get(b"data") if fields else None
+    if raw is None:
+        return None
+    try:
+        ev = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return ev if isinstance(ev, dict) else None
+
+class StreamConsumer:
+    def __init__(
+        self,
+        group: str,
+        consumer: Optional[str] = None,
+        stream: str = GRAPH_COMMITTED_STREAM,
+        count: int = 100,
+        block_ms: Optional[int] = 5000,
+        claim_idle_ms: int = EVENTS_CLAIM_IDLE_MS,
+        max_deliveries: int = EVENTS_MAX_DELIVERIES,
+        r=None,
+    ):
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.stream = stream
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.r = r or get_redis()
+        self._group_ready = False
+        self._next_reclaim = 0.0
+
+    def ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            self.r.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def _reclaim(self) -> List[Message]:
+        # записи упавших потребителей висят в PEL группы, пока их не заберет живой потребитель
+        now = time.monotonic()
+        if now < self._next_reclaim:
+            return []
+        self._next_reclaim = now + self.claim_idle_ms / 2000.0
+        res = self.r.xautoclaim(self.stream, self.group, self.consumer, self.claim_idle_ms, start_id="0-0", count=self.count)
+        msgs = list(res[1]) if res else []
+        gone = [mid for mid, fields in msgs if not fields]
+        msgs = [(mid, fields) for mid, fields in msgs if fields]
+        if gone:
+            # запись обрезана MAXLEN раньше, чем ее подтвердили
+            self.r.xack(self.stream, self.group, *gone)
+        if not msgs:
+            return []
+        EVENTS_RECLAIMED_TOTAL.labels(group=self.group).inc(len(msgs))
+        pending = self.r.xpending_range(self.stream, self.group, min=msgs[0][0], max=msgs[-1][0], count=self.count, consumername=self.consumer)
+        deliveries = {p["message_id"]: int(p["times_delivered"]) for p in pending}
+        dead = [(mid, fields) for mid, fields in msgs if deliveries.get(mid, 0) > self.max_deliveries]
+        if dead:
+            pipe = self.r.pipeline(transaction=False)
+            for mid, fields in dead:
+                pipe.xadd(f"{self.stream}:dead", {**fields, b"group": self.group, b"source_id": mid})
+            pipe.xack(self.stream, self.group, *[mid for mid, _ in dead])
+            pipe.execute()
+            EVENTS_CONSUMED_TOTAL.labels(group=self.group, result="dead").inc(len(dead))
+            logger.warning("stream_events_dead_lettered", group=self.group, stream=self.stream, events=len(dead))
+        return [(mid, fields) for mid, fields in msgs if deliveries.get(mid, 0) <= self.max_deliveries]
+
+    def read(self) -> List[Message]:
+        self.ensure_group()
+        msgs = self._reclaim()
+        if len(msgs) < self.count:
+            block = None if msgs else self.block_ms
+            for _stream, entries in self.r.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=self.count - len(msgs), block=block) or []:
+                msgs.extend(entries)
+        return [(mid, decode_event(fields)) for mid, fields in msgs]
+
+    def ack(self, ids: List[bytes]) -> None:
+        if ids:
+            self.r.xack(self.stream, self.group, *ids)
+
+    def consume(self, handler: Callable[[List[Dict]], int]) -> int:
+        msgs = self.read()
+        if not msgs:
+            return 0
+        events = [ev for _, ev in msgs if ev is not None]
+        invalid = len(msgs) - len(events)
+        if invalid:
+            EVENTS_CONSUMED_TOTAL.labels(group=self.group, result="invalid").inc(invalid)
+        # без XACK пачка останется в PEL и после claim_idle_ms достанется другому потребителю
+        processed = handler(events) if events else 0
+        self.ack([mid for mid, _ in msgs])
+        EVENTS_CONSUMED_TOTAL.labels(group=self.group, result="ok").inc(len(events))
+        return processed
+
+    def run_forever(self, handler: Callable[[List[Dict]], int], stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        backoff = 1.0
+        logger.info("stream_consumer_started", group=self.group, consumer=self.consumer, stream=self.stream)
+        while not stop.is_set():
+            try:
+                self.consume(handler)
+                backoff = 1.0
+            except Exception as e:
+                EVENTS_CONSUMED_TOTAL.labels(group=self.group, result="failed").inc()
+                logger.warning("stream_consumer_error", group=self.group, consumer=self.consumer, error=str(e))
+                self._group_ready = False
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+        logger.info("stream_consumer_stopped", group=self.group, consumer=self.consumer)
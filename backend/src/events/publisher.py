@@ -1,11 +1,35 @@
 import json
-from typing import Dict
+import os
+import threading
+from typing import Dict, Iterable
 import redis
 from src.config.settings import settings
 
+GRAPH_COMMITTED_STREAM = "events:graph_committed:stream"
+# приблизительная обрезка (MAXLEN ~): отставшая группа может потерять записи старше этого окна
+EVENTS_STREAM_MAXLEN = int(os.environ.get("EVENTS_STREAM_MAXLEN", "100000"))
+
+_client = None
+_client_lock = threading.Lock()
+
 def get_redis():
-    return redis.Redis.from_url(str(settings.redis_url))
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(str(settings.redis_url))
+    return _client
 
 def publish_graph_committed(event: Dict) -> None:
     r = get_redis()
-    r.lpush("events:graph_committed", json.dumps(event))
+    r.xadd(GRAPH_COMMITTED_STREAM, {"data": json.dumps(event)}, maxlen=EVENTS_STREAM_MAXLEN, approximate=True)
+
+def publish_graph_committed_many(events: Iterable[Dict], r=None) -> int:
+    pipe = (r or get_redis()).pipeline(transaction=False)
+    n = 0
+    for ev in events:
+        pipe.xadd(GRAPH_COMMITTED_STREAM, {"data": json.dumps(ev)}, maxlen=EVENTS_STREAM_MAXLEN, approximate=True)
+        n += 1
+    if n:
+        pipe.execute()
+    return n
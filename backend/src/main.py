@@ -1,4 +1,5 @@
 import asyncio
+import os
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -26,7 +27,14 @@ except Exception:
 from src.api.validation import router as validation_router
 from src.api.auth import router as auth_router
 from src.services.auth.users_repo import ensure_bootstrap_admin
-from src.core.migrations import check_and_gatekeep
+from src.services.auth.principal_cache import start_invalidation_listener, stop_invalidation_listener
+from src.events.cache_invalidation import start_graph_cache_listener, stop_graph_cache_listener
+from src.workers.entity_backfill import start_entity_backfill, stop_entity_backfill
+from src.services.auth.passwords import shutdown_executor as shutdown_password_executor
+from src.core.migrations import check_and_gatekeep, migrate
+from src.db.pool import close_pool, pool_stats
+from src.services.vector.qdrant_service import get_vector_service, startup_check as vector_startup_check
+from src.services.llm.gateway import shutdown_gateway
 try:
     from prometheus_client import Counter, Histogram
 except Exception:
@@ -88,9 +96,6 @@ app = FastAPI(
 )
 
 
-app.add_exception_handler(StarletteHTTPException, http_exception_handler)
-app.add_exception_handler(RequestValidationError, validation_exception_handler)
-app.add_exception_handler(Exception, global_exception_handler)
 
 
 REQ_COUNTER = Counter("http_requests_total", "Total HTTP requests", ["method", "path", "status"])
@@ -100,10 +105,28 @@ LATENCY = Histogram("http_request_latency_ms", "Request latency ms", ["method",
 async def on_startup():
     setup_logging()
     logger.info("startup", neo4j_uri=settings.neo4j_uri)
+    if os.environ.get("PG_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        migrate()
     ok = check_and_gatekeep()
     if not ok:
         raise SystemExit("Schema version gate failed")
     ensure_bootstrap_admin()
+    start_invalidation_listener()
+    start_graph_cache_listener()
+    # метку :Entity существующим узлам проставляет фоновый проход: старт не ждет Neo4j и не держит блокировку миграций
+    if os.environ.get("ENTITY_BACKFILL_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        start_entity_backfill()
+    if os.environ.get("VECTOR_STARTUP_CHECK", "true").lower() in ("1", "true", "yes"):
+        await vector_startup_check()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    stop_invalidation_listener()
+    stop_graph_cache_listener()
+    stop_entity_backfill()
+    shutdown_password_executor()
+    shutdown_gateway()
+    close_pool()
 
 @app.middleware("http")
 async def tenant_middleware(request, call_next):
@@ -175,7 +198,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.get("/health", tags=["Система"], summary="Проверка состояния", description="Возвращает статус доступности ключевых зависимостей.")
 async def health():
-    return {"openai": bool(settings.openai_api_key.get_secret_value()), "neo4j": bool(settings.neo4j_uri)}
+    return {"openai": bool(settings.openai_api_key.get_secret_value()), "neo4j": bool(settings.neo4j_uri), "pg_pool": pool_stats(), "qdrant": get_vector_service().last_health}
 
 @app.get("/metrics", tags=["Система"], summary="Метрики Prometheus", description="Экспорт метрик в формате, совместимом с Prometheus.")
 async def metrics():
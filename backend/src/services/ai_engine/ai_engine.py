@@ -1,7 +1,8 @@
 from typing import List
 from pydantic import BaseModel, Field
 import json
-from src.config.settings import settings
+from src.core.context import get_tenant_id
+from src.services.llm.gateway import chat as llm_chat
 
 class GeneratedConcept(BaseModel):
     title: str
@@ -17,20 +18,11 @@ class GeneratedBundle(BaseModel):
     skills: List[GeneratedSkill]
 
 async def generate_concepts_and_skills(topic: str, language: str) -> GeneratedBundle:
-    try:
-        from openai import AsyncOpenAI
-    except Exception:
-        return GeneratedBundle(concepts=[], skills=[])
-    oai = AsyncOpenAI(api_key=settings.openai_api_key.get_secret_value())
     messages = [
         {"role": "system", "content": "Return structured JSON for concepts and skills in the target language."},
         {"role": "user", "content": f"topic={topic}; lang={language}"},
     ]
-    resp = await oai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        response_format={"type": "json_object"},
-    )
-    content = resp.choices[0].message.content or "{}"
+    resp = await llm_chat(messages, model="gpt-4o-mini", tenant_id=get_tenant_id(), response_format={"type": "json_object"})
+    content = resp["content"] or "{}"
     data = json.loads(content)
     return GeneratedBundle.model_validate(data)
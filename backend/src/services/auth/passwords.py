@@ -1,7 +1,32 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
 from passlib.context import CryptContext
+try:
+    from prometheus_client import Counter, Gauge
+    PASSWORD_HASH_PENDING = Gauge("password_hash_pending", "Password hash/verify jobs queued or running")
+    PASSWORD_HASH_REJECTED_TOTAL = Counter("password_hash_rejected_total", "Password hash/verify jobs rejected because the queue is full")
+except Exception:
+    class _Dummy:
+        def inc(self, *args, **kwargs): ...
+        def dec(self, *args, **kwargs): ...
+    PASSWORD_HASH_PENDING = _Dummy()
+    PASSWORD_HASH_REJECTED_TOTAL = _Dummy()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
 
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class PasswordHasherBusy(RuntimeError):
+    pass
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password[:72])
@@ -9,3 +34,56 @@ def hash_password(password: str) -> str:
 
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
+
+
+_executor: Optional[Executor] = None
+_lock = threading.Lock()
+_pending = 0
+
+
+def _get_executor() -> Executor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                # spawn: в API-процессе уже работают потоки (пул PG, подписчик Redis), fork от них небезопасен
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+def pending() -> int:
+    return _pending
+
+
+async def _offload(fn: Callable[..., Any], *args: Any) -> Any:
+    global _pending
+    with _lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            PASSWORD_HASH_REJECTED_TOTAL.inc()
+            raise PasswordHasherBusy("password hashing queue is full")
+        _pending += 1
+    PASSWORD_HASH_PENDING.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        PASSWORD_HASH_PENDING.dec()
+        with _lock:
+            _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _offload(hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _offload(verify_password, password, password_hash)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from src.core.logging import logger
+from src.events.publisher import get_redis
+from src.services.auth.users_repo import User, get_user_by_id
+try:
+    from prometheus_client import Counter
+    AUTH_USER_CACHE_TOTAL = Counter("auth_user_cache_total", "Principal cache lookups", ["result"])
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    AUTH_USER_CACHE_TOTAL = _Dummy()
+
+USER_CACHE_TTL_SEC = float(os.environ.get("AUTH_USER_CACHE_TTL_SEC", "30"))
+USER_CACHE_MAX = int(os.environ.get("AUTH_USER_CACHE_MAX", "10000"))
+INVALIDATION_CHANNEL = "auth:user_invalidated"
+
+class UserCache:
+    def __init__(self, maxsize: int = USER_CACHE_MAX, ttl_sec: float = USER_CACHE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[User]:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._items.get(user_id)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                self._items.pop(user_id, None)
+                return None
+            self._items.move_to_end(user_id)
+            return hit[1]
+
+    def put(self, user: User) -> None:
+        with self._lock:
+            self._items[user.id] = (time.monotonic() + self.ttl_sec, user)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+user_cache = UserCache()
+
+def get_cached_user(user_id: int, loader: Callable[[int], Optional[User]] = get_user_by_id) -> Optional[User]:
+    user = user_cache.get(user_id)
+    if user is not None:
+        AUTH_USER_CACHE_TOTAL.labels(result="hit").inc()
+        return user
+    AUTH_USER_CACHE_TOTAL.labels(result="miss").inc()
+    user = loader(user_id)
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+def publish_user_invalidation(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+    try:
+        get_redis().publish(INVALIDATION_CHANNEL, str(user_id))
+    except Exception as e:
+        logger.warning("auth_user_invalidation_publish_failed", user_id=user_id, error=str(e))
+
+def _handle_message(msg) -> None:
+    if not msg or msg.get("type") != "message":
+        return
+    data = msg.get("data")
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    try:
+        user_cache.invalidate(int(data))
+    except (TypeError, ValueError):
+        user_cache.clear()
+
+_LISTENER: Optional[threading.Thread] = None
+_STOP = threading.Event()
+
+def _listen_forever() -> None:
+    backoff = 1.0
+    while not _STOP.is_set():
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # пока подписки не было, инвалидации могли потеряться
+            user_cache.clear()
+            backoff = 1.0
+            while not _STOP.is_set():
+                _handle_message(pubsub.get_message(timeout=1.0))
+            pubsub.close()
+        except Exception as e:
+            logger.warning("auth_user_invalidation_listener_error", error=str(e))
+            user_cache.clear()
+            _STOP.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+def start_invalidation_listener() -> None:
+    global _LISTENER
+    if _LISTENER is not None and _LISTENER.is_alive():
+        return
+    _STOP.clear()
+    _LISTENER = threading.Thread(target=_listen_forever, name="auth-user-invalidation", daemon=True)
+    _LISTENER.start()
+
+def stop_invalidation_listener() -> None:
+    _STOP.set()
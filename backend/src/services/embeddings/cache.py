@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from src.core.canonical import canonical_hash_from_text
+from src.core.logging import logger
+from src.services.embeddings.provider import BaseEmbeddingProvider
+try:
+    from prometheus_client import Counter
+    EMBEDDING_CACHE_TOTAL = Counter("embedding_cache_total", "Embedding cache lookups", ["tier", "result"])
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    EMBEDDING_CACHE_TOTAL = _Dummy()
+
+EMBEDDINGS_CACHE_PATH = os.environ.get("EMBEDDINGS_CACHE_PATH", os.path.join(tempfile.gettempdir(), "kb_embedding_cache.sqlite"))
+EMBEDDINGS_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDINGS_CACHE_MAX_ENTRIES", "500000"))
+EMBEDDINGS_CACHE_REDIS = os.environ.get("EMBEDDINGS_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+EMBEDDINGS_CACHE_REDIS_TTL_SEC = int(os.environ.get("EMBEDDINGS_CACHE_REDIS_TTL_SEC", str(7 * 24 * 3600)))
+
+def _pack(vec: List[float]) -> bytes:
+    return np.asarray(vec, dtype="<f4").tobytes()
+
+def _unpack(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype="<f4").astype(np.float64).tolist()
+
+class SqliteEmbeddingStore:
+    def __init__(self, path: str = EMBEDDINGS_CACHE_PATH, max_entries: int = EMBEDDINGS_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        out: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite ограничивает число параметров запроса
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._db.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part).fetchall()
+                out.update((k, _unpack(v)) for k, v in rows)
+            if out:
+                now = time.time()
+                self._db.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in out])
+        return out
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO embeddings (key, vec, last_used) VALUES (?,?,?)", [(k, _pack(v), now) for k, v in items.items()])
+            self._db.execute("COMMIT")
+            self._count += len(items)
+            if self._count > self.max_entries:
+                self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                over = self._count - self.max_entries
+                if over > 0:
+                    # вытесняем с запасом 10%, чтобы не чистить на каждой записи
+                    n = over + self.max_entries // 10
+                    self._db.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (n,))
+                    self._count = max(0, self._count - n)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+class RedisEmbeddingStore:
+    def __init__(self, r=None, ttl_sec: int = EMBEDDINGS_CACHE_REDIS_TTL_SEC, prefix: str = "emb:"):
+        if r is None:
+            from src.events.publisher import get_redis
+            r = get_redis()
+        self.r = r
+        self.ttl_sec = ttl_sec
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        vals = self.r.mget([self.prefix + k for k in keys])
+        return {k: _unpack(v) for k, v in zip(keys, vals) if v}
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        pipe = self.r.pipeline(transaction=False)
+        for k, v in items.items():
+            pipe.set(self.prefix + k, _pack(v), ex=self.ttl_sec)
+        pipe.execute()
+
+class CachedEmbeddingProvider(BaseEmbeddingProvider):
+    def __init__(self, inner: BaseEmbeddingProvider, local: Optional[SqliteEmbeddingStore] = None, remote: Optional[RedisEmbeddingStore] = None):
+        self.inner = inner
+        self.dim = getattr(inner, "dim", 0)
+        self.local = local
+        self.remote = remote
+        self.namespace = f"{type(inner).__name__}:{getattr(inner, 'model', '-')}:{self.dim}"
+
+    def key(self, text: str) -> str:
+        return f"{self.namespace}:{canonical_hash_from_text(text)}"
+
+    def _lookup(self, tier: str, store, keys: List[str]) -> Dict[str, List[float]]:
+        if store is None or not keys:
+            return {}
+        try:
+            found = store.get_many(keys)
+        except Exception as e:
+            logger.warning("embedding_cache_read_failed", tier=tier, error=str(e))
+            return {}
+        EMBEDDING_CACHE_TOTAL.labels(tier=tier, result="hit").inc(len(found))
+        EMBEDDING_CACHE_TOTAL.labels(tier=tier, result="miss").inc(len(keys) - len(found))
+        return found
+
+    def _store(self, tier: str, store, items: Dict[str, List[float]]) -> None:
+        if store is None or not items:
+            return
+        try:
+            store.put_many(items)
+        except Exception as e:
+            logger.warning("embedding_cache_write_failed", tier=tier, error=str(e))
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        keys = [self.key(t) for t in texts]
+        first: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            first.setdefault(k, t)
+        found = self._lookup("local", self.local, list(first))
+        missing = [k for k in first if k not in found]
+        remote = self._lookup("redis", self.remote, missing)
+        self._store("local", self.local, remote)
+        found.update(remote)
+        missing = [k for k in missing if k not in remote]
+        if missing:
+            vecs = self.inner.embed_texts([first[k] for k in missing])
+            fresh = dict(zip(missing, vecs))
+            self._store("local", self.local, fresh)
+            self._store("redis", self.remote, fresh)
+            # возвращаем то же округление до float32, что и из кэша: попадание и промах дают одинаковый вектор
+            found.update((k, _unpack(_pack(v))) for k, v in fresh.items())
+        return [found[k] for k in keys]
+
+_local_store: Optional[SqliteEmbeddingStore] = None
+_store_lock = threading.Lock()
+
+def local_store() -> Optional[SqliteEmbeddingStore]:
+    global _local_store
+    with _store_lock:
+        if _local_store is None:
+            try:
+                _local_store = SqliteEmbeddingStore()
+            except Exception as e:
+                logger.warning("embedding_cache_unavailable", path=EMBEDDINGS_CACHE_PATH, error=str(e))
+                return None
+        return _local_store
+
+def with_cache(provider: BaseEmbeddingProvider) -> BaseEmbeddingProvider:
+    remote = None
+    if EMBEDDINGS_CACHE_REDIS:
+        try:
+            remote = RedisEmbeddingStore()
+        except Exception as e:
+            logger.warning("embedding_cache_redis_unavailable", error=str(e))
+    return CachedEmbeddingProvider(provider, local=local_store(), remote=remote)
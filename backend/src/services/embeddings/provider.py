@@ -1,11 +1,26 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import hashlib
 import os
+import random
+import threading
+import time
+import numpy as np
+
+EMBEDDINGS_MAX_BATCH = int(os.environ.get("EMBEDDINGS_MAX_BATCH", "2048"))
+EMBEDDINGS_MAX_BATCH_TOKENS = int(os.environ.get("EMBEDDINGS_MAX_BATCH_TOKENS", "250000"))
+EMBEDDINGS_CONCURRENCY = int(os.environ.get("EMBEDDINGS_CONCURRENCY", "4"))
+EMBEDDINGS_MAX_RETRIES = int(os.environ.get("EMBEDDINGS_MAX_RETRIES", "4"))
+EMBEDDINGS_TIMEOUT_SEC = float(os.environ.get("EMBEDDINGS_TIMEOUT_SEC", "30"))
+EMBEDDINGS_CACHE = os.environ.get("EMBEDDINGS_CACHE", "auto").lower()
 
 class BaseEmbeddingProvider:
     def embed_text(self, text: str) -> List[float]:
         raise NotImplementedError
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_text(t) for t in texts]
+
 class HashEmbeddingProvider(BaseEmbeddingProvider):
     def __init__(self, dim: int = 16):
         self.dim = int(dim)
@@ -20,38 +35,139 @@ class HashEmbeddingProvider(BaseEmbeddingProvider):
             vec.append(v)
         return vec
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        digests = np.frombuffer(b"".join(hashlib.sha256(t.encode("utf-8")).digest() for t in texts), dtype=np.uint8).reshape(len(texts), 32)
+        need = self.dim * 2
+        buf = np.ascontiguousarray(np.tile(digests, (1, need // 32 + 1))[:, :need])
+        return (buf.view(">u2").astype(np.float64) / 65535.0).tolist()
+
+def approx_tokens(text: str) -> int:
+    # без токенизатора: ~3 символа на токен, с запасом для кириллицы
+    return len(text) // 3 + 1
+
+def split_batches(texts: List[str], max_items: int = EMBEDDINGS_MAX_BATCH, max_tokens: int = EMBEDDINGS_MAX_BATCH_TOKENS) -> List[Tuple[int, List[str]]]:
+    batches: List[Tuple[int, List[str]]] = []
+    start, cur, cur_tokens = 0, [], 0
+    for i, t in enumerate(texts):
+        n = approx_tokens(t)
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            batches.append((start, cur))
+            start, cur, cur_tokens = i, [], 0
+        cur.append(t)
+        cur_tokens += n
+    if cur:
+        batches.append((start, cur))
+    return batches
+
 class OpenAIEmbeddingProvider(BaseEmbeddingProvider):
-    def __init__(self, dim: int = 1536, model: str = "text-embedding-3-small", api_key: str | None = None):
+    url = "https://api.openai.com/v1/embeddings"
+
+    def __init__(self, dim: int = 1536, model: str = "text-embedding-3-small", api_key: str | None = None, concurrency: int = EMBEDDINGS_CONCURRENCY, max_retries: int = EMBEDDINGS_MAX_RETRIES):
         self.dim = int(dim)
         self.model = model
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY") or ""
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY missing for embedding provider")
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self._client = None
+        self._lock = threading.Lock()
+        # общий предел одновременных запросов для всех потоков, использующих провайдер
+        self._slots = threading.BoundedSemaphore(self.concurrency)
 
-    def embed_text(self, text: str) -> List[float]:
+    def client(self):
+        if self._client is None:
+            import httpx
+            with self._lock:
+                if self._client is None:
+                    limits = httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency)
+                    self._client = httpx.Client(
+                        timeout=EMBEDDINGS_TIMEOUT_SEC,
+                        limits=limits,
+                        headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                    )
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _fit(self, vec: List[float]) -> List[float]:
+        if self.dim and len(vec) != self.dim:
+            if len(vec) > self.dim:
+                vec = vec[: self.dim]
+            else:
+                pad = [0.0] * (self.dim - len(vec))
+                vec = vec + pad
+        return vec
+
+    def _post(self, inputs: List[str]) -> List[List[float]]:
         import httpx
-        url = "https://api.openai.com/v1/embeddings"
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        payload = {"input": text, "model": self.model}
-        with httpx.Client(timeout=10.0) as client:
-            r = client.post(url, json=payload, headers=headers)
-            r.raise_for_status()
-            data = r.json()
-            vec = data["data"][0]["embedding"]
-            if self.dim and len(vec) != self.dim:
-                if len(vec) > self.dim:
-                    vec = vec[: self.dim]
-                else:
-                    pad = [0.0] * (self.dim - len(vec))
-                    vec = vec + pad
-            return vec
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    r = self.client().post(self.url, json={"input": inputs, "model": self.model})
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise httpx.HTTPStatusError(f"retryable status {r.status_code}", request=r.request, response=r)
+                r.raise_for_status()
+                data = sorted(r.json()["data"], key=lambda d: d["index"])
+                return [self._fit(d["embedding"]) for d in data]
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                resp = getattr(e, "response", None)
+                if resp is not None and resp.status_code < 500 and resp.status_code != 429:
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random() / 2)
+                retry_after = resp.headers.get("Retry-After") if resp is not None else None
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                time.sleep(delay)
+
+    def embed_text(self, text: str) -> List[float]:
+        return self._post([text])[0]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = split_batches(texts)
+        if len(batches) == 1:
+            return self._post(batches[0][1])
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches)), thread_name_prefix="embed") as ex:
+            for (start, chunk), vecs in zip(batches, ex.map(lambda b: self._post(b[1]), batches)):
+                out[start:start + len(chunk)] = vecs
+        return out  # type: ignore[return-value]
+
+_providers: Dict[Tuple[str, int], BaseEmbeddingProvider] = {}
+_providers_lock = threading.Lock()
 
 def get_provider(dim_default: int = 16) -> BaseEmbeddingProvider:
     mode = os.environ.get("EMBEDDINGS_MODE", "hash").lower()
     dim = int(os.environ.get("EMBEDDINGS_DIM", str(dim_default)))
-    if mode == "model":
-        try:
-            return OpenAIEmbeddingProvider(dim=dim)
-        except Exception:
-            return HashEmbeddingProvider(dim=dim)
-    return HashEmbeddingProvider(dim=dim)
+    key = (mode, dim)
+    # провайдер держит пул HTTP-соединений, поэтому переиспользуется между вызовами
+    with _providers_lock:
+        p = _providers.get(key)
+        if p is None:
+            if mode == "model":
+                try:
+                    p = OpenAIEmbeddingProvider(dim=dim)
+                except Exception:
+                    p = HashEmbeddingProvider(dim=dim)
+            else:
+                p = HashEmbeddingProvider(dim=dim)
+            # хэш-провайдер дешевле обращения к кэшу, по умолчанию кэшируются только модельные эмбеддинги
+            if EMBEDDINGS_CACHE == "true" or (EMBEDDINGS_CACHE == "auto" and not isinstance(p, HashEmbeddingProvider)):
+                from src.services.embeddings.cache import with_cache
+                p = with_cache(p)
+            _providers[key] = p
+    return p
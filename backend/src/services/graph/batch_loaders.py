@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+from strawberry.dataloader import DataLoader
+from src.services.graph.neo4j_repo import get_driver
+
+TOPICS_QUERY = "UNWIND $uids AS u MATCH (t:Topic {uid:u}) RETURN u AS key, t.title AS title"
+TOPIC_PREREQS_QUERY = "UNWIND $uids AS u MATCH (:Topic {uid:u})-[:PREREQ]->(p:Topic) RETURN u AS key, p.uid AS uid, p.title AS title"
+TOPIC_TARGETS_QUERY = (
+    "UNWIND $uids AS u MATCH (:Topic {uid:u})-[:TARGETS]->(g) WHERE g:Goal OR g:Objective "
+    "RETURN u AS key, g.uid AS uid, g.title AS title, g:Objective AS objective"
+)
+TOPIC_METHODS_QUERY = (
+    "UNWIND $uids AS u MATCH (:Topic {uid:u})-[:USES_SKILL]->(:Skill)-[:LINKED]->(m:Method) "
+    "RETURN DISTINCT u AS key, m.uid AS uid, m.title AS title"
+)
+TOPIC_EXAMPLES_QUERY = (
+    "UNWIND $uids AS u MATCH (:Topic {uid:u})-[:HAS_QUESTION]->(q) "
+    "RETURN u AS key, q.uid AS uid, q.title AS title, q.statement AS statement, q.difficulty AS difficulty"
+)
+TOPIC_ERRORS_QUERY = (
+    "UNWIND $uids AS u MATCH (:Topic {uid:u})-[:USES_SKILL]->(:Skill)<-[:TRIGGERS]-(e:Error) "
+    "RETURN DISTINCT u AS key, e.uid AS uid, e.title AS title"
+)
+SKILL_ERRORS_QUERY = "UNWIND $uids AS u MATCH (e:Error)-[:TRIGGERS]->(:Skill {uid:u}) RETURN u AS key, e.uid AS uid, e.title AS title"
+ERRORS_QUERY = "UNWIND $uids AS u MATCH (e:Error {uid:u}) RETURN u AS key, e.title AS title"
+ERROR_TRIGGERS_QUERY = "UNWIND $uids AS u MATCH (:Error {uid:u})-[:TRIGGERS]->(sk:Skill) RETURN u AS key, sk.uid AS uid, sk.title AS title"
+ERROR_EXAMPLES_QUERY = (
+    "UNWIND $uids AS u MATCH (:Error {uid:u})-[:ILLUSTRATED_BY]->(q) "
+    "RETURN u AS key, q.uid AS uid, q.title AS title, q.statement AS statement, q.difficulty AS difficulty"
+)
+
+def _group(rows: List[Dict], keys: Sequence[str]) -> List[List[Dict]]:
+    by_key: Dict[str, List[Dict]] = {k: [] for k in keys}
+    for r in rows:
+        k = r.get("key")
+        if k in by_key:
+            item = dict(r)
+            item.pop("key", None)
+            by_key[k].append(item)
+    return [by_key[k] for k in keys]
+
+def _single(rows: List[Dict], keys: Sequence[str]) -> List[Optional[Dict]]:
+    by_key = {r.get("key"): r for r in rows}
+    return [by_key.get(k) for k in keys]
+
+class GraphLoaders:
+    def __init__(self, driver_factory: Callable = get_driver):
+        self._driver_factory = driver_factory
+        self._driver = None
+        self._lock = threading.Lock()
+        self.topics = self._loader(TOPICS_QUERY, _single)
+        self.topic_prereqs = self._loader(TOPIC_PREREQS_QUERY, _group)
+        self.topic_targets = self._loader(TOPIC_TARGETS_QUERY, _group)
+        self.topic_methods = self._loader(TOPIC_METHODS_QUERY, _group)
+        self.topic_examples = self._loader(TOPIC_EXAMPLES_QUERY, _group)
+        self.topic_errors = self._loader(TOPIC_ERRORS_QUERY, _group)
+        self.skill_errors = self._loader(SKILL_ERRORS_QUERY, _group)
+        self.errors = self._loader(ERRORS_QUERY, _single)
+        self.error_triggers = self._loader(ERROR_TRIGGERS_QUERY, _group)
+        self.error_examples = self._loader(ERROR_EXAMPLES_QUERY, _group)
+
+    def _run(self, query: str, keys: List[str]) -> List[Dict]:
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._driver_factory()
+        with self._driver.session() as s:
+            return s.run(query, {"uids": keys}).data()
+
+    def _loader(self, query: str, shape: Callable) -> DataLoader:
+        async def load_fn(keys: List[str]):
+            rows = await asyncio.to_thread(self._run, query, list(keys))
+            return shape(rows, keys)
+        return DataLoader(load_fn=load_fn)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
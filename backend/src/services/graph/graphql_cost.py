@@ -0,0 +1,166 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    get_named_type,
+    get_nullable_type,
+    is_leaf_type,
+    is_list_type,
+)
+from strawberry.extensions import SchemaExtension
+from src.core.logging import logger
+try:
+    from prometheus_client import Counter
+    GRAPHQL_COST_REJECTED_TOTAL = Counter("graphql_cost_rejected_total", "GraphQL queries rejected by cost limits", ["reason"])
+    GRAPHQL_HEAVY_QUERIES_TOTAL = Counter("graphql_heavy_queries_total", "GraphQL queries executed through the heavy-query throttle")
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    GRAPHQL_COST_REJECTED_TOTAL = _Dummy()
+    GRAPHQL_HEAVY_QUERIES_TOTAL = _Dummy()
+
+MAX_DEPTH = int(os.environ.get("GRAPHQL_MAX_DEPTH", "8"))
+MAX_BREADTH = int(os.environ.get("GRAPHQL_MAX_BREADTH", "200"))
+MAX_COST = int(os.environ.get("GRAPHQL_MAX_COST", "20000"))
+HEAVY_COST = int(os.environ.get("GRAPHQL_HEAVY_COST", "2000"))
+HEAVY_CONCURRENCY = int(os.environ.get("GRAPHQL_HEAVY_CONCURRENCY", "2"))
+DEFAULT_LIST_ROWS = 10
+
+# ожидаемое число элементов списочного поля на один родительский объект
+LIST_ROWS: Dict[str, int] = {
+    "GraphView.nodes": 2000,
+    "GraphView.edges": 4000,
+    "Curriculum.nodes": 200,
+    "Query.errorsBySkill": 20,
+    "Query.errorsByTopic": 30,
+    "Query.examplesByError": 10,
+    "ErrorNode.triggers": 5,
+    "ErrorNode.examples": 10,
+    "TopicDetails.prereqs": 10,
+    "TopicDetails.goals": 5,
+    "TopicDetails.objectives": 5,
+    "TopicDetails.methods": 10,
+    "TopicDetails.examples": 20,
+    "TopicDetails.errors": 30,
+}
+
+# стоимость вызова резолвера сверх числа возвращаемых строк
+FIELD_COST: Dict[str, int] = {
+    "Query.graph": 100,
+    "Query.curriculum": 20,
+}
+
+@dataclass
+class QueryCost:
+    depth: int = 0
+    breadth: int = 0
+    cost: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"depth": self.depth, "breadth": self.breadth, "cost": self.cost}
+
+class _Walker:
+    def __init__(self, schema: GraphQLSchema, fragments: Dict[str, FragmentDefinitionNode]):
+        self.schema = schema
+        self.fragments = fragments
+        self.result = QueryCost()
+
+    def walk(self, parent_type, selection_set: SelectionSetNode, mult: int, depth: int, active: Set[str]) -> None:
+        fields = getattr(parent_type, "fields", None) or {}
+        for sel in selection_set.selections:
+            if isinstance(sel, FieldNode):
+                name = sel.name.value
+                fdef = fields.get(name)
+                if name.startswith("__") or fdef is None:
+                    continue
+                self.result.breadth += 1
+                self.result.depth = max(self.result.depth, depth)
+                key = f"{parent_type.name}.{name}"
+                named = get_named_type(fdef.type)
+                if is_leaf_type(named) or sel.selection_set is None:
+                    self.result.cost += mult * FIELD_COST.get(key, 0)
+                    continue
+                rows = LIST_ROWS.get(key, DEFAULT_LIST_ROWS) if is_list_type(get_nullable_type(fdef.type)) else 1
+                self.result.cost += mult * (FIELD_COST.get(key, 0) + rows)
+                self.walk(named, sel.selection_set, mult * rows, depth + 1, active)
+            elif isinstance(sel, InlineFragmentNode):
+                target = self.schema.get_type(sel.type_condition.name.value) if sel.type_condition else parent_type
+                self.walk(target or parent_type, sel.selection_set, mult, depth, active)
+            elif isinstance(sel, FragmentSpreadNode):
+                name = sel.name.value
+                frag = self.fragments.get(name)
+                if frag is None or name in active:
+                    continue
+                target = self.schema.get_type(frag.type_condition.name.value) or parent_type
+                self.walk(target, frag.selection_set, mult, depth, active | {name})
+
+def _operation(document: DocumentNode, operation_name: Optional[str]) -> Optional[OperationDefinitionNode]:
+    ops = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if operation_name:
+        return next((o for o in ops if o.name and o.name.value == operation_name), None)
+    return ops[0] if len(ops) == 1 else None
+
+def analyze_query(schema: GraphQLSchema, document: DocumentNode, operation_name: Optional[str] = None) -> QueryCost:
+    op = _operation(document, operation_name)
+    if op is None:
+        return QueryCost()
+    root = schema.get_root_type(op.operation)
+    if root is None:
+        return QueryCost()
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    w = _Walker(schema, fragments)
+    w.walk(root, op.selection_set, 1, 1, set())
+    return w.result
+
+def limit_violation(cost: QueryCost) -> Optional[Tuple[str, str]]:
+    if cost.depth > MAX_DEPTH:
+        return "depth", f"query depth {cost.depth} exceeds limit {MAX_DEPTH}"
+    if cost.breadth > MAX_BREADTH:
+        return "breadth", f"query selects {cost.breadth} fields, limit is {MAX_BREADTH}"
+    if cost.cost > MAX_COST:
+        return "cost", f"estimated query cost {cost.cost} exceeds limit {MAX_COST}"
+    return None
+
+_HEAVY: Dict[int, asyncio.Semaphore] = {}
+
+def _heavy_semaphore() -> asyncio.Semaphore:
+    loop_id = id(asyncio.get_running_loop())
+    sem = _HEAVY.get(loop_id)
+    if sem is None:
+        sem = _HEAVY.setdefault(loop_id, asyncio.Semaphore(max(1, HEAVY_CONCURRENCY)))
+    return sem
+
+class QueryCostLimiter(SchemaExtension):
+    cost: Optional[QueryCost] = None
+
+    def on_validate(self):
+        ec = self.execution_context
+        if not ec.errors and ec.graphql_document is not None:
+            self.cost = analyze_query(ec.schema._schema, ec.graphql_document, ec.operation_name)
+            violation = limit_violation(self.cost)
+            if violation:
+                kind, message = violation
+                GRAPHQL_COST_REJECTED_TOTAL.labels(reason=kind).inc()
+                logger.warning("graphql_query_rejected", reason=kind, operation=ec.operation_name, **self.cost.as_dict())
+                ec.errors = [GraphQLError(message, extensions={"code": "QUERY_TOO_EXPENSIVE", **self.cost.as_dict()})]
+        yield
+
+    async def on_execute(self):
+        # результат уже мог подставить кэш persisted-запросов, тогда выполнять нечего
+        if self.cost is None or self.cost.cost < HEAVY_COST or self.execution_context.result is not None:
+            yield
+            return
+        GRAPHQL_HEAVY_QUERIES_TOTAL.inc()
+        async with _heavy_semaphore():
+            yield
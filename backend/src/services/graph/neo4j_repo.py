@@ -5,6 +5,10 @@ from src.config.settings import settings
 from src.core.correlation import get_correlation_id
 from src.core.logging import logger
 
+ENTITY_LABEL = "Entity"
+
+def node_kind(labels) -> str:
+    return next((l for l in (labels or []) if l != ENTITY_LABEL), "Unknown")
 
 def get_driver():
     uri = settings.neo4j_uri
@@ -98,7 +102,7 @@ def relation_context(from_uid: str, to_uid: str) -> Dict:
     with drv.session() as s:
         res = s.run(
             (
-                "MATCH (a {uid:$from})-[r]->(b {uid:$to}) "
+                "MATCH (a:Entity {uid:$from})-[r]->(b:Entity {uid:$to}) "
                 "RETURN type(r) AS rel, properties(r) AS props, a.title AS a_title, b.title AS b_title"
             ), {"from": from_uid, "to": to_uid}
         ).single()
@@ -114,7 +118,7 @@ def neighbors(center_uid: str, depth: int = 1) -> Tuple[List[Dict], List[Dict]]:
     depth = max(0, min(int(depth), 6))
     with drv.session() as s:
         query = (
-            "MATCH p=(c {uid:$uid})-[:CONTAINS|PREREQ|HAS_SKILL|LINKED|TARGETS|HAS_SECTION|HAS_TOPIC|REQUIRES_SKILL|HAS_METHOD|HAS_EXAMPLE|HAS_THEORY|HAS_STEP*0.." + str(depth) + "]-(n) "
+            "MATCH p=(c:Entity {uid:$uid})-[:CONTAINS|PREREQ|HAS_SKILL|LINKED|TARGETS|HAS_SECTION|HAS_TOPIC|REQUIRES_SKILL|HAS_METHOD|HAS_EXAMPLE|HAS_THEORY|HAS_STEP*0.." + str(depth) + "]-(n) "
             "RETURN collect(DISTINCT n) AS ns, collect(DISTINCT relationships(p)) AS rs"
         )
         res = s.run(query, {"uid": center_uid}).single()
@@ -127,7 +131,7 @@ def neighbors(center_uid: str, depth: int = 1) -> Tuple[List[Dict], List[Dict]]:
                 continue
             seen.add(nid)
             # kind - это первая метка (например, Topic, Subject)
-            kind = list(n.labels)[0] if n.labels else "Unknown"
+            kind = node_kind(n.labels)
             nodes.append({
                 "id": nid, 
                 "uid": n.get("uid"), 
@@ -155,18 +159,34 @@ def node_by_uid(uid: str, tenant_id: str) -> Dict:
     drv = get_driver()
     data: Dict = {}
     with drv.session() as s:
-        res = s.run("MATCH (n {uid:$uid, tenant_id:$tid}) RETURN properties(n) AS p", {"uid": uid, "tid": tenant_id}).single()
+        res = s.run("MATCH (n:Entity {tenant_id:$tid, uid:$uid}) RETURN properties(n) AS p", {"uid": uid, "tid": tenant_id}).single()
         if res and res.get("p"):
             data = dict(res.get("p"))
     drv.close()
     return data
 
+def nodes_by_uids(keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+    # keys: пары (tenant_id, uid); один запрос вместо node_by_uid на каждый узел
+    if not keys:
+        return {}
+    drv = get_driver()
+    data: Dict[Tuple[str, str], Dict] = {}
+    with drv.session() as s:
+        res = s.run(
+            "UNWIND $keys AS k MATCH (n:Entity {tenant_id:k.tid, uid:k.uid}) RETURN k.tid AS tid, k.uid AS uid, properties(n) AS p",
+            {"keys": [{"tid": t, "uid": u} for t, u in keys]},
+        )
+        for rec in res:
+            data[(rec["tid"], rec["uid"])] = dict(rec["p"] or {})
+    drv.close()
+    return data
+
 def relation_by_pair(from_uid: str, to_uid: str, typ: str, tenant_id: str) -> Dict:
     drv = get_driver()
     data: Dict = {}
     with drv.session() as s:
         res = s.run(
-            f"MATCH (a {{uid:$fu, tenant_id:$tid}})-[r:{typ}]->(b {{uid:$tu, tenant_id:$tid}}) RETURN properties(r) AS p",
+            f"MATCH (a:Entity {{tenant_id:$tid, uid:$fu}})-[r:{typ}]->(b:Entity {{tenant_id:$tid, uid:$tu}}) RETURN properties(r) AS p",
             {"fu": from_uid, "tu": to_uid, "tid": tenant_id},
         ).single()
         if res and res.get("p"):
@@ -186,28 +206,37 @@ def purge_user_artifacts() -> Dict:
     drv.close()
     return {"deleted_users": deleted_users, "deleted_completed_rels": deleted_rels}
 
-def get_node_details(uid: str) -> Dict:
+NODE_DETAILS_QUERY = (
+    "MATCH (n:Entity {uid:$uid}) "
+    "CALL { WITH n OPTIONAL MATCH (n)<-[r]-(o) "
+    "  WITH type(r) AS rel, count(r) AS total, "
+    "       collect({uid:o.uid, title:o.title, kind:head([l IN labels(o) WHERE l <> 'Entity'])})[..$lim] AS items "
+    "  ORDER BY total DESC "
+    "  RETURN collect(CASE WHEN rel IS NULL THEN NULL ELSE {rel:rel, count:total, items:items} END) AS incoming } "
+    "CALL { WITH n OPTIONAL MATCH (n)-[r]->(o) "
+    "  WITH type(r) AS rel, count(r) AS total, "
+    "       collect({uid:o.uid, title:o.title, kind:head([l IN labels(o) WHERE l <> 'Entity'])})[..$lim] AS items "
+    "  ORDER BY total DESC "
+    "  RETURN collect(CASE WHEN rel IS NULL THEN NULL ELSE {rel:rel, count:total, items:items} END) AS outgoing } "
+    "RETURN properties(n) AS props, labels(n) AS labels, incoming, outgoing"
+)
+
+def get_node_details(uid: str, limit_per_rel: int = 50) -> Dict:
     drv = get_driver()
-    data = {}
-    with drv.session() as s:
-        # Получаем свойства узла
-        res = s.run("MATCH (n {uid:$uid}) RETURN n", {"uid": uid}).single()
-        if not res:
-            return {}
-        
-        node = res["n"]
-        data = dict(node)
-        data["labels"] = list(node.labels)
-        # Kind
-        data["kind"] = list(node.labels)[0] if node.labels else "Unknown"
-        
-        # Получаем входящие связи
-        in_res = s.run("MATCH (n {uid:$uid})<-[r]-(other) RETURN type(r) as rel, other.uid as uid, other.title as title", {"uid": uid})
-        data["incoming"] = [{"rel": r["rel"], "uid": r["uid"], "title": r["title"]} for r in in_res]
-        
-        # Получаем исходящие связи
-        out_res = s.run("MATCH (n {uid:$uid})-[r]->(other) RETURN type(r) as rel, other.uid as uid, other.title as title", {"uid": uid})
-        data["outgoing"] = [{"rel": r["rel"], "uid": r["uid"], "title": r["title"]} for r in out_res]
-        
-    drv.close()
+    try:
+        with drv.session() as s:
+            res = s.run(NODE_DETAILS_QUERY, {"uid": uid, "lim": max(0, int(limit_per_rel))}).single()
+    finally:
+        drv.close()
+    if not res:
+        return {}
+    data = dict(res["props"] or {})
+    labels = list(res["labels"] or [])
+    data["labels"] = labels
+    data["kind"] = node_kind(labels)
+    for direction in ("incoming", "outgoing"):
+        groups = [dict(g) for g in (res[direction] or [])]
+        data[direction] = [{"rel": g["rel"], **it} for g in groups for it in g["items"]]
+        data[f"{direction}_groups"] = groups
+        data[f"{direction}_count"] = sum(int(g["count"]) for g in groups)
     return data
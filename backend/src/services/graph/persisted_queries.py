@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from graphql import ExecutionResult as GraphQLExecutionResult
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+from src.core.context import get_tenant_id
+from src.core.logging import logger
+from src.services.graph.versioning import current_graph_version
+try:
+    from prometheus_client import Counter
+    GRAPHQL_RESULT_CACHE_TOTAL = Counter("graphql_result_cache_total", "Persisted GraphQL query result cache lookups", ["result"])
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    GRAPHQL_RESULT_CACHE_TOTAL = _Dummy()
+
+PERSISTED_QUERIES_PATH = os.environ.get("GRAPHQL_PERSISTED_QUERIES", "")
+PERSISTED_QUERIES_MAX = int(os.environ.get("GRAPHQL_PERSISTED_QUERIES_MAX", "2000"))
+RESULT_CACHE_MAX = int(os.environ.get("GRAPHQL_RESULT_CACHE_MAX", "1000"))
+RESULT_CACHE_TTL_SEC = float(os.environ.get("GRAPHQL_RESULT_CACHE_TTL_SEC", "300"))
+
+class PersistedQueryNotFound(LookupError):
+    pass
+
+class PersistedQueryMismatch(ValueError):
+    pass
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+class PersistedQueryRegistry:
+    def __init__(self, maxsize: int = PERSISTED_QUERIES_MAX):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pinned: Dict[str, str] = {}
+        self._auto: "OrderedDict[str, str]" = OrderedDict()
+
+    def load_file(self, path: str) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        items = data.items() if isinstance(data, dict) else ((query_hash(q), q) for q in data)
+        n = 0
+        for h, q in items:
+            self.register(q, h, pinned=True)
+            n += 1
+        return n
+
+    def register(self, query: str, sha256: Optional[str] = None, pinned: bool = False) -> str:
+        h = query_hash(query)
+        if sha256 and sha256.lower() != h:
+            raise PersistedQueryMismatch("provided sha256Hash does not match query")
+        with self._lock:
+            if pinned:
+                self._pinned[h] = query
+            elif h not in self._pinned:
+                self._auto[h] = query
+                self._auto.move_to_end(h)
+                while len(self._auto) > self.maxsize:
+                    self._auto.popitem(last=False)
+        return h
+
+    def get(self, sha256: str) -> Optional[str]:
+        h = (sha256 or "").lower()
+        with self._lock:
+            q = self._pinned.get(h)
+            if q is None:
+                q = self._auto.get(h)
+                if q is not None:
+                    self._auto.move_to_end(h)
+            return q
+
+    def is_persisted(self, query: str) -> Optional[str]:
+        h = query_hash(query)
+        return h if self.get(h) == query else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pinned.clear()
+            self._auto.clear()
+
+    def __len__(self) -> int:
+        return len(self._pinned) + len(self._auto)
+
+def resolve_persisted_query(registry: PersistedQueryRegistry, query: Optional[str], extensions: Optional[Dict]) -> Optional[str]:
+    pq = (extensions or {}).get("persistedQuery") if isinstance(extensions, dict) else None
+    sha = (pq or {}).get("sha256Hash") if isinstance(pq, dict) else None
+    if not sha:
+        return query
+    if query:
+        registry.register(query, sha)
+        return query
+    found = registry.get(sha)
+    if found is None:
+        raise PersistedQueryNotFound("PersistedQueryNotFound")
+    return found
+
+class ResultCache:
+    def __init__(self, maxsize: int = RESULT_CACHE_MAX, ttl_sec: float = RESULT_CACHE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                self._items.pop(key, None)
+                return None
+            self._items.move_to_end(key)
+            return hit[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_sec, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+registry = PersistedQueryRegistry()
+result_cache = ResultCache()
+
+if PERSISTED_QUERIES_PATH:
+    try:
+        logger.info("graphql_persisted_queries_loaded", count=registry.load_file(PERSISTED_QUERIES_PATH), path=PERSISTED_QUERIES_PATH)
+    except Exception as e:
+        logger.warning("graphql_persisted_queries_load_failed", path=PERSISTED_QUERIES_PATH, error=str(e))
+
+def result_cache_key(query_sha: str, operation_name: Optional[str], variables: Optional[Dict], tenant_id: Optional[str]) -> Tuple:
+    vars_key = json.dumps(variables or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return (query_sha, operation_name or "", vars_key, tenant_id or "", current_graph_version(tenant_id))
+
+class PersistedResultCache(SchemaExtension):
+    def on_execute(self):
+        ec = self.execution_context
+        key = None
+        if ec.query and ec.operation_type == OperationType.QUERY:
+            sha = registry.is_persisted(ec.query)
+            if sha:
+                key = result_cache_key(sha, ec.operation_name, ec.variables, get_tenant_id())
+        if key is not None:
+            data = result_cache.get(key)
+            if data is not None:
+                GRAPHQL_RESULT_CACHE_TOTAL.labels(result="hit").inc()
+                ec.result = GraphQLExecutionResult(data=data, errors=None)
+                yield
+                return
+            GRAPHQL_RESULT_CACHE_TOTAL.labels(result="miss").inc()
+        yield
+        if key is not None and ec.result is not None and not ec.result.errors and ec.result.data is not None:
+            result_cache.set(key, ec.result.data)
@@ -1,11 +1,12 @@
 import os
 import json
-from typing import Dict, List
+from typing import Callable, Dict, List
 from neo4j import GraphDatabase
 from src.config.settings import settings
-from src.services.graph.neo4j_repo import Neo4jRepo, get_driver
+from src.services.graph.neo4j_repo import Neo4jRepo, get_driver, node_kind
 from src.services.kb.jsonl_io import load_jsonl, get_path
 from src.services.kb.jsonl_io import normalize_skill_topics_to_topic_skills
+from src.services.search.title_search import fulltext_index_statements, search_entities
 
 def compute_user_weight(base_weight: float, score: float) -> float:
     delta = (50.0 - float(score)) / 100.0
@@ -69,6 +70,69 @@ def ensure_constraints(session):
     session.run("CREATE CONSTRAINT skill_title_scope_unique IF NOT EXISTS FOR (n:Skill) REQUIRE (n.subject_uid, n.title) IS UNIQUE")
     session.run("CREATE INDEX example_title_idx IF NOT EXISTS FOR (n:Example) ON (n.title)")
     session.run("CREATE INDEX example_difficulty_idx IF NOT EXISTS FOR (n:Example) ON (n.difficulty)")
+    ensure_entity_indexes(session)
+    for stmt in fulltext_index_statements():
+        session.run(stmt)
+
+def ensure_entity_indexes(session):
+    session.run("CREATE INDEX entity_uid_idx IF NOT EXISTS FOR (n:Entity) ON (n.uid)")
+    session.run("CREATE INDEX entity_tenant_uid_idx IF NOT EXISTS FOR (n:Entity) ON (n.tenant_id, n.uid)")
+
+ENTITY_BACKFILL_SKIP_LABELS = ("Entity", "SourceChunk", "User")
+
+def _quote_label(label: str) -> str:
+    return "`" + label.replace("`", "``") + "`"
+
+def _ensure_uid_indexes(session, labels: List[str]) -> None:
+    # у основных меток индекс по uid дает ограничение уникальности; прочим нужен свой, иначе каждая порция сортирует всю метку
+    indexed = {
+        r["labels"][0]
+        for r in session.run("SHOW INDEXES YIELD entityType, labelsOrTypes, properties WHERE entityType = 'NODE' AND properties = ['uid'] RETURN labelsOrTypes AS labels")
+        if r["labels"]
+    }
+    missing = [l for l in labels if l not in indexed]
+    for label in missing:
+        session.run(f"CREATE INDEX IF NOT EXISTS FOR (n:{_quote_label(label)}) ON (n.uid)")
+    if missing:
+        session.run("CALL db.awaitIndexes(600)")
+
+def _label_uid_page(tx, label: str, after: str, batch: int):
+    return tx.run(
+        f"MATCH (n:{_quote_label(label)}) WHERE n.uid > $after WITH n ORDER BY n.uid LIMIT $batch "
+        "SET n:Entity RETURN count(n) AS c, max(n.uid) AS last",
+        after=after, batch=batch,
+    ).single()
+
+def backfill_entity_label(batch_size: int = 5000, max_batches: int | None = None, progress: Dict[str, Dict] | None = None, on_batch: Callable[[str, Dict], None] | None = None) -> Dict:
+    # каждая метка проходится по индексу uid от курсора: порция читает только свои узлы, а не сканирует граф заново,
+    # поэтому проход линеен; курсоры отдаются в on_batch, и прерванный запуск продолжается с того же места
+    progress = {k: dict(v) for k, v in (progress or {}).items()}
+    repo = Neo4jRepo()
+    scanned = 0
+    batches = 0
+    labels: List[str] = []
+    try:
+        with repo.driver.session() as session:
+            ensure_entity_indexes(session)
+            labels = sorted(r["label"] for r in session.run("CALL db.labels() YIELD label RETURN label") if r["label"] not in ENTITY_BACKFILL_SKIP_LABELS)
+            _ensure_uid_indexes(session, [l for l in labels if not progress.get(l, {}).get("done")])
+            for label in labels:
+                st = progress.setdefault(label, {"last_uid": "", "scanned": 0, "done": False})
+                while not st["done"] and (max_batches is None or batches < max_batches):
+                    rec = session.execute_write(_label_uid_page, label, st["last_uid"], int(batch_size))
+                    c = int(rec["c"]) if rec else 0
+                    if c:
+                        st["last_uid"] = rec["last"]
+                    st["scanned"] += c
+                    st["done"] = c < batch_size
+                    scanned += c
+                    batches += 1
+                    if on_batch is not None:
+                        on_batch(label, dict(st))
+    finally:
+        repo.close()
+    pending = [l for l in labels if not progress[l]["done"]]
+    return {"scanned": scanned, "batches": batches, "done": not pending, "pending": pending}
 
 def ensure_weight_defaults(session):
     session.run("MATCH (t:Topic) WHERE t.static_weight IS NULL SET t.static_weight = 0.5")
@@ -100,13 +164,13 @@ def sync_from_jsonl() -> Dict:
     with repo.driver.session() as session:
         ensure_constraints(session)
     ensure_weight_defaults_repo(repo)
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Subject {uid:r.uid}) SET n.title=r.title, n.description=COALESCE(r.description,'')", subjects, 500)
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Section {uid:r.uid}) SET n.title=r.title, n.description=COALESCE(r.description,'')", sections, 500)
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Topic {uid:r.uid}) SET n.title=r.title, n.description=COALESCE(r.description,'')", topics, 500)
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Skill {uid:r.uid}) SET n.title=r.title, n.definition=COALESCE(r.definition,'')", skills, 500)
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Method {uid:r.uid}) SET n.title=r.title, n.method_text=COALESCE(r.method_text,''), n.applicability_types=COALESCE(r.applicability_types,[])", methods, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Subject {uid:r.uid}) SET n:Entity, n.title=r.title, n.description=COALESCE(r.description,'')", subjects, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Section {uid:r.uid}) SET n:Entity, n.title=r.title, n.description=COALESCE(r.description,'')", sections, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Topic {uid:r.uid}) SET n:Entity, n.title=r.title, n.description=COALESCE(r.description,'')", topics, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Skill {uid:r.uid}) SET n:Entity, n.title=r.title, n.definition=COALESCE(r.definition,'')", skills, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Method {uid:r.uid}) SET n:Entity, n.title=r.title, n.method_text=COALESCE(r.method_text,''), n.applicability_types=COALESCE(r.applicability_types,[])", methods, 500)
     unit_rows = [{"uid": (u.get("uid") or f"UNIT-{u.get('topic_uid')}-{abs(hash((u.get('type') or '')+(u.get('branch') or '')))%100000}"), "topic_uid": u.get("topic_uid"), "branch": u.get("branch"), "type": u.get("type"), "payload": json.dumps(u.get("payload", {}), ensure_ascii=False), "complexity": float(u.get("complexity", 0.0) or 0.0)} for u in content_units if u.get("topic_uid")]
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:ContentUnit {uid:r.uid}) SET n.branch=r.branch, n.type=r.type, n.payload=r.payload, n.complexity=r.complexity", unit_rows, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:ContentUnit {uid:r.uid}) SET n:Entity, n.branch=r.branch, n.type=r.type, n.payload=r.payload, n.complexity=r.complexity", unit_rows, 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Subject {uid:r.subject_uid}), (b:Section {uid:r.uid}) MERGE (a)-[:CONTAINS]->(b)", [sec for sec in sections if sec.get('subject_uid')], 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Section {uid:r.section_uid}), (b:Topic {uid:r.uid}) MERGE (a)-[:CONTAINS]->(b)", [t for t in topics if t.get('section_uid')], 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Subject {uid:r.subject_uid}), (b:Skill {uid:r.uid}) MERGE (a)-[:HAS_SKILL]->(b)", [sk for sk in skills if sk.get('subject_uid')], 500)
@@ -124,10 +188,10 @@ def sync_from_jsonl() -> Dict:
     repo.write_unwind("UNWIND $rows AS r MATCH (t:Topic {uid:r.topic_uid}), (u:ContentUnit {uid:r.uid}) WHERE r.branch='repetition' MERGE (t)-[:HAS_MASTERY_PATH]->(u)", unit_rows, 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Skill {uid:r.skill_uid}), (b:Method {uid:r.method_uid}) MERGE (a)-[rel:LINKED]->(b) SET rel.weight=COALESCE(r.weight,'linked'), rel.confidence=COALESCE(r.confidence,0.9)", [sm for sm in skill_methods if sm.get('skill_uid') and sm.get('method_uid')], 500)
     goals_rows = [{"uid": g.get('uid') or f"GOAL-{g.get('topic_uid')}-{abs(hash(g.get('title','')))%100000}", "title": g.get('title'), "topic_uid": g.get('topic_uid')} for g in topic_goals]
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Goal {uid:r.uid}) SET n.title=r.title", goals_rows, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Goal {uid:r.uid}) SET n:Entity, n.title=r.title", goals_rows, 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Topic {uid:r.topic_uid}), (b:Goal {uid:r.uid}) MERGE (a)-[:TARGETS]->(b)", [g for g in goals_rows if g.get('topic_uid')], 500)
     objs_rows = [{"uid": o.get('uid') or f"OBJ-{o.get('topic_uid')}-{abs(hash(o.get('title','')))%100000}", "title": o.get('title'), "topic_uid": o.get('topic_uid')} for o in topic_objectives]
-    repo.write_unwind("UNWIND $rows AS r MERGE (n:Objective {uid:r.uid}) SET n.title=r.title", objs_rows, 500)
+    repo.write_unwind("UNWIND $rows AS r MERGE (n:Objective {uid:r.uid}) SET n:Entity, n.title=r.title", objs_rows, 500)
     repo.write_unwind("UNWIND $rows AS r MATCH (a:Topic {uid:r.topic_uid}), (b:Objective {uid:r.uid}) MERGE (a)-[:TARGETS]->(b)", [o for o in objs_rows if o.get('topic_uid')], 500)
     repo.close()
     return {'subjects': len(subjects), 'sections': len(sections), 'topics': len(topics), 'skills': len(skills), 'methods': len(methods), 'topic_skills': len(topic_skills), 'skill_methods': len(skill_methods), 'goals': len(topic_goals), 'objectives': len(topic_objectives), 'prereqs': len(topic_prereqs), 'content_units': len(content_units)}
@@ -430,10 +494,8 @@ def complete_user_skill(user_id: str, skill_uid: str, time_spent_sec: float, err
     return {"ok": True, "stored": False}
 
 def search_titles(q: str, limit: int = 20) -> List[Dict]:
-    repo = Neo4jRepo()
-    rows = repo.read("MATCH (n) WHERE toLower(n.title) CONTAINS toLower($q) RETURN n.uid AS uid, labels(n)[0] AS type, n.title AS title LIMIT $limit", {"q": q, "limit": int(limit)})
-    repo.close()
-    return rows
+    res = search_entities(q, limit=limit)
+    return [{"uid": it["uid"], "type": it["type"], "title": it["title"]} for it in res["items"]]
 
 def health() -> Dict:
     try:
@@ -472,41 +534,50 @@ def list_items(kind: str, subject_uid: str | None = None, section_uid: str | Non
 
 def get_node_details(uid: str) -> Dict:
     repo = Neo4jRepo()
-    rows = repo.read("MATCH (n) WHERE n.uid=$uid RETURN labels(n) AS labels, n.title AS title", {"uid": uid})
-    if not rows:
+    try:
+        rows = repo.read(
+            "MATCH (n:Entity {uid:$uid}) "
+            "RETURN labels(n) AS labels, n.title AS title, n.static_weight AS sw, n.dynamic_weight AS dw, "
+            "[(n)-[:TARGETS]->(g) | {uid:g.uid, title:g.title, objective:'Objective' IN labels(g)}] AS targets, "
+            "[(n)-[:PREREQ]->(p:Topic) | {uid:p.uid, title:p.title}] AS prereqs, "
+            "[(n)-[:USES_SKILL]->(:Skill)-[:LINKED]->(m:Method) | {uid:m.uid, title:m.title}] AS methods, "
+            "[(n)-[r:LINKED]->(m:Method) | {uid:m.uid, title:m.title, weight:r.weight}] AS linked_methods, "
+            "[(n)-[:CONTAINS]->(c:Topic) | {uid:c.uid, title:c.title}] AS topics, "
+            "[(n)-[:CONTAINS]->(c:Section) | {uid:c.uid, title:c.title}] AS sections, "
+            "[(n)-[:HAS_SKILL]->(sk:Skill) | {uid:sk.uid, title:sk.title}] AS skills",
+            {"uid": uid},
+        )
+    finally:
         repo.close()
+    if not rows:
         return {"found": False}
-    labels = rows[0]['labels']
-    typ = labels[0] if labels else None
-    details: Dict = {"found": True, "type": typ, "uid": uid, "title": rows[0]['title']}
+    row = rows[0]
+    labels = row['labels']
+    typ = node_kind(labels) if labels else None
+    details: Dict = {"found": True, "type": typ, "uid": uid, "title": row['title']}
     if typ == 'Topic':
-        wrows = repo.read("MATCH (t:Topic {uid:$uid}) RETURN t.static_weight AS sw, t.dynamic_weight AS dw", {"uid": uid})
-        if wrows:
-            details["static_weight"] = wrows[0]['sw']
-            details["dynamic_weight"] = wrows[0]['dw']
-        g = repo.read("MATCH (t:Topic {uid:$uid})-[:TARGETS]->(g) RETURN g.uid AS uid, g.title AS title, labels(g)[0] AS label", {"uid": uid})
-        details["targets"] = [{"uid": r['uid'], "title": r['title'], "type": ('objective' if r['label'] == 'Objective' else 'goal')} for r in g]
-        pr = repo.read("MATCH (t:Topic {uid:$uid})-[:PREREQ]->(p:Topic) RETURN p.uid AS uid, p.title AS title", {"uid": uid})
-        details["prereqs"] = pr
-        m = repo.read("MATCH (t:Topic {uid:$uid})-[:USES_SKILL]->(sk:Skill)-[:LINKED]->(m:Method) RETURN DISTINCT m.uid AS uid, m.title AS title", {"uid": uid})
-        details["methods"] = [{"uid": r['uid'], "title": r['title']} for r in m]
+        details["static_weight"] = row['sw']
+        details["dynamic_weight"] = row['dw']
+        details["targets"] = [{"uid": r['uid'], "title": r['title'], "type": ('objective' if r['objective'] else 'goal')} for r in row['targets']]
+        details["prereqs"] = row['prereqs']
+        methods: List[Dict] = []
+        seen = set()
+        for m in row['methods']:
+            if m['uid'] in seen:
+                continue
+            seen.add(m['uid'])
+            methods.append({"uid": m['uid'], "title": m['title']})
+        details["methods"] = methods
         details["summary"] = {"title": details["title"], "prereqs_count": len(details.get("prereqs", [])), "targets_count": len(details.get("targets", [])), "methods_count": len(details.get("methods", []))}
     elif typ == 'Skill':
-        wrows = repo.read("MATCH (s:Skill {uid:$uid}) RETURN s.static_weight AS sw, s.dynamic_weight AS dw", {"uid": uid})
-        if wrows:
-            details["static_weight"] = wrows[0]['sw']
-            details["dynamic_weight"] = wrows[0]['dw']
-        lm = repo.read("MATCH (s:Skill {uid:$uid})-[r:LINKED]->(m:Method) RETURN m.uid AS uid, m.title AS title, r.weight AS weight", {"uid": uid})
-        details["linked_methods"] = lm
+        details["static_weight"] = row['sw']
+        details["dynamic_weight"] = row['dw']
+        details["linked_methods"] = row['linked_methods']
     elif typ == 'Section':
-        t = repo.read("MATCH (sec:Section {uid:$uid})-[:CONTAINS]->(t:Topic) RETURN t.uid AS uid, t.title AS title", {"uid": uid})
-        details["topics"] = t
+        details["topics"] = row['topics']
     elif typ == 'Subject':
-        sec = repo.read("MATCH (s:Subject {uid:$uid})-[:CONTAINS]->(sec:Section) RETURN sec.uid AS uid, sec.title AS title", {"uid": uid})
-        sk = repo.read("MATCH (s:Subject {uid:$uid})-[:HAS_SKILL]->(sk:Skill) RETURN sk.uid AS uid, sk.title AS title", {"uid": uid})
-        details["sections"] = sec
-        details["skills"] = sk
-    repo.close()
+        details["sections"] = row['sections']
+        details["skills"] = row['skills']
     return details
 
 def fix_orphan_section(section_uid: str, subject_uid: str) -> Dict:
@@ -0,0 +1,36 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from src.config.settings import settings
+from src.db.pg import get_graph_version
+
+GRAPH_VERSION_TTL_SEC = 1.0
+_LOCK = threading.Lock()
+_CACHE: Dict[str, Tuple[float, int]] = {}
+
+def read_graph_version(tenant_id: Optional[str]) -> int:
+    if not str(settings.pg_dsn or ""):
+        return 0
+    try:
+        return get_graph_version(tenant_id or "default")
+    except Exception:
+        return 0
+
+def current_graph_version(tenant_id: Optional[str], max_age_sec: float = GRAPH_VERSION_TTL_SEC) -> int:
+    key = tenant_id or "default"
+    now = time.monotonic()
+    with _LOCK:
+        hit = _CACHE.get(key)
+    if hit is not None and now - hit[0] < max_age_sec:
+        return hit[1]
+    version = read_graph_version(tenant_id)
+    with _LOCK:
+        _CACHE[key] = (now, version)
+    return version
+
+def forget_graph_version(tenant_id: Optional[str] = None) -> None:
+    with _LOCK:
+        if tenant_id is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(tenant_id or "default", None)
@@ -1,82 +1,27 @@
 import os
 import json
-import requests
 import asyncio
 from typing import Dict, List, Tuple, Optional
-from src.config.settings import settings
-from .jsonl_io import load_jsonl, append_jsonl, rewrite_jsonl, get_path, tokens, make_uid, normalize_skill_topics_to_topic_skills, normalize_kb
+from src.core.logging import logger
+from src.services.llm.gateway import LLMError, chat as llm_chat, chat_sync as llm_chat_sync
+from .jsonl_io import JsonlBuffer, load_jsonl, append_jsonl, rewrite_jsonl, get_path, tokens, make_uid, normalize_skill_topics_to_topic_skills, normalize_kb
+from .pipeline import ProgressCallback, StagedPipeline
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def openai_chat(messages: List[Dict], model: str = 'gpt-4o-mini', temperature: float = 0.2) -> Dict:
-    def _load_env_file() -> None:
-        env_path = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), '.env')
-        if os.path.exists(env_path):
-            try:
-                with open(env_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        if '=' in line:
-                            k, v = line.split('=', 1)
-                            k = k.strip()
-                            v = v.strip().strip('"').strip("'")
-                            if k and v and k not in os.environ:
-                                os.environ[k] = v
-            except Exception:
-                pass
-    key = settings.openai_api_key.get_secret_value()
-    if not key:
-        _load_env_file()
-        key = settings.openai_api_key.get_secret_value()
-    if not key:
-        return {'ok': False, 'error': 'missing OPENAI_API_KEY'}
-    url = 'https://api.openai.com/v1/chat/completions'
-    headers = {'Authorization': f'Bearer {key}', 'Content-Type': 'application/json'}
-    payload = {'model': model, 'messages': messages, 'temperature': temperature}
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=60)
-    if r.status_code != 200:
-        return {'ok': False, 'error': r.text}
-    data = r.json()
-    content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-    return {'ok': True, 'content': content}
+    try:
+        res = llm_chat_sync(messages, model=model, temperature=temperature)
+    except LLMError as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'content': res['content']}
 
 async def openai_chat_async(messages: List[Dict], model: str = 'gpt-4o-mini', temperature: float = 0.2) -> Dict:
-    def _load_env_file() -> None:
-        env_path = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), '.env')
-        if os.path.exists(env_path):
-            try:
-                with open(env_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        if '=' in line:
-                            k, v = line.split('=', 1)
-                            k = k.strip()
-                            v = v.strip().strip('"').strip("'")
-                            if k and v and k not in os.environ:
-                                os.environ[k] = v
-            except Exception:
-                pass
-    key = settings.openai_api_key.get_secret_value()
-    if not key:
-        _load_env_file()
-        key = settings.openai_api_key.get_secret_value()
-    if not key:
-        return {'ok': False, 'error': 'missing OPENAI_API_KEY'}
-    url = 'https://api.openai.com/v1/chat/completions'
-    headers = {'Authorization': f'Bearer {key}', 'Content-Type': 'application/json'}
-    payload = {'model': model, 'messages': messages, 'temperature': temperature}
-    import httpx
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(url, headers=headers, json=payload)
-    if r.status_code != 200:
-        return {'ok': False, 'error': r.text}
-    data = r.json()
-    content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-    return {'ok': True, 'content': content}
+    try:
+        res = await llm_chat(messages, model=model, temperature=temperature)
+    except LLMError as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'content': res['content']}
 
 def generate_goals_and_objectives() -> Dict:
     topics = load_jsonl(get_path('topics.jsonl'))
@@ -136,8 +81,7 @@ def autolink_skills_methods(max_links_per_skill: int = 2) -> Dict:
         for muid, score, m in candidates:
             if (suid, muid) in existing_pairs:
                 continue
-            record = {'skill_uid': suid, 'method_uid': muid, 'weight': 'primary' if score >= 0.2 else 'secondary', 'confidence': round(min(0.95, 0.5 + score), 3), 'is_auto_generated': True}
-            append_jsonl(get_path('skill_methods.jsonl'), record)
+            link_skill_method(suid, muid, weight='primary' if score >= 0.2 else 'secondary', confidence=round(min(0.95, 0.5 + score), 3), is_auto_generated=True)
             existing_pairs.add((suid, muid))
             added += 1
             links += 1
@@ -145,47 +89,66 @@ def autolink_skills_methods(max_links_per_skill: int = 2) -> Dict:
                 break
     return {'added_links': added}
 
+# построители записей: схема каждого файла описана в одном месте, пишут их и add_*, и конвейер генерации через JsonlBuffer
+def subject_record(title: str, description: str = '', uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'subjects.jsonl', {'uid': uid or make_uid('SUB', title), 'title': title, 'description': description}
+
+def section_record(subject_uid: str, title: str, description: str = '', uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'sections.jsonl', {'uid': uid or make_uid('SEC', title), 'subject_uid': subject_uid, 'title': title, 'description': description}
+
+def topic_record(section_uid: str, title: str, description: str = '', uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'topics.jsonl', {'uid': uid or make_uid('TOP', title), 'section_uid': section_uid, 'title': title, 'description': description}
+
+def skill_record(subject_uid: str, title: str, definition: str = '', uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'skills.jsonl', {'uid': uid or make_uid('SKL', title), 'subject_uid': subject_uid, 'title': title, 'definition': definition}
+
+def method_record(title: str, method_text: str = '', applicability_types: Optional[List[str]] = None, uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'methods.jsonl', {'uid': uid or make_uid('MET', title), 'title': title, 'method_text': method_text, 'applicability_types': applicability_types or []}
+
+def example_record(title: str, statement: str = '', topic_uid: Optional[str] = None, difficulty: int = 3, uid: Optional[str] = None) -> Tuple[str, Dict]:
+    return 'examples.jsonl', {'uid': uid or make_uid('EX', title), 'title': title, 'statement': statement, 'topic_uid': topic_uid, 'difficulty': difficulty}
+
+def topic_skill_record(topic_uid: str, skill_uid: str, weight: str = 'linked', confidence: float = 0.9) -> Tuple[str, Dict]:
+    return 'topic_skills.jsonl', {'topic_uid': topic_uid, 'skill_uid': skill_uid, 'weight': weight, 'confidence': confidence}
+
+def skill_method_record(skill_uid: str, method_uid: str, weight: str = 'primary', confidence: float = 0.9, is_auto_generated: bool = False) -> Tuple[str, Dict]:
+    return 'skill_methods.jsonl', {'skill_uid': skill_uid, 'method_uid': method_uid, 'weight': weight, 'confidence': confidence, 'is_auto_generated': is_auto_generated}
+
+def _append(entry: Tuple[str, Dict]) -> Dict:
+    name, record = entry
+    append_jsonl(get_path(name), record)
+    return record
+
 def add_subject(title: str, description: str = '', uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('SUB', title)
-    append_jsonl(get_path('subjects.jsonl'), {'uid': uid, 'title': title, 'description': description})
-    return {'uid': uid}
+    return {'uid': _append(subject_record(title, description, uid))['uid']}
 
 def add_section(subject_uid: str, title: str, description: str = '', uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('SEC', title)
-    append_jsonl(get_path('sections.jsonl'), {'uid': uid, 'subject_uid': subject_uid, 'title': title, 'description': description})
-    return {'uid': uid}
+    return {'uid': _append(section_record(subject_uid, title, description, uid))['uid']}
 
 def add_topic(section_uid: str, title: str, description: str = '', uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('TOP', title)
-    append_jsonl(get_path('topics.jsonl'), {'uid': uid, 'section_uid': section_uid, 'title': title, 'description': description})
-    return {'uid': uid}
+    return {'uid': _append(topic_record(section_uid, title, description, uid))['uid']}
 
 def add_skill(subject_uid: str, title: str, definition: str = '', uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('SKL', title)
-    append_jsonl(get_path('skills.jsonl'), {'uid': uid, 'subject_uid': subject_uid, 'title': title, 'definition': definition})
-    return {'uid': uid}
+    return {'uid': _append(skill_record(subject_uid, title, definition, uid))['uid']}
 
 def add_method(title: str, method_text: str = '', applicability_types: Optional[List[str]] = None, uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('MET', title)
-    append_jsonl(get_path('methods.jsonl'), {'uid': uid, 'title': title, 'method_text': method_text, 'applicability_types': applicability_types or []})
-    return {'uid': uid}
+    return {'uid': _append(method_record(title, method_text, applicability_types, uid))['uid']}
 
 def link_topic_skill(topic_uid: str, skill_uid: str, weight: str = 'linked', confidence: float = 0.9) -> Dict:
-    append_jsonl(get_path('topic_skills.jsonl'), {'topic_uid': topic_uid, 'skill_uid': skill_uid, 'weight': weight, 'confidence': confidence})
+    _append(topic_skill_record(topic_uid, skill_uid, weight, confidence))
     return {'ok': True}
 
 def link_topic_skill_fallback(topic_uid: str, skill_uid: str, weight: str = 'linked', confidence: float = 0.9) -> Dict:
-    append_jsonl(get_path('skill_topics.jsonl'), {'topic_uid': topic_uid, 'skill_uid': skill_uid, 'weight': weight, 'confidence': confidence})
+    _, record = topic_skill_record(topic_uid, skill_uid, weight, confidence)
+    append_jsonl(get_path('skill_topics.jsonl'), record)
     return {'ok': True}
 
 def link_skill_method(skill_uid: str, method_uid: str, weight: str = 'primary', confidence: float = 0.9, is_auto_generated: bool = False) -> Dict:
-    append_jsonl(get_path('skill_methods.jsonl'), {'skill_uid': skill_uid, 'method_uid': method_uid, 'weight': weight, 'confidence': confidence, 'is_auto_generated': is_auto_generated})
+    _append(skill_method_record(skill_uid, method_uid, weight, confidence, is_auto_generated))
     return {'ok': True}
 
 def add_example(title: str, statement: str = '', topic_uid: Optional[str] = None, difficulty: int = 3, uid: Optional[str] = None) -> Dict:
-    uid = uid or make_uid('EX', title)
-    append_jsonl(get_path('examples.jsonl'), {'uid': uid, 'title': title, 'statement': statement, 'topic_uid': topic_uid, 'difficulty': difficulty})
-    return {'uid': uid}
+    return {'uid': _append(example_record(title, statement, topic_uid, difficulty, uid))['uid']}
 
 def link_topic_prereq(target_topic_uid: str, prereq_topic_uid: str, weight: float = 1.0) -> Dict:
     append_jsonl(get_path('topic_prereqs.jsonl'), {'target_uid': target_topic_uid, 'prereq_uid': prereq_topic_uid, 'weight': float(weight)})
@@ -273,8 +236,7 @@ def generate_examples_for_topic_openai(topic_uid: str, count: int = 3, difficult
     for l in lines:
         try:
             obj = json.loads(l)
-            ex_uid = make_uid('EX', obj.get('title','Example'))
-            append_jsonl(get_path('examples.jsonl'), {'uid': ex_uid, 'title': obj.get('title',''), 'statement': obj.get('statement',''), 'topic_uid': topic_uid, 'difficulty': difficulty})
+            add_example(obj.get('title',''), obj.get('statement',''), topic_uid=topic_uid, difficulty=difficulty, uid=make_uid('EX', obj.get('title','Example')))
             added += 1
             if added >= count:
                 break
@@ -300,8 +262,7 @@ def generate_methods_for_skill_openai(skill_uid: str, count: int = 3) -> Dict:
     for l in lines:
         try:
             obj = json.loads(l)
-            muid = make_uid('MET', obj.get('title','Method'))
-            append_jsonl(get_path('methods.jsonl'), {'uid': muid, 'title': obj.get('title',''), 'method_text': obj.get('method_text',''), 'applicability_types': []})
+            muid = add_method(obj.get('title',''), obj.get('method_text',''), uid=make_uid('MET', obj.get('title','Method')))['uid']
             link_skill_method(skill_uid, muid, weight='core', confidence=0.9, is_auto_generated=True)
             created_method_uids.append(muid)
             added += 1
@@ -326,7 +287,7 @@ async def generate_sections_openai_async(subject_title: str, language: str, coun
     ]
     res = await openai_chat_async(messages)
     if not res.get('ok'):
-        return []
+        raise LLMError(res.get('error') or 'LLM request failed')
     titles: List[str] = []
     for l in [x for x in res.get('content', '').splitlines() if x.strip()]:
         try:
@@ -345,7 +306,7 @@ async def generate_topics_for_section_openai_async(section_title: str, language:
     ]
     res = await openai_chat_async(messages)
     if not res.get('ok'):
-        return []
+        raise LLMError(res.get('error') or 'LLM request failed')
     items: List[Dict] = []
     for l in [x for x in res.get('content', '').splitlines() if x.strip()]:
         try:
@@ -364,7 +325,7 @@ async def generate_skills_for_topic_openai_async(topic_title: str, language: str
     ]
     res = await openai_chat_async(messages)
     if not res.get('ok'):
-        return []
+        raise LLMError(res.get('error') or 'LLM request failed')
     items: List[Dict] = []
     for l in [x for x in res.get('content', '').splitlines() if x.strip()]:
         try:
@@ -383,7 +344,7 @@ async def generate_methods_for_skill_openai_async(skill_title: str, count: int =
     ]
     res = await openai_chat_async(messages)
     if not res.get('ok'):
-        return []
+        raise LLMError(res.get('error') or 'LLM request failed')
     items: List[Dict] = []
     for l in [x for x in res.get('content', '').splitlines() if x.strip()]:
         try:
@@ -402,7 +363,7 @@ async def generate_examples_for_topic_openai_async(topic_title: str, count: int
     ]
     res = await openai_chat_async(messages)
     if not res.get('ok'):
-        return []
+        raise LLMError(res.get('error') or 'LLM request failed')
     items: List[Dict] = []
     for l in [x for x in res.get('content', '').splitlines() if x.strip()]:
         try:
@@ -414,39 +375,88 @@ async def generate_examples_for_topic_openai_async(topic_title: str, count: int
             continue
     return items
 
-async def generate_subject_openai_async(subject_uid: str, subject_title: str, language: str, sections_seed: Optional[List[str]] = None, topics_per_section: int = 6, skills_per_topic: int = 3, methods_per_skill: int = 2, examples_per_topic: int = 3, concurrency: int = 4) -> Dict:
-    add_subject(subject_title, uid=subject_uid)
-    sec_titles = sections_seed or await generate_sections_openai_async(subject_title, language, count=5)
-    sec_uids: List[str] = []
-    for st in sec_titles:
-        sec = add_section(subject_uid, st)
-        sec_uids.append(sec['uid'])
-    topic_defs: List[Tuple[str, Dict]] = []
-    for st, suid in zip(sec_titles, sec_uids):
-        tdefs = await generate_topics_for_section_openai_async(st, language, count=topics_per_section)
+async def generate_subject_openai_async(subject_uid: str, subject_title: str, language: str, sections_seed: Optional[List[str]] = None, topics_per_section: int = 6, skills_per_topic: int = 3, methods_per_skill: int = 2, examples_per_topic: int = 3, concurrency: int = 4, on_progress: Optional[ProgressCallback] = None) -> Dict:
+    # разделы -> темы -> (навыки -> методы, примеры): каждая стадия берет работу из своей очереди,
+    # concurrency - общий бюджет одновременных запросов к LLM на все стадии
+    pipe = StagedPipeline(budget=concurrency, on_progress=on_progress)
+    buf = JsonlBuffer()
+    counts = {'sections': 0, 'topics': 0}
+
+    async def write(entry: Tuple[str, Dict]) -> Dict:
+        name, record = entry
+        if buf.add(name, record):
+            await asyncio.to_thread(buf.flush)
+        return record
+
+    async def section_stage(title: str) -> None:
+        suid = (await write(section_record(subject_uid, title)))['uid']
+        counts['sections'] += 1
+        await pipe.put('topics', (suid, title))
+
+    async def topic_stage(item: Tuple[str, str]) -> None:
+        suid, title = item
+        async with pipe.budget:
+            tdefs = await generate_topics_for_section_openai_async(title, language, count=topics_per_section)
         for td in tdefs:
-            tuid = add_topic(suid, td['title'], td.get('description',''))['uid']
-            topic_defs.append((tuid, td))
-    sem = asyncio.Semaphore(concurrency)
-    async def process_topic(tuid: str, td: Dict):
-        async with sem:
+            tuid = (await write(topic_record(suid, td['title'], td.get('description', ''))))['uid']
+            counts['topics'] += 1
+            await pipe.put('skills', (tuid, td))
+            await pipe.put('examples', (tuid, td))
+
+    async def skill_stage(item: Tuple[str, Dict]) -> None:
+        tuid, td = item
+        async with pipe.budget:
             skills = await generate_skills_for_topic_openai_async(td['title'], language, count=skills_per_topic)
-            for sk in skills:
-                suid = add_skill(subject_uid, sk['title'], sk.get('definition',''))['uid']
-                append_jsonl(get_path('topic_skills.jsonl'), {'topic_uid': tuid, 'skill_uid': suid, 'weight': 'core', 'confidence': 0.9})
-                methods = await generate_methods_for_skill_openai_async(sk['title'], count=methods_per_skill)
-                for m in methods:
-                    muid = make_uid('MET', m['title'])
-                    append_jsonl(get_path('methods.jsonl'), {'uid': muid, 'title': m['title'], 'method_text': m['method_text'], 'applicability_types': []})
-                    link_skill_method(suid, muid, weight='primary', confidence=0.9, is_auto_generated=True)
+        for sk in skills:
+            skuid = (await write(skill_record(subject_uid, sk['title'], sk.get('definition', ''))))['uid']
+            await write(topic_skill_record(tuid, skuid, weight='core', confidence=0.9))
+            await pipe.put('methods', (skuid, sk))
+
+    async def example_stage(item: Tuple[str, Dict]) -> None:
+        tuid, td = item
+        async with pipe.budget:
             examples = await generate_examples_for_topic_openai_async(td['title'], count=examples_per_topic, difficulty=3)
-            for ex in examples:
-                ex_uid = make_uid('EX', ex['title'])
-                append_jsonl(get_path('examples.jsonl'), {'uid': ex_uid, 'title': ex['title'], 'statement': ex['statement'], 'topic_uid': tuid, 'difficulty': ex['difficulty']})
-    await asyncio.gather(*[process_topic(tu, td) for tu, td in topic_defs])
+        for ex in examples:
+            await write(example_record(ex['title'], ex['statement'], topic_uid=tuid, difficulty=ex['difficulty']))
+
+    async def method_stage(item: Tuple[str, Dict]) -> None:
+        skuid, sk = item
+        async with pipe.budget:
+            methods = await generate_methods_for_skill_openai_async(sk['title'], count=methods_per_skill)
+        for m in methods:
+            muid = (await write(method_record(m['title'], m['method_text'])))['uid']
+            await write(skill_method_record(skuid, muid, weight='primary', confidence=0.9, is_auto_generated=True))
+
+    pipe.stage('sections', section_stage, workers=1)
+    pipe.stage('topics', topic_stage)
+    pipe.stage('skills', skill_stage)
+    pipe.stage('examples', example_stage)
+    pipe.stage('methods', method_stage)
+
+    async def source() -> None:
+        await write(subject_record(subject_title, uid=subject_uid))
+        titles = sections_seed
+        if not titles:
+            try:
+                async with pipe.budget:
+                    titles = await generate_sections_openai_async(subject_title, language, count=5)
+            except LLMError as e:
+                await pipe.fail('sections', e)
+                return
+        for st in titles:
+            await pipe.put('sections', st)
+
+    try:
+        stages = await pipe.run(source)
+    finally:
+        await asyncio.to_thread(buf.flush)
     generate_goals_and_objectives()
     normalize_kb()
-    return {'ok': True, 'subjects': 1, 'sections': len(sec_uids), 'topics': len(topic_defs)}
+    # сбои отдельных элементов не останавливают остальные стадии, но результат тогда неполный
+    failed = {n: st['failed'] for n, st in stages.items() if st['failed']}
+    if failed:
+        logger.warning('kb_generate_subject_incomplete', subject_uid=subject_uid, failed=failed)
+    return {'ok': not failed, 'subjects': 1, 'sections': counts['sections'], 'topics': counts['topics'], 'records': buf.written, 'stages': stages, 'failed': failed}
 
 def rebuild_subject_math_with_openai(section_title: str = 'Generated Section') -> Dict:
     subject_uid = 'SUB-MATH'
@@ -1,12 +1,14 @@
 import os
 import json
 import re
+import threading
 import uuid
 from typing import Dict, List, Tuple, Set, Optional
 from src.utils.atomic_write import write_jsonl_atomic
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 KB_DIR = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'kb')
+JSONL_FLUSH_BATCH = int(os.environ.get('KB_JSONL_FLUSH_BATCH', '200'))
 
 def load_jsonl(filepath: str) -> List[Dict]:
     data: List[Dict] = []
@@ -24,13 +26,45 @@ def load_jsonl(filepath: str) -> List[Dict]:
     return data
 
 def append_jsonl(filepath: str, record: Dict) -> None:
+    append_jsonl_many(filepath, [record])
+
+def append_jsonl_many(filepath: str, records: List[Dict]) -> None:
+    # файл переписывается атомарно целиком, поэтому пачка записей стоит столько же, сколько одна
+    if not records:
+        return
     items = load_jsonl(filepath)
-    items.append(record)
+    items.extend(records)
     def _validate(rec: Dict) -> None:
         if not isinstance(rec, dict):
             raise ValueError("record must be dict")
     write_jsonl_atomic(filepath, items, _validate)
 
+class JsonlBuffer:
+    # копит записи по файлам и сбрасывает их пачками через append_jsonl_many
+    def __init__(self, batch_size: int = JSONL_FLUSH_BATCH):
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self._pending: Dict[str, List[Dict]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def add(self, name: str, record: Dict) -> bool:
+        with self._lock:
+            self._pending.setdefault(name, []).append(record)
+            self._size += 1
+            return self._size >= self.batch_size
+
+    def flush(self) -> int:
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending, self._size = self._pending, {}, 0
+            for name, records in pending.items():
+                append_jsonl_many(get_path(name), records)
+            n = sum(len(r) for r in pending.values())
+            self.written += n
+            return n
+
 def rewrite_jsonl(filepath: str, records: List[Dict]) -> None:
     def _validate(rec: Dict) -> None:
         if not isinstance(rec, dict):
@@ -0,0 +1,92 @@
+import asyncio
+import inspect
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from src.core.logging import logger
+
+KB_GEN_QUEUE_SIZE = int(os.environ.get('KB_GEN_QUEUE_SIZE', '32'))
+
+ProgressCallback = Callable[[str, Dict], Any]
+
+class _Stage:
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[None]], workers: int, maxsize: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+        self.stats = {'queued': 0, 'done': 0, 'failed': 0}
+
+class StagedPipeline:
+    # стадии соединены ограниченными очередями: медленная стадия притормаживает предыдущие, а не копит работу в памяти;
+    # все вызовы LLM из любых стадий делят один семафор budget
+    def __init__(self, budget: int = 4, queue_size: int = KB_GEN_QUEUE_SIZE, on_progress: Optional[ProgressCallback] = None):
+        self.workers = max(1, budget)
+        self.budget = asyncio.Semaphore(self.workers)
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self._stages: Dict[str, _Stage] = {}
+        self._order: List[str] = []
+
+    def stage(self, name: str, handler: Callable[[Any], Awaitable[None]], workers: Optional[int] = None) -> None:
+        # стадии объявляются в порядке потока данных: стадия может передавать работу только объявленным после нее
+        self._stages[name] = _Stage(name, handler, workers or self.workers, self.queue_size)
+        self._order.append(name)
+
+    async def put(self, name: str, item: Any) -> None:
+        st = self._stages[name]
+        st.stats['queued'] += 1
+        await st.queue.put(item)
+
+    async def fail(self, name: str, error: Exception) -> None:
+        # элемент, который не удалось даже поставить в очередь (например, source не получил список разделов)
+        st = self._stages[name]
+        st.stats['queued'] += 1
+        st.stats['failed'] += 1
+        logger.warning('kb_pipeline_item_failed', stage=name, error=str(error))
+        await self._report(st)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {n: dict(self._stages[n].stats) for n in self._order}
+
+    async def _report(self, st: _Stage) -> None:
+        if self.on_progress is None:
+            return
+        res = self.on_progress(st.name, dict(st.stats))
+        if inspect.isawaitable(res):
+            await res
+
+    async def _worker(self, st: _Stage) -> None:
+        while True:
+            item = await st.queue.get()
+            if item is _STOP:
+                return
+            try:
+                await st.handler(item)
+                st.stats['done'] += 1
+            except Exception as e:
+                st.stats['failed'] += 1
+                logger.warning('kb_pipeline_item_failed', stage=st.name, error=str(e))
+            await self._report(st)
+
+    async def run(self, source: Callable[[], Awaitable[None]]) -> Dict[str, Dict[str, int]]:
+        # source наполняет первые стадии через put; воркеры уже запущены, поэтому ограниченные очереди не блокируют его навсегда
+        t0 = time.perf_counter()
+        tasks = {n: [asyncio.create_task(self._worker(self._stages[n])) for _ in range(self._stages[n].workers)] for n in self._order}
+        try:
+            await source()
+            # стадия закрывается, когда завершены все предыдущие: больше работы в нее прийти не может
+            for n in self._order:
+                st = self._stages[n]
+                for _ in tasks[n]:
+                    await st.queue.put(_STOP)
+                await asyncio.gather(*tasks[n])
+                logger.info('kb_pipeline_stage_done', stage=n, elapsed_ms=round((time.perf_counter() - t0) * 1000, 1), **st.stats)
+        except BaseException:
+            for ts in tasks.values():
+                for t in ts:
+                    t.cancel()
+            raise
+        return self.stats()
+
+_STOP = object()
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from src.core.canonical import canonical_hash_from_json, normalize_text
+from src.core.logging import logger
+from src.services.graph.versioning import current_graph_version
+try:
+    from prometheus_client import Counter
+    LLM_CACHE_TOTAL = Counter("llm_answer_cache_total", "LLM answer cache lookups", ["tier", "result"])
+    LLM_CACHE_SAVED_MS = Counter("llm_answer_cache_saved_ms_total", "LLM latency avoided by answer cache hits, ms")
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+    LLM_CACHE_TOTAL = _Dummy()
+    LLM_CACHE_SAVED_MS = _Dummy()
+
+LLM_CACHE_MAX = int(os.environ.get("LLM_CACHE_MAX", "2000"))
+LLM_CACHE_TTL_SEC = float(os.environ.get("LLM_CACHE_TTL_SEC", str(24 * 3600)))
+LLM_CACHE_REDIS = os.environ.get("LLM_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+
+def answer_key(tenant_id: Optional[str], graph_version: int, model: str, messages: List[Dict]) -> str:
+    # промпт полностью определяется вопросом и контекстом связи; версия графа в ключе отсекает ответы по устаревшим данным
+    norm = [{"role": m.get("role", ""), "content": normalize_text(str(m.get("content", "")))} for m in messages]
+    return f"{tenant_id or 'default'}:{graph_version}:{canonical_hash_from_json({'model': model, 'messages': norm})}"
+
+class AnswerCache:
+    def __init__(self, maxsize: int = LLM_CACHE_MAX, ttl_sec: float = LLM_CACHE_TTL_SEC, redis=None, prefix: str = "llm:answer:"):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self.redis = redis
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def _local_get(self, key: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                self._items.pop(key, None)
+                return None
+            self._items.move_to_end(key)
+            return hit[1]
+
+    def _local_set(self, key: str, value: Dict, ttl_sec: float) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl_sec, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self._local_get(key)
+        LLM_CACHE_TOTAL.labels(tier="local", result="hit" if value is not None else "miss").inc()
+        if value is not None or self.redis is None:
+            return value
+        try:
+            raw = self.redis.get(self.prefix + key)
+            ttl = self.redis.ttl(self.prefix + key) if raw else -1
+        except Exception as e:
+            logger.warning("llm_answer_cache_read_failed", error=str(e))
+            return None
+        LLM_CACHE_TOTAL.labels(tier="redis", result="hit" if raw else "miss").inc()
+        if not raw:
+            return None
+        value = json.loads(raw)
+        self._local_set(key, value, ttl if ttl and ttl > 0 else self.ttl_sec)
+        return value
+
+    def set(self, key: str, value: Dict) -> None:
+        self._local_set(key, value, self.ttl_sec)
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=max(1, int(self.ttl_sec)))
+        except Exception as e:
+            logger.warning("llm_answer_cache_write_failed", error=str(e))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                redis = None
+                if LLM_CACHE_REDIS:
+                    try:
+                        from src.events.publisher import get_redis
+                        redis = get_redis()
+                    except Exception as e:
+                        logger.warning("llm_answer_cache_redis_unavailable", error=str(e))
+                _cache = AnswerCache(redis=redis)
+    return _cache
+
+def cache_directives(cache_control: Optional[str]) -> Tuple[bool, bool]:
+    # no-cache: не читать из кэша, но сохранить свежий ответ; no-store: не трогать кэш вовсе
+    parts = {p.strip().lower() for p in (cache_control or "").split(",")}
+    no_store = "no-store" in parts
+    return ("no-cache" in parts or no_store), no_store
+
+async def _lookup(tenant_id: Optional[str], model: str, messages: List[Dict], cache_control: Optional[str], cache: AnswerCache) -> Tuple[str, Optional[Dict], bool]:
+    skip_read, skip_write = cache_directives(cache_control)
+    version = await asyncio.to_thread(current_graph_version, tenant_id)
+    key = answer_key(tenant_id, version, model, messages)
+    hit = None if skip_read else await asyncio.to_thread(cache.get, key)
+    if hit is not None:
+        LLM_CACHE_SAVED_MS.inc(float(hit.get("latency_ms") or 0))
+    return key, hit, skip_write
+
+async def cached_answer(
+    tenant_id: Optional[str],
+    model: str,
+    messages: List[Dict],
+    ask: Callable[[], Awaitable[Dict]],
+    cache_control: Optional[str] = None,
+    cache: Optional[AnswerCache] = None,
+) -> Tuple[Dict, bool]:
+    cache = cache or get_answer_cache()
+    key, hit, skip_write = await _lookup(tenant_id, model, messages, cache_control, cache)
+    if hit is not None:
+        return {"answer": hit.get("answer", ""), "usage": hit.get("usage")}, True
+    t0 = time.perf_counter()
+    res = await ask()
+    latency_ms = (time.perf_counter() - t0) * 1000
+    if not skip_write and res.get("answer"):
+        await asyncio.to_thread(cache.set, key, {"answer": res["answer"], "usage": res.get("usage"), "latency_ms": round(latency_ms, 1)})
+    return res, False
+
+async def streamed_answer(
+    tenant_id: Optional[str],
+    model: str,
+    messages: List[Dict],
+    stream: Callable[[], AsyncIterator[Dict]],
+    cache_control: Optional[str] = None,
+    cache: Optional[AnswerCache] = None,
+) -> Tuple[AsyncIterator[Dict], bool]:
+    # то же, что cached_answer, но для потоковой выдачи: попадание отдается одним фрагментом,
+    # промах кэшируется только если поток дошел до конца
+    cache = cache or get_answer_cache()
+    key, hit, skip_write = await _lookup(tenant_id, model, messages, cache_control, cache)
+    if hit is not None:
+        return _replay(hit), True
+    return _record(stream(), key, cache, skip_write), False
+
+async def _replay(hit: Dict) -> AsyncIterator[Dict]:
+    answer = hit.get("answer", "")
+    yield {"delta": answer}
+    yield {"done": True, "content": answer, "usage": hit.get("usage")}
+
+async def _record(items: AsyncIterator[Dict], key: str, cache: AnswerCache, skip_write: bool) -> AsyncIterator[Dict]:
+    t0 = time.perf_counter()
+    try:
+        async for item in items:
+            if item.get("done") and not skip_write and item.get("content"):
+                latency_ms = (time.perf_counter() - t0) * 1000
+                await asyncio.to_thread(cache.set, key, {"answer": item["content"], "usage": item.get("usage"), "latency_ms": round(latency_ms, 1)})
+            yield item
+    finally:
+        await items.aclose()  # type: ignore
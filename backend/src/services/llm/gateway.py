@@ -0,0 +1,402 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import httpx
+from src.config.settings import settings
+from src.core.logging import logger
+from src.services.embeddings.provider import approx_tokens
+try:
+    from prometheus_client import Counter, Histogram
+    LLM_REQUESTS_TOTAL = Counter("llm_requests_total", "LLM gateway requests", ["model", "result"])
+    LLM_RETRIES_TOTAL = Counter("llm_retries_total", "LLM gateway retries", ["reason"])
+    LLM_REQUEST_MS = Histogram("llm_request_ms", "LLM request latency ms", ["model"])
+    LLM_WAIT_MS = Histogram("llm_wait_ms", "Time spent waiting for LLM concurrency slots and rate limit, ms")
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+        def observe(self, *args, **kwargs): ...
+    LLM_REQUESTS_TOTAL = _Dummy()
+    LLM_RETRIES_TOTAL = _Dummy()
+    LLM_REQUEST_MS = _Dummy()
+    LLM_WAIT_MS = _Dummy()
+
+LLM_API_URL = os.environ.get("LLM_API_URL", "https://api.openai.com/v1/chat/completions")
+LLM_DEFAULT_MODEL = os.environ.get("LLM_DEFAULT_MODEL", "gpt-4o-mini")
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_TENANT_CONCURRENCY = int(os.environ.get("LLM_TENANT_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_TIMEOUT_SEC = float(os.environ.get("LLM_TIMEOUT_SEC", "60"))
+# стартовые лимиты до первого ответа; дальше их уточняют заголовки x-ratelimit-*
+LLM_RPM = float(os.environ.get("LLM_RPM", "500"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "200000"))
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.environ.get("LLM_COMPLETION_TOKENS_ESTIMATE", "512"))
+
+class LLMError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class LLMUnavailable(LLMError):
+    # ключ не задан, нет связи, 401/403, исчерпаны повторы на 429/5xx: проблема на стороне провайдера, а не запроса
+    pass
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SEC = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    # формат OpenAI: "1s", "6m0s", "20ms"
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(n) * _UNIT_SEC[u] for n, u in parts)
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_sec: float):
+        self.capacity = float(capacity)
+        self.per_sec = float(per_sec)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_sec)
+        self.updated = now
+
+    def wait(self, cost: float) -> float:
+        # сколько ждать, пока в ведре наберется cost; 0 - можно списывать сейчас
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.per_sec if self.per_sec > 0 else 1.0
+
+    def take(self, cost: float) -> None:
+        self.tokens -= min(cost, self.capacity)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float], reset_sec: Optional[float]) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+            self.per_sec = float(limit) / 60.0
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0 and reset_sec:
+                self.pause(reset_sec)
+
+    def pause(self, sec: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + sec)
+
+def _num(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class LLMGateway:
+    # один клиент и одни лимиты на процесс; корутины выполняются в собственном цикле событий в фоновом потоке,
+    # поэтому пул соединений и семафоры общие для FastAPI, arq-воркера и синхронных скриптов
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: str = LLM_API_URL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tenant_concurrency: int = LLM_TENANT_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        timeout: float = LLM_TIMEOUT_SEC,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key if api_key is not None else settings.openai_api_key.get_secret_value()
+        self.url = url
+        self.max_concurrency = max(1, max_concurrency)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self._transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tenant_slots: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    t = threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True)
+                    t.start()
+                    self._thread = t
+                    self._loop = loop
+        return self._loop
+
+    def _client_in_loop(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=limits,
+                transport=self._transport,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _tenant_slot(self, tenant_id: Optional[str]) -> asyncio.Semaphore:
+        key = tenant_id or "default"
+        sem = self._tenant_slots.get(key)
+        if sem is None:
+            sem = self._tenant_slots[key] = asyncio.Semaphore(self.tenant_concurrency)
+        return sem
+
+    async def _take(self, cost: float) -> None:
+        # все корутины шлюза живут в одном цикле: между проверкой и списанием нет переключений
+        while True:
+            wait = max(self.requests.wait(1), self.tokens.wait(cost))
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(cost)
+                return
+            await asyncio.sleep(min(wait, 5.0))
+
+    def _observe(self, headers: httpx.Headers) -> None:
+        self.requests.observe(_num(headers.get("x-ratelimit-limit-requests")), _num(headers.get("x-ratelimit-remaining-requests")), parse_reset(headers.get("x-ratelimit-reset-requests")))
+        self.tokens.observe(_num(headers.get("x-ratelimit-limit-tokens")), _num(headers.get("x-ratelimit-remaining-tokens")), parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+    async def _send(self, body: Dict, tenant_id: Optional[str], consume: Callable[[httpx.Response], Awaitable[Dict]]) -> Dict:
+        if not self.api_key:
+            raise LLMUnavailable("OPENAI_API_KEY is not configured")
+        client = self._client_in_loop()
+        model = body.get("model", LLM_DEFAULT_MODEL)
+        cost = sum(approx_tokens(str(m.get("content", ""))) for m in body.get("messages", [])) + int(body.get("max_tokens") or LLM_COMPLETION_TOKENS_ESTIMATE)
+        attempt = 0
+        while True:
+            t0 = time.perf_counter()
+            result = error = None
+            async with self._tenant_slot(tenant_id), self._slots:  # type: ignore
+                await self._take(cost)
+                LLM_WAIT_MS.observe((time.perf_counter() - t0) * 1000)
+                t1 = time.perf_counter()
+                r = opened = None
+                try:
+                    r = opened = await client.send(client.build_request("POST", self.url, json=body), stream=True)
+                    self._observe(r.headers)
+                    if r.status_code == 200:
+                        result = await consume(r)
+                    else:
+                        await r.aread()
+                except httpx.TransportError as e:
+                    r, error = None, e
+                finally:
+                    # при отмене (клиент отключился) соединение закрывается здесь и возвращается в пул
+                    if opened is not None:
+                        await opened.aclose()
+                LLM_REQUEST_MS.labels(model=model).observe((time.perf_counter() - t1) * 1000)
+            if result is not None:
+                LLM_REQUESTS_TOTAL.labels(model=model, result="ok").inc()
+                return result
+            status = r.status_code if r is not None else None
+            retryable = status is None or status == 429 or status >= 500
+            attempt += 1
+            if not retryable or attempt > self.max_retries:
+                LLM_REQUESTS_TOTAL.labels(model=model, result=str(status or "transport")).inc()
+                detail = str(error) if error is not None else r.text[:500]  # type: ignore
+                logger.warning("llm_request_failed", model=model, status=status, attempts=attempt, tenant_id=tenant_id, error=detail)
+                if status in (401, 403) or retryable:
+                    raise LLMUnavailable(detail, status=status)
+                raise LLMError(detail, status=status)
+            LLM_RETRIES_TOTAL.labels(reason=str(status or "transport")).inc()
+            delay = min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random() / 2)
+            retry_after = _num(r.headers.get("retry-after")) if r is not None else None
+            if retry_after:
+                delay = max(delay, retry_after)
+            if status == 429:
+                self.requests.pause(delay)
+            await asyncio.sleep(delay)
+
+    async def _chat(self, body: Dict, tenant_id: Optional[str]) -> Dict:
+        model = body.get("model", LLM_DEFAULT_MODEL)
+
+        async def consume(r: httpx.Response) -> Dict:
+            await r.aread()
+            data = r.json()
+            choice = (data.get("choices") or [{}])[0]
+            return {"content": (choice.get("message") or {}).get("content") or "", "usage": data.get("usage"), "model": data.get("model", model)}
+
+        return await self._send(body, tenant_id, consume)
+
+    async def _stream(self, body: Dict, tenant_id: Optional[str], emit: Callable[[Dict], None]) -> Dict:
+        model = body.get("model", LLM_DEFAULT_MODEL)
+
+        async def consume(r: httpx.Response) -> Dict:
+            parts: List[str] = []
+            usage = None
+            model_name = model
+            try:
+                async for line in r.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            emit({"delta": delta})
+                    model_name = chunk.get("model") or model_name
+            except httpx.TransportError as e:
+                # часть ответа уже отдана клиенту: повторять запрос нельзя
+                if parts:
+                    raise LLMUnavailable(f"stream interrupted: {e}") from e
+                raise
+            return {"content": "".join(parts), "usage": usage, "model": model_name}
+
+        return await self._send(body, tenant_id, consume)
+
+    def _submit(self, body: Dict, tenant_id: Optional[str]):
+        return asyncio.run_coroutine_threadsafe(self._chat(body, tenant_id), self._ensure_loop())
+
+    async def chat(
+        self,
+        messages: List[Dict],
+        model: str = LLM_DEFAULT_MODEL,
+        tenant_id: Optional[str] = None,
+        temperature: Optional[float] = None,
+        response_format: Optional[Dict] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict:
+        body = _body(messages, model, temperature, response_format, max_tokens)
+        return await asyncio.wrap_future(self._submit(body, tenant_id))
+
+    def chat_sync(
+        self,
+        messages: List[Dict],
+        model: str = LLM_DEFAULT_MODEL,
+        tenant_id: Optional[str] = None,
+        temperature: Optional[float] = None,
+        response_format: Optional[Dict] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict:
+        body = _body(messages, model, temperature, response_format, max_tokens)
+        return self._submit(body, tenant_id).result()
+
+    async def stream(
+        self,
+        messages: List[Dict],
+        model: str = LLM_DEFAULT_MODEL,
+        tenant_id: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[Dict]:
+        # отдает {"delta": ...} по мере генерации и в конце {"done": True, "content", "usage", "model"};
+        # закрытие генератора отменяет запрос в цикле шлюза и освобождает слот
+        body = _body(messages, model, temperature, None, max_tokens)
+        body["stream"] = True
+        body["stream_options"] = {"include_usage": True}
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def put(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass
+
+        fut = asyncio.run_coroutine_threadsafe(self._stream(body, tenant_id, put), self._ensure_loop())
+        fut.add_done_callback(lambda f: put(_DONE))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            yield {"done": True, **fut.result()}
+        finally:
+            if not fut.done():
+                fut.cancel()
+                logger.info("llm_stream_cancelled", model=model, tenant_id=tenant_id)
+
+    def close(self) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=5)
+        # прерванные потоки могли оставить незакрытые асинхронные генераторы
+        asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._loop = self._thread = self._client = None
+        self._tenant_slots.clear()
+
+_DONE = object()
+
+def _body(messages: List[Dict], model: str, temperature: Optional[float], response_format: Optional[Dict], max_tokens: Optional[int]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"model": model, "messages": messages}
+    if temperature is not None:
+        body["temperature"] = temperature
+    if response_format is not None:
+        body["response_format"] = response_format
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    return body
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+def set_gateway(gateway: Optional[LLMGateway]) -> None:
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
+
+def shutdown_gateway() -> None:
+    global _gateway
+    with _gateway_lock:
+        gw, _gateway = _gateway, None
+    if gw is not None:
+        gw.close()
+
+async def chat(messages: List[Dict], model: str = LLM_DEFAULT_MODEL, tenant_id: Optional[str] = None, **kwargs) -> Dict:
+    return await get_gateway().chat(messages, model=model, tenant_id=tenant_id, **kwargs)
+
+def chat_sync(messages: List[Dict], model: str = LLM_DEFAULT_MODEL, tenant_id: Optional[str] = None, **kwargs) -> Dict:
+    return get_gateway().chat_sync(messages, model=model, tenant_id=tenant_id, **kwargs)
+
+async def stream(messages: List[Dict], model: str = LLM_DEFAULT_MODEL, tenant_id: Optional[str] = None, **kwargs) -> AsyncIterator[Dict]:
+    items = get_gateway().stream(messages, model=model, tenant_id=tenant_id, **kwargs)
+    try:
+        async for item in items:
+            yield item
+    finally:
+        await items.aclose()  # type: ignore
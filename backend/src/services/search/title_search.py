@@ -0,0 +1,213 @@
+import os
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.config.settings import settings
+from src.core.logging import logger
+from src.services.graph.neo4j_repo import Neo4jRepo
+from src.services.kb.jsonl_io import load_jsonl, get_path
+
+FULLTEXT_FIELDS: Dict[str, List[str]] = {
+    "Subject": ["title", "description"],
+    "Section": ["title", "description"],
+    "Topic": ["title", "description"],
+    "Skill": ["title", "definition"],
+    "Method": ["title", "method_text"],
+    "Example": ["title", "statement"],
+    "Error": ["title", "description"],
+    "Goal": ["title"],
+    "Objective": ["title"],
+}
+
+KB_SOURCES: Dict[str, str] = {
+    "Subject": "subjects.jsonl",
+    "Section": "sections.jsonl",
+    "Topic": "topics.jsonl",
+    "Skill": "skills.jsonl",
+    "Method": "methods.jsonl",
+    "Example": "examples.jsonl",
+    "Error": "errors.jsonl",
+    "Goal": "topic_goals.jsonl",
+    "Objective": "topic_objectives.jsonl",
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# tenant_id не входит в полнотекстовый индекс: фильтр идет после queryNodes, поэтому кандидатов берем с запасом
+FULLTEXT_TENANT_OVERFETCH = int(os.environ.get("FULLTEXT_TENANT_OVERFETCH", "10"))
+FULLTEXT_MAX_FETCH = int(os.environ.get("FULLTEXT_MAX_FETCH", "1000"))
+
+def fulltext_index_name(label: str) -> str:
+    return f"{label.lower()}_text_fulltext"
+
+def fulltext_index_statements() -> List[str]:
+    out: List[str] = []
+    for label, fields in FULLTEXT_FIELDS.items():
+        props = ", ".join(f"n.{f}" for f in fields)
+        out.append(f"CREATE FULLTEXT INDEX {fulltext_index_name(label)} IF NOT EXISTS FOR (n:{label}) ON EACH [{props}]")
+    return out
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+def normalize_labels(labels: Optional[Iterable[str]]) -> List[str]:
+    if not labels:
+        return list(FULLTEXT_FIELDS.keys())
+    known = {k.lower(): k for k in FULLTEXT_FIELDS.keys()}
+    out: List[str] = []
+    for l in labels:
+        k = known.get(str(l).strip().lower())
+        if k and k not in out:
+            out.append(k)
+    return out
+
+def build_lucene_query(q: str, prefix: bool = False) -> str:
+    toks = tokenize(q)
+    if not toks:
+        return ""
+    if prefix:
+        toks[-1] = toks[-1] + "*"
+    clause = " AND ".join(toks)
+    return f"title:({clause})^2 OR ({clause})"
+
+def neo4j_configured() -> bool:
+    return bool(settings.neo4j_uri and settings.neo4j_user and settings.neo4j_password.get_secret_value())
+
+def _fulltext_search(q: str, labels: List[str], tenant_id: Optional[str], limit: int, prefix: bool) -> List[Dict]:
+    query = build_lucene_query(q, prefix=prefix)
+    if not query:
+        return []
+    fetch = int(limit) if tenant_id is None else max(int(limit), min(int(limit) * FULLTEXT_TENANT_OVERFETCH, FULLTEXT_MAX_FETCH))
+    repo = Neo4jRepo(max_retries=1)
+    try:
+        rows = repo.read(
+            "UNWIND $indexes AS idx "
+            "CALL db.index.fulltext.queryNodes(idx, $q, {limit: $fetch}) YIELD node, score "
+            "WHERE $tid IS NULL OR node.tenant_id IS NULL OR node.tenant_id = $tid "
+            "RETURN node.uid AS uid, head([l IN labels(node) WHERE l <> 'Entity']) AS type, node.title AS title, score "
+            "ORDER BY score DESC LIMIT $limit",
+            {"indexes": [fulltext_index_name(l) for l in labels], "q": query, "tid": tenant_id, "fetch": fetch, "limit": int(limit)},
+        )
+    finally:
+        repo.close()
+    return [{"uid": r["uid"], "type": r["type"], "title": r["title"], "score": float(r["score"])} for r in rows]
+
+def load_kb_entries() -> List[Dict]:
+    entries: List[Dict] = []
+    for label, fname in KB_SOURCES.items():
+        fields = FULLTEXT_FIELDS[label]
+        for rec in load_jsonl(get_path(fname)):
+            uid = rec.get("uid")
+            title = rec.get("title")
+            if not uid or not title:
+                continue
+            text = " ".join(str(rec.get(f) or "") for f in fields[1:])
+            entries.append({"uid": uid, "type": label, "title": title, "text": text, "tenant_id": rec.get("tenant_id")})
+    return entries
+
+class KbTitleIndex:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self._title_postings: Dict[str, Set[int]] = {}
+        self._text_postings: Dict[str, Set[int]] = {}
+        self._title_len: List[int] = []
+        for i, e in enumerate(entries):
+            title_toks = tokenize(e.get("title") or "")
+            self._title_len.append(len(title_toks))
+            for t in title_toks:
+                self._title_postings.setdefault(t, set()).add(i)
+            for t in tokenize(e.get("text") or ""):
+                self._text_postings.setdefault(t, set()).add(i)
+        self._vocab = sorted(set(self._title_postings) | set(self._text_postings))
+
+    @classmethod
+    def from_kb(cls) -> "KbTitleIndex":
+        return cls(load_kb_entries())
+
+    def _expand(self, tok: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [tok]
+        out: List[str] = []
+        i = bisect_left(self._vocab, tok)
+        while i < len(self._vocab) and self._vocab[i].startswith(tok):
+            out.append(self._vocab[i])
+            i += 1
+        return out
+
+    def search(self, q: str, labels: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None, limit: int = 20, prefix: bool = False) -> List[Dict]:
+        toks = tokenize(q)
+        if not toks:
+            return []
+        allowed = set(normalize_labels(labels))
+        scores: Optional[Dict[int, float]] = None
+        for pos, tok in enumerate(toks):
+            is_prefix = prefix and pos == len(toks) - 1
+            tok_scores: Dict[int, float] = {}
+            for term in self._expand(tok, is_prefix):
+                exact = term == tok
+                for i in self._text_postings.get(term, ()):
+                    tok_scores[i] = max(tok_scores.get(i, 0.0), 1.0 if exact else 0.75)
+                for i in self._title_postings.get(term, ()):
+                    tok_scores[i] = max(tok_scores.get(i, 0.0), 2.0 if exact else 1.5)
+            if scores is None:
+                scores = tok_scores
+            else:
+                scores = {i: s + tok_scores[i] for i, s in scores.items() if i in tok_scores}
+            if not scores:
+                return []
+        ql = " ".join(toks)
+        ranked: List[Tuple[float, int]] = []
+        for i, s in (scores or {}).items():
+            e = self.entries[i]
+            if e["type"] not in allowed:
+                continue
+            if tenant_id and e.get("tenant_id") not in (None, tenant_id):
+                continue
+            title = " ".join(tokenize(e["title"]))
+            if title == ql:
+                s += 2.0
+            elif title.startswith(ql):
+                s += 1.0
+            ranked.append((s / (1.0 + 0.05 * self._title_len[i]), i))
+        ranked.sort(key=lambda x: (-x[0], self.entries[x[1]]["title"]))
+        return [
+            {"uid": self.entries[i]["uid"], "type": self.entries[i]["type"], "title": self.entries[i]["title"], "score": round(s, 4)}
+            for s, i in ranked[: int(limit)]
+        ]
+
+_FALLBACK_LOCK = threading.Lock()
+_FALLBACK: Dict = {"sig": None, "index": None}
+
+def kb_signature() -> Tuple:
+    sig = []
+    for fname in KB_SOURCES.values():
+        p = get_path(fname)
+        try:
+            st = os.stat(p)
+            sig.append((fname, st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((fname, None, None))
+    return tuple(sig)
+
+def fallback_index() -> KbTitleIndex:
+    sig = kb_signature()
+    with _FALLBACK_LOCK:
+        if _FALLBACK["index"] is None or _FALLBACK["sig"] != sig:
+            _FALLBACK["index"] = KbTitleIndex.from_kb()
+            _FALLBACK["sig"] = sig
+        return _FALLBACK["index"]
+
+def search_entities(q: str, labels: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None, limit: int = 20, prefix: bool = False) -> Dict:
+    labs = normalize_labels(labels)
+    if not labs or not tokenize(q):
+        return {"items": [], "source": "none"}
+    if neo4j_configured():
+        try:
+            return {"items": _fulltext_search(q, labs, tenant_id, limit, prefix), "source": "neo4j"}
+        except Exception as e:
+            logger.warning("fulltext_search_fallback", error=str(e))
+    return {"items": fallback_index().search(q, labs, tenant_id=tenant_id, limit=limit, prefix=prefix), "source": "kb"}
+
+def autocomplete(q: str, labels: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None, limit: int = 10) -> Dict:
+    return search_entities(q, labels=labels, tenant_id=tenant_id, limit=limit, prefix=True)
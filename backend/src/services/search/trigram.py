@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+from src.core.logging import logger
+from src.services.graph.neo4j_repo import Neo4jRepo
+from src.services.graph.versioning import read_graph_version
+from src.services.kb.jsonl_io import _translit_en
+from src.services.search.title_search import kb_signature, load_kb_entries, neo4j_configured, normalize_labels, tokenize
+
+def trigrams(text: str) -> Set[str]:
+    out: Set[str] = set()
+    for w in tokenize(text):
+        p = f"  {w} "
+        for i in range(len(p) - 2):
+            out.add(p[i:i + 3])
+    return out
+
+def variants(text: str) -> List[str]:
+    t = (text or "").lower()
+    tr = _translit_en(t)
+    return [t] if not tr or tr == t else [t, tr]
+
+class TrigramIndex:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        labels = sorted({str(e.get("type") or "") for e in entries})
+        self._label_codes = {l: i for i, l in enumerate(labels)}
+        grams: Dict[str, int] = {}
+        postings: List[List[int]] = []
+        row_entity: List[int] = []
+        row_size: List[int] = []
+        row_label: List[int] = []
+        row_ascii: List[bool] = []
+        for ei, e in enumerate(entries):
+            for v in variants(e.get("title") or ""):
+                gs = trigrams(v)
+                if not gs:
+                    continue
+                r = len(row_entity)
+                row_entity.append(ei)
+                row_size.append(len(gs))
+                row_ascii.append(v.isascii())
+                row_label.append(self._label_codes[str(e.get("type") or "")])
+                for g in gs:
+                    gid = grams.get(g)
+                    if gid is None:
+                        gid = len(postings)
+                        grams[g] = gid
+                        postings.append([])
+                    postings[gid].append(r)
+        self._grams = grams
+        self._postings = [np.asarray(p, dtype=np.int32) for p in postings]
+        self._row_entity = np.asarray(row_entity, dtype=np.int32)
+        self._row_size = np.asarray(row_size, dtype=np.float32)
+        self._row_label = np.asarray(row_label, dtype=np.int32)
+        self._row_ascii = np.asarray(row_ascii, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, q: str, labels: Optional[Iterable[str]] = None, limit: int = 20, min_score: float = 0.2) -> List[Dict]:
+        n = len(self._row_entity)
+        if n == 0:
+            return []
+        qsets = [trigrams(v) for v in variants(q)]
+        gids = [self._grams[g] for g in set().union(*qsets) if g in self._grams]
+        if not gids:
+            return []
+        # кириллические и латинские строки индекса пересекаются только по своему варианту запроса,
+        # поэтому достаточно одного подсчёта по объединению триграмм
+        h = np.bincount(np.concatenate([self._postings[g] for g in gids]), minlength=n).astype(np.float32)
+        if len(qsets) == 1:
+            qn = np.float32(len(qsets[0]))
+        else:
+            qn = np.where(self._row_ascii, np.float32(len(qsets[1])), np.float32(len(qsets[0])))
+        best = h / (qn + self._row_size - h)
+        cand = np.flatnonzero(best >= min_score)
+        if labels:
+            codes = [self._label_codes[l] for l in normalize_labels(labels) if l in self._label_codes]
+            cand = cand[np.isin(self._row_label[cand], codes)]
+        if cand.size == 0:
+            return []
+        k = min(cand.size, 2 * int(limit))
+        if k < cand.size:
+            cand = cand[np.argpartition(-best[cand], k - 1)[:k]]
+        cand = cand[np.argsort(-best[cand], kind="stable")]
+        out: List[Dict] = []
+        seen: Set[int] = set()
+        for r in cand:
+            ei = int(self._row_entity[r])
+            if ei in seen:
+                continue
+            seen.add(ei)
+            e = self.entries[ei]
+            out.append({"uid": e["uid"], "type": e.get("type"), "title": e.get("title"), "score": round(float(best[r]), 4)})
+            if len(out) >= limit:
+                break
+        return out
+
+VERSION_CHECK_INTERVAL_SEC = 2.0
+_STATE_LOCK = threading.Lock()
+_STATES: Dict[str, Dict] = {}
+
+def _load_entries(tenant_id: Optional[str]) -> List[Dict]:
+    if neo4j_configured():
+        try:
+            repo = Neo4jRepo(max_retries=1)
+            try:
+                return repo.read(
+                    "MATCH (n:Entity) WHERE n.title IS NOT NULL "
+                    "AND ($tid IS NULL OR n.tenant_id IS NULL OR n.tenant_id = $tid) "
+                    "RETURN n.uid AS uid, head([l IN labels(n) WHERE l <> 'Entity']) AS type, n.title AS title",
+                    {"tid": tenant_id},
+                )
+            finally:
+                repo.close()
+        except Exception as e:
+            logger.warning("trigram_index_kb_fallback", error=str(e))
+    # индекс строится на тенанта: чужие записи отсекаются здесь, как и в KbTitleIndex.search
+    return [e for e in load_kb_entries() if not tenant_id or e.get("tenant_id") in (None, tenant_id)]
+
+def get_trigram_index(tenant_id: Optional[str] = None) -> TrigramIndex:
+    key = tenant_id or ""
+    with _STATE_LOCK:
+        state = _STATES.setdefault(key, {"version": None, "index": None, "checked": 0.0, "lock": threading.Lock()})
+    now = time.monotonic()
+    if state["index"] is not None and now - state["checked"] < VERSION_CHECK_INTERVAL_SEC:
+        return state["index"]
+    version = (read_graph_version(tenant_id), kb_signature())
+    if state["index"] is not None and state["version"] == version:
+        state["checked"] = now
+        return state["index"]
+    if not state["lock"].acquire(blocking=state["index"] is None):
+        return state["index"]
+    try:
+        if state["index"] is None or state["version"] != version:
+            t0 = time.perf_counter()
+            state["index"] = TrigramIndex(_load_entries(tenant_id))
+            state["version"] = version
+            logger.info("trigram_index_built", tenant_id=key, entities=len(state["index"]), ms=int((time.perf_counter() - t0) * 1000))
+        state["checked"] = time.monotonic()
+        return state["index"]
+    finally:
+        state["lock"].release()
+
+def invalidate(tenant_id: Optional[str] = None) -> None:
+    with _STATE_LOCK:
+        if tenant_id is None:
+            _STATES.clear()
+        else:
+            _STATES.pop(tenant_id, None)
+
+def fuzzy_search(q: str, labels: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None, limit: int = 20) -> Dict:
+    return {"items": get_trigram_index(tenant_id).search(q, labels=labels, limit=limit), "source": "trigram"}
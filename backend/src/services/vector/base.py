@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from src.config.settings import settings
+from src.services.embeddings.provider import BaseEmbeddingProvider, HashEmbeddingProvider, OpenAIEmbeddingProvider
+
+class VectorPoint(NamedTuple):
+    id: Any
+    vector: List[float]
+    payload: Dict
+
+def default_provider(dim: int, allow_hash: bool = False) -> BaseEmbeddingProvider:
+    key = settings.openai_api_key.get_secret_value()
+    if not key and allow_hash:
+        # только для встроенного индекса: хэш-векторы не семантические и не должны попадать в общую коллекцию Qdrant
+        return HashEmbeddingProvider(dim=dim)
+    from src.services.embeddings.cache import with_cache
+    return with_cache(OpenAIEmbeddingProvider(dim=dim, api_key=key))
+
+class VectorStore:
+    # общий интерфейс хранилищ концептов: Qdrant и встроенный индекс взаимозаменяемы через settings.vector_backend
+    backend = "base"
+    # без OPENAI_API_KEY допускаются хэш-эмбеддинги; иначе ошибка об отсутствующем ключе
+    allow_hash_embeddings = False
+    collection: str
+    dim: int
+
+    def __init__(self, provider: Optional[BaseEmbeddingProvider] = None):
+        self._provider = provider
+        self._lock = threading.Lock()
+        self.last_health: Dict = {"ok": None, "backend": self.backend, "collection": self.collection, "dim": self.dim}
+
+    @property
+    def provider(self) -> BaseEmbeddingProvider:
+        if self._provider is None:
+            with self._lock:
+                if self._provider is None:
+                    self._provider = default_provider(self.dim, allow_hash=self.allow_hash_embeddings)
+        return self._provider
+
+    def make_point(self, id: Any, vector: List[float], payload: Dict) -> Any:
+        return VectorPoint(id, vector, payload)
+
+    async def embed_text(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.provider.embed_text, text)
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.provider.embed_texts, texts)
+
+    def ensure_collection(self) -> None:
+        raise NotImplementedError
+
+    def health(self) -> Dict:
+        raise NotImplementedError
+
+    def upsert(self, points: List[Any]) -> None:
+        raise NotImplementedError
+
+    def search(self, embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def search_many(self, embeddings: List[List[float]], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        return [self.search(e, top_k=top_k) for e in embeddings]
@@ -0,0 +1,340 @@
+import fcntl
+import heapq
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.config.settings import settings
+from src.core.logging import logger
+from src.services.embeddings.provider import BaseEmbeddingProvider
+from src.services.vector.base import VectorStore
+
+VECTOR_LOCAL_GRAPH_MIN = int(os.environ.get("VECTOR_LOCAL_GRAPH_MIN", "50000"))
+VECTOR_LOCAL_GRAPH_M = int(os.environ.get("VECTOR_LOCAL_GRAPH_M", "16"))
+VECTOR_LOCAL_EF_SEARCH = int(os.environ.get("VECTOR_LOCAL_EF_SEARCH", "64"))
+VECTOR_LOCAL_EF_BUILD = int(os.environ.get("VECTOR_LOCAL_EF_BUILD", "64"))
+VECTOR_LOCAL_ENTRY_POINTS = int(os.environ.get("VECTOR_LOCAL_ENTRY_POINTS", "16"))
+VECTOR_LOCAL_INITIAL_CAPACITY = 1024
+
+def default_path() -> str:
+    return settings.vector_local_path or os.path.join(tempfile.gettempdir(), "kb_vectors")
+
+class LocalVectorIndex(VectorStore):
+    # встроенный индекс концептов без внешнего сервиса; каталог коллекции:
+    #   vectors.f32 - нормированные векторы, memmap [capacity, dim]
+    #   graph.i32   - соседи узла графа NSW, memmap [capacity, m], номер строки + 1, 0 = пусто
+    #   items.jsonl - журнал (id, row, payload), последняя запись по id побеждает
+    #   meta.json   - размерность, емкость и число строк, уже связанных в граф
+    # пока строк меньше graph_min, поиск идет полным перебором; дальше по графу
+    backend = "local"
+    allow_hash_embeddings = True
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        collection: Optional[str] = None,
+        dim: Optional[int] = None,
+        provider: Optional[BaseEmbeddingProvider] = None,
+        graph_min: int = VECTOR_LOCAL_GRAPH_MIN,
+        m: int = VECTOR_LOCAL_GRAPH_M,
+        ef_search: int = VECTOR_LOCAL_EF_SEARCH,
+        ef_build: int = VECTOR_LOCAL_EF_BUILD,
+    ):
+        self.collection = collection or settings.qdrant_concepts_collection
+        self.dim = int(dim or settings.qdrant_concepts_dim)
+        self.dir = os.path.join(path or default_path(), self.collection)
+        self.graph_min = max(1, graph_min)
+        self.m = max(2, m)
+        self.ef_search = max(1, ef_search)
+        self.ef_build = max(1, ef_build)
+        self._ready = False
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._payloads: List[Dict] = []
+        self._capacity = 0
+        self._graph_n = 0
+        self._vecs: Optional[np.memmap] = None
+        self._graph: Optional[np.memmap] = None
+        self._v: np.ndarray = np.zeros((0, self.dim), dtype=np.float32)
+        self._g: np.ndarray = np.zeros((0, self.m), dtype=np.int32)
+        self._log = None
+        self._lockfile = None
+        super().__init__(provider)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self) -> None:
+        meta = {"dim": self.dim, "m": self.m, "capacity": self._capacity, "count": len(self._ids), "graph_n": self._graph_n}
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _load_items(self) -> None:
+        try:
+            f = open(self._file("items.jsonl"), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    it = json.loads(line)
+                except ValueError:
+                    # оборванная последняя строка после падения процесса
+                    continue
+                row = int(it["row"])
+                while len(self._ids) <= row:
+                    self._ids.append("")
+                    self._payloads.append({})
+                self._ids[row] = it["id"]
+                self._payloads[row] = it.get("payload") or {}
+                self._rows[it["id"]] = row
+
+    def _map(self, name: str, cols: int, dtype: str, capacity: int) -> np.memmap:
+        path = self._file(name)
+        size = capacity * cols * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                # файл дополняется нулями: для графа 0 означает отсутствие соседа
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, cols))
+
+    def _open_arrays(self, capacity: int) -> None:
+        if self._vecs is not None:
+            self._vecs.flush()
+            self._graph.flush()  # type: ignore
+        self._capacity = capacity
+        self._vecs = self._map("vectors.f32", self.dim, "<f4", capacity)
+        self._graph = self._map("graph.i32", self.m, "<i4", capacity)
+        # вычисления идут по обычным ndarray-представлениям тех же страниц: индексация memmap заметно дороже
+        self._v = self._vecs.view(np.ndarray)
+        self._g = self._graph.view(np.ndarray)
+
+    def ensure_collection(self) -> None:
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(self.dir, exist_ok=True)
+            lockfile = open(self._file("lock"), "a+")
+            try:
+                fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lockfile.close()
+                raise RuntimeError(f"local vector index {self.dir} is opened by another process")
+            self._lockfile = lockfile
+            meta = self._read_meta()
+            if meta:
+                if int(meta["dim"]) != self.dim:
+                    logger.warning("vector_collection_dim_mismatch", collection=self.collection, expected=self.dim, actual=meta["dim"])
+                self.dim = int(meta["dim"])
+                self.m = int(meta.get("m", self.m))
+            self._load_items()
+            self._open_arrays(max(int(meta.get("capacity", 0)), len(self._ids), VECTOR_LOCAL_INITIAL_CAPACITY))
+            self._graph_n = min(int(meta.get("graph_n", 0)), len(self._ids))
+            self._log = open(self._file("items.jsonl"), "a", encoding="utf-8")
+            self._link_pending()
+            self._ready = True
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._ready:
+                return
+            self._vecs.flush()  # type: ignore
+            self._graph.flush()  # type: ignore
+            self._write_meta()
+            self._log.close()  # type: ignore
+            self._lockfile.close()  # type: ignore
+            self._vecs = self._graph = self._log = self._lockfile = None
+            self._ready = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _normalized(self, vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        if v.shape != (self.dim,):
+            raise ValueError(f"vector dim {v.shape[-1] if v.ndim else 0} != collection dim {self.dim}")
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def upsert(self, points: List[Any]) -> None:
+        self.ensure_collection()
+        vecs = [self._normalized(p.vector) for p in points]
+        with self._lock:
+            need = len(self._ids) + len(points)
+            if need > self._capacity:
+                self._open_arrays(max(need, self._capacity * 2))
+            lines = []
+            for p, v in zip(points, vecs):
+                key = str(p.id)
+                payload = dict(p.payload or {})
+                row = self._rows.get(key)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(key)
+                    self._payloads.append(payload)
+                    self._rows[key] = row
+                else:
+                    # связи узла в графе остаются прежними: для дедупликации приближение допустимо
+                    self._payloads[row] = payload
+                self._v[row] = v
+                lines.append(json.dumps({"id": key, "row": row, "payload": payload}, ensure_ascii=False))
+            self._vecs.flush()  # type: ignore
+            self._log.write("\n".join(lines) + "\n")  # type: ignore
+            self._log.flush()  # type: ignore
+            self._link_pending()
+            self._write_meta()
+
+    def _link_pending(self) -> None:
+        n = len(self._ids)
+        if n < self.graph_min or self._graph_n >= n:
+            return
+        t0 = time.perf_counter()
+        linked = self._graph_n
+        for row in range(self._graph_n, n):
+            self._link(row)
+            self._graph_n = row + 1
+        self._graph.flush()  # type: ignore
+        logger.info("local_vector_index_linked", collection=self.collection, rows=n - linked, total=n, ms=round((time.perf_counter() - t0) * 1000, 1))
+
+    def _select(self, base: int, cand: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        # эвристика HNSW: кандидат, который ближе к уже выбранному соседу, чем к узлу, пропускается в первую очередь;
+        # так у узла остаются связи в соседние кластеры и граф не распадается на компоненты
+        order = np.argsort(-scores)
+        chosen: List[int] = []
+        skipped: List[int] = []
+        for i in order.tolist():
+            r = int(cand[i])
+            if r == base:
+                continue
+            if len(chosen) >= self.m:
+                break
+            if chosen and float(np.max(self._v[chosen] @ self._v[r])) > float(scores[i]):
+                skipped.append(r)
+            else:
+                chosen.append(r)
+        chosen.extend(skipped[: self.m - len(chosen)])
+        return np.asarray(chosen, dtype=np.int32)
+
+    def _link(self, row: int) -> None:
+        if self._graph_n == 0:
+            return
+        found = self._beam(self._v[row], self.ef_build, self._graph_n)
+        nbrs = self._select(row, np.asarray([r for _, r in found], dtype=np.int32), np.asarray([s for s, _ in found], dtype=np.float32))
+        self._g[row, :] = 0
+        self._g[row, : nbrs.size] = nbrs + 1
+        for nb in nbrs.tolist():
+            self._connect(nb, row)
+
+    def _connect(self, a: int, b: int) -> None:
+        links = self._g[a]
+        free = np.flatnonzero(links == 0)
+        if free.size:
+            links[free[0]] = b + 1
+            return
+        cand = np.append(links - 1, b)
+        keep = self._select(a, cand, self._v[cand] @ self._v[a])
+        links[:] = 0
+        links[: keep.size] = keep + 1
+
+    def _entries(self, n: int) -> np.ndarray:
+        # несколько равномерно разнесенных точек входа вместо одной: поиск не застревает в чужом кластере
+        return np.unique(np.linspace(0, n - 1, num=min(n, VECTOR_LOCAL_ENTRY_POINTS), dtype=np.int64))
+
+    def _beam(self, q: np.ndarray, ef: int, n: int) -> List[Tuple[float, int]]:
+        visited = np.zeros(n, dtype=bool)
+        entries = self._entries(n)
+        visited[entries] = True
+        cand: List[Tuple[float, int]] = []
+        best: List[Tuple[float, int]] = []
+        for r, s in zip(entries.tolist(), (self._v[entries] @ q).tolist()):
+            heapq.heappush(cand, (-s, r))
+            heapq.heappush(best, (s, r))
+            if len(best) > ef:
+                heapq.heappop(best)
+        while cand:
+            neg, c = heapq.heappop(cand)
+            if len(best) >= ef and -neg < best[0][0]:
+                break
+            links = self._g[c]
+            new = links[links > 0] - 1
+            new = new[~visited[new]]
+            if not new.size:
+                continue
+            visited[new] = True
+            scores = self._v[new] @ q
+            for r, s in zip(new.tolist(), scores.tolist()):
+                if len(best) < ef or s > best[0][0]:
+                    heapq.heappush(cand, (-s, r))
+                    heapq.heappush(best, (s, r))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+        return sorted(best, reverse=True)
+
+    def search(self, embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        self.ensure_collection()
+        q = self._normalized(embedding)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+            if self._graph_n:
+                hits = self._beam(q, max(self.ef_search, top_k), self._graph_n)
+                if self._graph_n < n:
+                    tail = self._v[self._graph_n:n] @ q
+                    hits.extend((float(s), self._graph_n + i) for i, s in enumerate(tail.tolist()))
+                hits = sorted(hits, reverse=True)[:top_k]
+            else:
+                scores = self._v[:n] @ q
+                k = min(top_k, n)
+                idx = np.argpartition(-scores, k - 1)[:k]
+                hits = sorted(((float(scores[i]), int(i)) for i in idx), reverse=True)
+            return [(self._ids[r], s) for s, r in hits]
+
+    def search_many(self, embeddings: List[List[float]], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        if not embeddings:
+            return []
+        self.ensure_collection()
+        if self._graph_n:
+            return [self.search(e, top_k=top_k) for e in embeddings]
+        qs = np.stack([self._normalized(e) for e in embeddings])
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return [[] for _ in embeddings]
+            # полный перебор одной матричной операцией на всю пачку
+            scores = qs @ self._v[:n].T
+            k = min(top_k, n)
+            idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            out = []
+            for row, cols in zip(scores, idx):
+                cols = cols[np.argsort(-row[cols])]
+                out.append([(self._ids[c], float(row[c])) for c in cols.tolist()])
+            return out
+
+    def payload(self, id: Any) -> Optional[Dict]:
+        row = self._rows.get(str(id))
+        return None if row is None else self._payloads[row]
+
+    def health(self) -> Dict:
+        t0 = time.perf_counter()
+        try:
+            self.ensure_collection()
+            res = {"ok": True, "backend": self.backend, "collection": self.collection, "dim": self.dim, "count": len(self._ids), "mode": "graph" if self._graph_n else "flat"}
+        except Exception as e:
+            res = {"ok": False, "backend": self.backend, "collection": self.collection, "dim": self.dim, "error": str(e)}
+        res["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        self.last_health = res
+        return res
@@ -1,28 +1,183 @@
-from typing import List, Tuple
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
-from openai import AsyncOpenAI
-from src.config.settings import settings
-
-client = QdrantClient(url=str(settings.qdrant_url))
-COLLECTION = "concepts"
-try:
-    if COLLECTION not in [c.name for c in client.get_collections().collections]:
-        client.recreate_collection(
-            collection_name=COLLECTION,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE),
-        )
-except Exception:
-    pass
-oai = AsyncOpenAI(api_key=settings.openai_api_key.get_secret_value())
+import asyncio
+import os
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from src.config.settings import VectorBackend, settings
+from src.core.logging import logger
+from src.services.embeddings.provider import BaseEmbeddingProvider
+from src.services.vector.base import VectorStore
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http.models import PointStruct
+
+QDRANT_TIMEOUT_SEC = int(os.environ.get("QDRANT_TIMEOUT_SEC", "5"))
+QDRANT_POOL_SIZE = int(os.environ.get("QDRANT_POOL_SIZE", "16"))
+# Qdrant принимает в качестве id только целые числа и UUID; uid концепта хранится в payload
+POINT_NAMESPACE = uuid.UUID("3c9a1f4e-7b2d-4e8a-9f61-2d5b8c0e4a17")
+
+def point_id(uid: Any) -> Any:
+    if isinstance(uid, int):
+        return uid
+    try:
+        return str(uuid.UUID(str(uid)))
+    except ValueError:
+        return str(uuid.uuid5(POINT_NAMESPACE, str(uid)))
+
+class VectorService(VectorStore):
+    backend = "qdrant"
+
+    # клиент, коллекция и эмбеддер создаются при первом обращении: импорт модуля не ходит в сеть
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        collection: Optional[str] = None,
+        dim: Optional[int] = None,
+        timeout: int = QDRANT_TIMEOUT_SEC,
+        pool_size: int = QDRANT_POOL_SIZE,
+        client: Optional["QdrantClient"] = None,
+        provider: Optional[BaseEmbeddingProvider] = None,
+    ):
+        self.url = url or str(settings.qdrant_url)
+        self.collection = collection or settings.qdrant_concepts_collection
+        self.dim = int(dim or settings.qdrant_concepts_dim)
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self._client = client
+        self._ready = False
+        super().__init__(provider)
+
+    @property
+    def client(self) -> "QdrantClient":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # сам qdrant_client импортируется больше секунды, поэтому тоже откладывается до первого обращения
+                    import httpx
+                    from qdrant_client import QdrantClient
+                    limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                    self._client = QdrantClient(url=self.url, timeout=self.timeout, limits=limits)
+        return self._client
+
+    def make_point(self, id: Any, vector: List[float], payload: Dict) -> "PointStruct":
+        from qdrant_client.http.models import PointStruct
+        return PointStruct(id=point_id(id), vector=vector, payload={**payload, "uid": str(id)})
+
+    def ensure_collection(self) -> None:
+        if self._ready:
+            return
+        client = self.client
+        with self._lock:
+            if self._ready:
+                return
+            if self.collection not in [c.name for c in client.get_collections().collections]:
+                from qdrant_client.http.models import Distance, VectorParams
+                client.create_collection(collection_name=self.collection, vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE))
+            else:
+                try:
+                    size = int(client.get_collection(self.collection).config.params.vectors.size)  # type: ignore
+                except Exception:
+                    size = self.dim
+                if size != self.dim:
+                    # коллекцию не пересоздаем: это стерло бы данные; расхождение видно в логах и в health
+                    logger.warning("vector_collection_dim_mismatch", collection=self.collection, expected=self.dim, actual=size)
+                    self.dim = size
+            self._ready = True
+
+    def health(self) -> Dict:
+        t0 = time.perf_counter()
+        try:
+            self.ensure_collection()
+            self.client.get_collection(self.collection)
+            res = {"ok": True, "backend": self.backend, "collection": self.collection, "dim": self.dim}
+        except Exception as e:
+            res = {"ok": False, "backend": self.backend, "collection": self.collection, "dim": self.dim, "error": str(e)}
+        res["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        self.last_health = res
+        return res
+
+    def upsert(self, points: List["PointStruct"]) -> None:
+        self.ensure_collection()
+        self.client.upsert(collection_name=self.collection, points=points)
+
+    def search(self, embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        self.ensure_collection()
+        client = self.client
+        # search удален в qdrant-client 1.13+, query_points появился в 1.10
+        if hasattr(client, "query_points"):
+            res = client.query_points(collection_name=self.collection, query=embedding, limit=top_k, with_payload=["uid"]).points
+        else:
+            res = client.search(collection_name=self.collection, query_vector=embedding, limit=top_k, with_payload=["uid"])
+        return [_hit(r) for r in res]
+
+    def search_many(self, embeddings: List[List[float]], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        if not embeddings:
+            return []
+        self.ensure_collection()
+        client = self.client
+        # один запрос на всю пачку; query_batch_points появился в qdrant-client 1.10, до него search_batch
+        if hasattr(client, "query_batch_points"):
+            from qdrant_client.http.models import QueryRequest
+            reqs = [QueryRequest(query=e, limit=top_k, with_payload=["uid"]) for e in embeddings]
+            res = [r.points for r in client.query_batch_points(collection_name=self.collection, requests=reqs)]
+        else:
+            from qdrant_client.http.models import SearchRequest
+            reqs = [SearchRequest(vector=e, limit=top_k, with_payload=["uid"]) for e in embeddings]
+            res = client.search_batch(collection_name=self.collection, requests=reqs)
+        return [[_hit(r) for r in hits] for hits in res]
+
+def _hit(r: Any) -> Tuple[str, float]:
+    uid = (getattr(r, "payload", None) or {}).get("uid")
+    return (str(uid or r.id), float(r.score))
+
+_service: Optional[VectorStore] = None
+_service_lock = threading.Lock()
+
+def get_vector_service() -> VectorStore:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                if settings.vector_backend == VectorBackend.local:
+                    from src.services.vector.local_index import LocalVectorIndex
+                    _service = LocalVectorIndex()
+                else:
+                    _service = VectorService()
+    return _service
+
+def set_vector_service(service: Optional[VectorStore]) -> None:
+    global _service
+    with _service_lock:
+        _service = service
+
+async def startup_check() -> Dict:
+    res = await asyncio.to_thread(get_vector_service().health)
+    if res["ok"]:
+        logger.info("vector_service_ready", **res)
+    else:
+        logger.warning("vector_service_unavailable", **res)
+    return res
+
 async def embed_text(text: str) -> List[float]:
-    resp = await oai.embeddings.create(model="text-embedding-3-small", input=text)
-    return resp.data[0].embedding
+    return await get_vector_service().embed_text(text)
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    return await get_vector_service().embed_texts(texts)
+
 async def upsert_concept(uid: str, title: str, definition: str, embedding: List[float]) -> None:
-    client.upsert(
-        collection_name=COLLECTION,
-        points=[PointStruct(id=uid, vector=embedding, payload={"title": title, "definition": definition})],
-    )
+    await upsert_concepts([(uid, title, definition, embedding)])
+
+async def upsert_concepts(items: List[Tuple[str, str, str, List[float]]]) -> None:
+    if not items:
+        return
+    svc = get_vector_service()
+    points = [svc.make_point(uid, emb, {"title": title, "definition": definition}) for uid, title, definition, emb in items]
+    await asyncio.to_thread(svc.upsert, points)
+
 def query_similar(embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
-    res = client.search(collection_name=COLLECTION, query_vector=embedding, limit=top_k)
-    return [(str(r.id), float(r.score)) for r in res]
+    return get_vector_service().search(embedding, top_k=top_k)
+
+async def query_similar_many(embeddings: List[List[float]], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+    return await asyncio.to_thread(get_vector_service().search_many, embeddings, top_k)
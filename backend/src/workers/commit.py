@@ -1,11 +1,11 @@
 from typing import Dict, List, Any
 from src.db.pg import (
-    get_conn,
-    ensure_tables,
     get_graph_version,
     set_graph_version,
     add_graph_change,
+    OUTBOX_CHANNEL,
 )
+from src.db.pool import pg_conn, pg_tx
 from src.services.rebase import rebase_check, RebaseResult
 from src.services.integrity import integrity_check_subgraph, check_prereq_cycles, check_dangling_skills, check_skill_based_on_rules
 from src.services.graph.neo4j_repo import get_driver
@@ -34,12 +34,9 @@ except Exception:
     INTEGRITY_BASE_RULE_VIOLATION_TOTAL = _Dummy()
 
 def _load_proposal(proposal_id: str) -> Dict | None:
-    ensure_tables()
-    conn = get_conn()
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT tenant_id, base_graph_version, status, operations_json FROM proposals WHERE proposal_id=%s", (proposal_id,))
         row = cur.fetchone()
-    conn.close()
     if not row:
         return None
     return {
@@ -50,11 +47,8 @@ def _load_proposal(proposal_id: str) -> Dict | None:
     }
 
 def _update_proposal_status(proposal_id: str, status: str) -> None:
-    conn = get_conn()
-    conn.autocommit = True
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("UPDATE proposals SET status=%s WHERE proposal_id=%s", (status, proposal_id))
-    conn.close()
 
 def _collect_target_ids(ops: List[Dict[str, Any]]) -> List[str]:
     ids: List[str] = []
@@ -202,10 +196,10 @@ def commit_proposal(proposal_id: str) -> Dict:
     drv.close()
 
     # Audit & graph_version update
-    conn = get_conn()
-    conn.autocommit = False
-    new_ver = max(get_graph_version(tenant_id), base_ver) + 1
-    with conn.cursor() as cur:
+    with pg_tx() as conn, conn.cursor() as cur:
+        cur.execute("SELECT graph_version FROM tenant_graph_version WHERE tenant_id=%s", (tenant_id,))
+        row = cur.fetchone()
+        new_ver = max(int(row[0]) if row else 0, base_ver) + 1
         cur.execute(
             "INSERT INTO tenant_graph_version (tenant_id, graph_version) VALUES (%s,%s) ON CONFLICT (tenant_id) DO UPDATE SET graph_version=EXCLUDED.graph_version",
             (tenant_id, new_ver),
@@ -224,7 +218,7 @@ def commit_proposal(proposal_id: str) -> Dict:
         ev_payload = {"tenant_id": tenant_id, "proposal_id": proposal_id, "graph_version": new_ver, "targets": target_ids, "correlation_id": get_correlation_id() or ""}
         eid = "EV-" + uuid.uuid4().hex[:16]
         cur.execute("INSERT INTO events_outbox (event_id, tenant_id, event_type, payload, published) VALUES (%s,%s,%s,%s,FALSE)", (eid, tenant_id, "graph_committed", json.dumps(ev_payload)))
-    conn.commit()
-    conn.close()
+        # NOTIFY доставляется при COMMIT, relay просыпается уже после фиксации события
+        cur.execute("SELECT pg_notify(%s, %s)", (OUTBOX_CHANNEL, eid))
     _update_proposal_status(proposal_id, "DONE")
     return {"ok": True, "status": "DONE", "graph_version": new_ver}
@@ -0,0 +1,72 @@
+import os
+import signal
+import threading
+from typing import Dict, Optional
+from src.core.logging import logger
+from src.db.pg import entity_backfill_progress, entity_backfill_save
+from src.db.pool import pg_conn
+from src.services.graph.utils import backfill_entity_label
+
+ENTITY_BACKFILL_BATCH_SIZE = int(os.environ.get("ENTITY_BACKFILL_BATCH_SIZE", "5000"))
+# порций за один захват блокировки: между запусками поток проверяет остановку и отдает соединение пулу
+ENTITY_BACKFILL_BATCHES_PER_RUN = int(os.environ.get("ENTITY_BACKFILL_BATCHES_PER_RUN", "20"))
+
+# ключ pg_try_advisory_lock, отдельный от MIGRATION_LOCK_KEY: проход идет вне миграций, одна реплика за раз
+ENTITY_BACKFILL_LOCK_KEY = 0x4B42_0002
+
+_WORKER: Optional[threading.Thread] = None
+_STOP = threading.Event()
+
+def _save(label: str, st: Dict) -> None:
+    entity_backfill_save(label, st["last_uid"], st["scanned"], st["done"])
+
+def run_once(batch_size: int = ENTITY_BACKFILL_BATCH_SIZE, max_batches: Optional[int] = None) -> Dict:
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (ENTITY_BACKFILL_LOCK_KEY,))
+            locked = bool(cur.fetchone()[0])
+        if not locked:
+            return {"scanned": 0, "batches": 0, "done": False, "pending": [], "busy": True}
+        try:
+            stats = backfill_entity_label(batch_size=batch_size, max_batches=max_batches, progress=entity_backfill_progress(), on_batch=_save)
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (ENTITY_BACKFILL_LOCK_KEY,))
+    logger.info("entity_label_backfill_progress", scanned=stats["scanned"], batches=stats["batches"], done=stats["done"], pending=len(stats["pending"]))
+    return stats
+
+def run_until_done(stop: Optional[threading.Event] = None) -> None:
+    stop = stop or _STOP
+    backoff = 1.0
+    while not stop.is_set():
+        try:
+            stats = run_once(max_batches=ENTITY_BACKFILL_BATCHES_PER_RUN)
+            if stats.get("busy"):
+                # проход ведет другая реплика; прерванный проход продолжит следующий запуск
+                logger.info("entity_label_backfill_busy")
+                return
+            if stats["done"]:
+                logger.info("entity_label_backfill_done")
+                return
+            backoff = 1.0
+        except Exception as e:
+            logger.warning("entity_label_backfill_error", error=str(e))
+            stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+def start_entity_backfill() -> None:
+    global _WORKER
+    if _WORKER is not None and _WORKER.is_alive():
+        return
+    _STOP.clear()
+    _WORKER = threading.Thread(target=run_until_done, name="entity-label-backfill", daemon=True)
+    _WORKER.start()
+
+def stop_entity_backfill() -> None:
+    _STOP.set()
+
+if __name__ == "__main__":
+    _stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    signal.signal(signal.SIGINT, lambda *_: _stop.set())
+    run_until_done(stop=_stop)
@@ -1,10 +1,20 @@
+import codecs
+import os
+import queue
+import threading
 import unicodedata
 import re
 import uuid
-from typing import List, Dict
+from collections import deque
+from typing import IO, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, PointIdsList, PointStruct, VectorParams
 from src.config.settings import settings
+from src.core.canonical import canonical_hash_from_text, hash_sha256
+from src.core.logging import logger
+from src.db.pg import chunk_manifest_add, chunk_manifest_remove, chunk_manifest_stale, chunk_manifest_touch
+from src.db.pool import pg_configured
+from src.services.embeddings.provider import BaseEmbeddingProvider, HashEmbeddingProvider, approx_tokens
 try:
     from prometheus_client import Counter, Histogram
     INGESTION_SUCCESS_TOTAL = Counter("ingestion_success_total", "Total successful ingested chunks")
@@ -19,7 +29,24 @@ except Exception:
     INGESTION_SUCCESS_TOTAL = _Dummy()
     INGESTION_LATENCY_MS = _Dummy()
 
+INGESTION_BATCH_SIZE = int(os.environ.get("INGESTION_BATCH_SIZE", "256"))
+INGESTION_MAX_INFLIGHT = int(os.environ.get("INGESTION_MAX_INFLIGHT", "2"))
+INGESTION_CHUNK_TOKENS = int(os.environ.get("INGESTION_CHUNK_TOKENS", "256"))
+INGESTION_CHUNK_OVERLAP = int(os.environ.get("INGESTION_CHUNK_OVERLAP", "32"))
+INGESTION_SWEEP_BATCH = int(os.environ.get("INGESTION_SWEEP_BATCH", "1000"))
+# слово длиннее этого режется на части: текст без пробелов (base64, минифицированные данные) иначе копился бы в памяти целиком
+INGESTION_MAX_WORD_CHARS = int(os.environ.get("INGESTION_MAX_WORD_CHARS", str(INGESTION_CHUNK_TOKENS * 4)))
+# id точки выводится из (tenant_id, doc_id, chunk_id): повторная загрузка перезаписывает те же точки, а не дублирует их
+CHUNK_NAMESPACE = uuid.UUID("1b7d6a3e-8f2c-4e0a-b5d9-3c4e7f1a2b60")
+
 _WS = re.compile(r"\s+")
+_client: Optional[QdrantClient] = None
+
+def _qdrant() -> QdrantClient:
+    global _client
+    if _client is None:
+        _client = QdrantClient(url=str(settings.qdrant_url))
+    return _client
 
 def normalize_text(text: str) -> str:
     t = unicodedata.normalize("NFKC", text)
@@ -27,48 +54,230 @@ def normalize_text(text: str) -> str:
     t = _WS.sub(" ", t)
     return t
 
-def chunk_text(text: str, max_len: int = 256) -> List[Dict]:
+def chunk_id(tenant_id: str, doc_id: str, text: str) -> str:
+    return "CH-" + hash_sha256(f"{tenant_id}:{doc_id}:{canonical_hash_from_text(text)}")[:24]
+
+def point_id(tenant_id: str, doc_id: str, cid: str) -> str:
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{tenant_id}:{doc_id}:{cid}"))
+
+def chunk_text(text: str, max_len: int = 256, tenant_id: str = "", doc_id: str = "") -> List[Dict]:
     words = text.split(" ")
     chunks = []
     cur = []
     cur_len = 0
     for w in words:
         if cur_len + len(w) + 1 > max_len and cur:
-            cid = "CH-" + uuid.uuid4().hex[:12]
-            chunks.append({"chunk_id": cid, "text": " ".join(cur)})
+            body = " ".join(cur)
+            chunks.append({"chunk_id": chunk_id(tenant_id, doc_id, body), "text": body})
             cur = []
             cur_len = 0
         cur.append(w)
         cur_len += len(w) + 1
     if cur:
-        cid = "CH-" + uuid.uuid4().hex[:12]
-        chunks.append({"chunk_id": cid, "text": " ".join(cur)})
+        body = " ".join(cur)
+        chunks.append({"chunk_id": chunk_id(tenant_id, doc_id, body), "text": body})
     return chunks
 
-def _hash16(text: str) -> List[float]:
-    import hashlib
-    h = hashlib.sha256(text.encode("utf-8")).digest()
-    vec = []
-    for i in range(16):
-        v = int.from_bytes(h[i*2:(i+1)*2], "big") / 65535.0
-        vec.append(v)
-    return vec
-
 def ensure_collection(client: QdrantClient, name: str, size: int = 16):
     cols = [c.name for c in client.get_collections().collections]
     if name not in cols:
         client.create_collection(name, vectors_config=VectorParams(size=size, distance=Distance.COSINE))
 
-def embed_chunks(tenant_id: str, doc_id: str, chunks: List[Dict], collection: str = "kb_chunks") -> int:
-    client = QdrantClient(url=str(settings.qdrant_url))
-    ensure_collection(client, collection, 16)
-    points = []
+def _cut_words(words: List[str], max_chars: int) -> Iterator[str]:
+    for w in words:
+        for i in range(0, len(w), max_chars):
+            yield w[i:i + max_chars]
+
+def iter_words(fp: IO, read_size: int = 1 << 16, encoding: str = "utf-8", max_word_chars: int = INGESTION_MAX_WORD_CHARS) -> Iterator[str]:
+    # читаем блоками; хвост блока без пробела может быть оборванным словом и переносится в следующий блок
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    carry = ""
+    while True:
+        block = fp.read(read_size)
+        if not block:
+            break
+        if isinstance(block, (bytes, bytearray)):
+            block = decoder.decode(block)
+        text = unicodedata.normalize("NFKC", carry + block)
+        words = text.split()
+        if words and not text[-1].isspace():
+            carry = words.pop()
+        else:
+            carry = ""
+        yield from _cut_words(words, max_word_chars)
+        while len(carry) > max_word_chars:
+            yield carry[:max_word_chars]
+            carry = carry[max_word_chars:]
+    rest = decoder.decode(b"", final=True)
+    yield from _cut_words(unicodedata.normalize("NFKC", carry + rest).split(), max_word_chars)
+
+def iter_chunks(words: Iterable[str], max_tokens: int = INGESTION_CHUNK_TOKENS, overlap_tokens: int = INGESTION_CHUNK_OVERLAP, tenant_id: str = "", doc_id: str = "") -> Iterator[Dict]:
+    cur: Deque[Tuple[str, int]] = deque()
+    cur_tokens = 0
+    fresh = 0
+    for w in words:
+        n = approx_tokens(w)
+        if cur and cur_tokens + n > max_tokens and fresh:
+            body = " ".join(x for x, _ in cur)
+            yield {"chunk_id": chunk_id(tenant_id, doc_id, body), "text": body}
+            # перекрытие: хвост предыдущего чанка в начале следующего
+            while cur and cur_tokens > overlap_tokens:
+                cur_tokens -= cur.popleft()[1]
+            fresh = 0
+        cur.append((w, n))
+        cur_tokens += n
+        fresh += 1
+    if cur and fresh:
+        body = " ".join(x for x, _ in cur)
+        yield {"chunk_id": chunk_id(tenant_id, doc_id, body), "text": body}
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch: List = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _points(tenant_id: str, doc_id: str, chunks: List[Dict], provider: BaseEmbeddingProvider) -> List[PointStruct]:
+    vectors = provider.embed_texts([ch["text"] for ch in chunks])
+    return [
+        PointStruct(id=point_id(tenant_id, doc_id, ch["chunk_id"]), vector=vec, payload={"tenant_id": tenant_id, "chunk_id": ch["chunk_id"], "doc_id": doc_id, "text": ch["text"]})
+        for ch, vec in zip(chunks, vectors)
+    ]
+
+def _upsert(client: QdrantClient, collection: str, points: List[PointStruct]) -> None:
+    with INGESTION_LATENCY_MS.time():
+        client.upsert(collection_name=collection, points=points)
+    INGESTION_SUCCESS_TOTAL.inc(len(points))
+
+class ChunkManifest:
+    # манифест документа в Postgres: какие чанки уже лежат в коллекции; run_id помечает чанки, увиденные текущей загрузкой
+    def __init__(self, tenant_id: str, doc_id: str, run_id: Optional[str] = None):
+        self.tenant_id = tenant_id
+        self.doc_id = doc_id
+        self.run_id = uuid.uuid4().hex if run_id is None else run_id
+
+    def touch(self, chunk_ids: List[str]) -> Set[str]:
+        return chunk_manifest_touch(self.tenant_id, self.doc_id, chunk_ids, self.run_id)
+
+    def add(self, chunk_ids: List[str]) -> None:
+        chunk_manifest_add(self.tenant_id, self.doc_id, chunk_ids, self.run_id)
+
+    def stale(self, limit: int) -> List[str]:
+        return chunk_manifest_stale(self.tenant_id, self.doc_id, self.run_id, limit)
+
+    def remove(self, chunk_ids: List[str]) -> None:
+        chunk_manifest_remove(self.tenant_id, self.doc_id, chunk_ids)
+
+def _manifest(tenant_id: str, doc_id: str, manifest: Optional[ChunkManifest]) -> Optional[ChunkManifest]:
+    if manifest is not None:
+        return manifest
+    # без Postgres загрузка остается идемпотентной за счет детерминированных id, но без пропуска и чистки
+    return ChunkManifest(tenant_id, doc_id) if pg_configured() else None
+
+def _new_chunks(chunks: List[Dict], manifest: Optional[ChunkManifest]) -> List[Dict]:
+    uniq: Dict[str, Dict] = {}
     for ch in chunks:
-        vec = _hash16(ch["text"])
-        pid = uuid.uuid4().int % (10**12)
-        points.append(PointStruct(id=pid, vector=vec, payload={"tenant_id": tenant_id, "chunk_id": ch["chunk_id"], "doc_id": doc_id, "text": ch["text"]}))
-    if points:
-        with INGESTION_LATENCY_MS.time():
-            client.upsert(collection_name=collection, points=points)
-        INGESTION_SUCCESS_TOTAL.inc(len(points))
-    return len(points)
+        uniq.setdefault(ch["chunk_id"], ch)
+    if manifest is None:
+        return list(uniq.values())
+    known = manifest.touch(list(uniq))
+    return [ch for cid, ch in uniq.items() if cid not in known]
+
+def sweep_removed_chunks(tenant_id: str, doc_id: str, manifest: ChunkManifest, collection: str = "kb_chunks", client: Optional[QdrantClient] = None, batch_size: int = INGESTION_SWEEP_BATCH) -> int:
+    # сначала удаляем точки, потом строки манифеста: при сбое строка останется и будет удалена следующей чисткой
+    client = client or _qdrant()
+    deleted = 0
+    while True:
+        ids = manifest.stale(batch_size)
+        if not ids:
+            break
+        client.delete(collection_name=collection, points_selector=PointIdsList(points=[point_id(tenant_id, doc_id, cid) for cid in ids]))
+        manifest.remove(ids)
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    if deleted:
+        logger.info("ingestion_chunks_swept", tenant_id=tenant_id, doc_id=doc_id, deleted=deleted)
+    return deleted
+
+def delete_document(tenant_id: str, doc_id: str, collection: str = "kb_chunks", client: Optional[QdrantClient] = None) -> int:
+    # пустой run_id не совпадает ни с одной загрузкой: весь манифест документа считается устаревшим
+    return sweep_removed_chunks(tenant_id, doc_id, ChunkManifest(tenant_id, doc_id, run_id=""), collection=collection, client=client)
+
+def embed_chunks(tenant_id: str, doc_id: str, chunks: List[Dict], collection: str = "kb_chunks", manifest: Optional[ChunkManifest] = None) -> int:
+    client = _qdrant()
+    ensure_collection(client, collection, 16)
+    provider = HashEmbeddingProvider(16)
+    manifest = _manifest(tenant_id, doc_id, manifest)
+    n = 0
+    for batch in batched(chunks, INGESTION_BATCH_SIZE):
+        fresh = _new_chunks(batch, manifest)
+        if fresh:
+            _upsert(client, collection, _points(tenant_id, doc_id, fresh, provider))
+            if manifest is not None:
+                manifest.add([ch["chunk_id"] for ch in fresh])
+        n += len(batch)
+    if manifest is not None:
+        sweep_removed_chunks(tenant_id, doc_id, manifest, collection=collection, client=client)
+    return n
+
+def ingest_stream(
+    tenant_id: str,
+    doc_id: str,
+    fp: IO,
+    collection: str = "kb_chunks",
+    batch_size: int = INGESTION_BATCH_SIZE,
+    max_inflight: int = INGESTION_MAX_INFLIGHT,
+    provider: Optional[BaseEmbeddingProvider] = None,
+    client: Optional[QdrantClient] = None,
+    manifest: Optional[ChunkManifest] = None,
+) -> Dict:
+    client = client or _qdrant()
+    provider = provider or HashEmbeddingProvider(16)
+    manifest = _manifest(tenant_id, doc_id, manifest)
+    ensure_collection(client, collection, int(getattr(provider, "dim", 16)))
+    # очередь ограничена: если Qdrant не успевает, чанкер и эмбеддинг ждут, память не растет
+    q: "queue.Queue[Optional[List[PointStruct]]]" = queue.Queue(maxsize=max(1, max_inflight))
+    state = {"upserted": 0, "error": None}
+
+    def writer() -> None:
+        while True:
+            points = q.get()
+            if points is None:
+                return
+            if state["error"] is not None:
+                continue
+            try:
+                _upsert(client, collection, points)
+                # в манифест попадает только то, что уже записано в Qdrant
+                if manifest is not None:
+                    manifest.add([p.payload["chunk_id"] for p in points])
+                state["upserted"] += len(points)
+            except Exception as e:
+                state["error"] = e
+
+    t = threading.Thread(target=writer, name=f"ingest-{doc_id}", daemon=True)
+    t.start()
+    chunks = 0
+    skipped = 0
+    try:
+        for batch in batched(iter_chunks(iter_words(fp), tenant_id=tenant_id, doc_id=doc_id), batch_size):
+            if state["error"] is not None:
+                break
+            fresh = _new_chunks(batch, manifest)
+            if fresh:
+                q.put(_points(tenant_id, doc_id, fresh, provider))
+            chunks += len(batch)
+            skipped += len(batch) - len(fresh)
+    finally:
+        q.put(None)
+        t.join()
+    if state["error"] is not None:
+        raise state["error"]
+    deleted = sweep_removed_chunks(tenant_id, doc_id, manifest, collection=collection, client=client) if manifest is not None else 0
+    logger.info("ingestion_stream_done", tenant_id=tenant_id, doc_id=doc_id, chunks=chunks, upserted=state["upserted"], skipped=skipped, deleted=deleted)
+    return {"chunks": chunks, "upserted": state["upserted"], "skipped": skipped, "deleted": deleted}
@@ -1,5 +1,5 @@
 from typing import Dict, List, Any
-from src.db.pg import get_conn
+from src.db.pool import pg_conn
 from src.services.integrity import check_prereq_cycles, check_dangling_skills
 
 def _collect_nodes_and_rels(ops: List[Dict[str, Any]]) -> Dict[str, List[Dict]]:
@@ -22,10 +22,8 @@ def _collect_nodes_and_rels(ops: List[Dict[str, Any]]) -> Dict[str, List[Dict]]:
     return {"nodes": nodes, "rels": rels}
 
 def process_once(limit: int = 20) -> Dict:
-    conn = get_conn()
-    conn.autocommit = True
     processed = 0
-    with conn.cursor() as cur:
+    with pg_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT proposal_id, tenant_id, operations_json FROM proposals WHERE status='ASYNC_CHECK_REQUIRED' LIMIT %s", (limit,))
         rows = cur.fetchall()
         for r in rows:
@@ -39,5 +37,4 @@ def process_once(limit: int = 20) -> Dict:
             else:
                 cur.execute("UPDATE proposals SET status='READY' WHERE proposal_id=%s", (pid,))
             processed += 1
-    conn.close()
     return {"processed": processed}
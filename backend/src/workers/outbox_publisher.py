@@ -1,46 +1,147 @@
-from typing import Dict
-from src.db.pg import outbox_fetch_unpublished, outbox_mark_published, outbox_mark_failed
+import os
+import select
+import signal
+import threading
+from typing import Dict, Optional
+from src.core.logging import logger
+from src.db.pg import OUTBOX_CHANNEL, get_conn
+from src.db.pool import pg_conn, pg_tx
 try:
-    from prometheus_client import Counter
+    from prometheus_client import Counter, Gauge
     OUTBOX_PUBLISH_TOTAL = Counter("outbox_publish_total", "Outbox publish attempts total", ["result"])
+    OUTBOX_LAG_SECONDS = Gauge("outbox_lag_seconds", "Age of the oldest unpublished outbox event, seconds")
+    OUTBOX_PENDING = Gauge("outbox_pending", "Unpublished outbox events")
+    OUTBOX_DEAD_LETTER_TOTAL = Counter("outbox_dead_letter_total", "Outbox events moved to the dead-letter table")
 except Exception:
     class _Dummy:
         def labels(self, *args, **kwargs): return self
         def inc(self, *args, **kwargs): ...
+        def set(self, *args, **kwargs): ...
     OUTBOX_PUBLISH_TOTAL = _Dummy()
-from src.events.publisher import publish_graph_committed
-
-def process_once(limit: int = 100) -> Dict:
-    events = outbox_fetch_unpublished(limit)
-    processed = 0
-    for e in events:
-        et = e["event_type"]
-        pl = e["payload"]
-        if et == "graph_committed":
-            try:
-                publish_graph_committed(pl)
-                outbox_mark_published(e["event_id"])
-                processed += 1
-                OUTBOX_PUBLISH_TOTAL.labels(result="success").inc()
-            except Exception as err:
-                outbox_mark_failed(e["event_id"], error=str(err))
-                OUTBOX_PUBLISH_TOTAL.labels(result="failed").inc()
-        else:
-            outbox_mark_failed(e["event_id"], error="unsupported_event_type")
-            OUTBOX_PUBLISH_TOTAL.labels(result="unsupported").inc()
-    return {"processed": processed}
-
-def process_retry(limit: int = 100) -> Dict:
-    evs = outbox_fetch_unpublished(limit)
-    retried = 0
-    for e in evs:
-        if e["event_type"] == "graph_committed":
-            try:
-                publish_graph_committed(e["payload"])
-                outbox_mark_published(e["event_id"])
-                retried += 1
-            except Exception as err:
-                outbox_mark_failed(e["event_id"], error=str(err))
-        else:
-            outbox_mark_failed(e["event_id"], error="unsupported_event_type")
-    return {"retried": retried}
+    OUTBOX_LAG_SECONDS = _Dummy()
+    OUTBOX_PENDING = _Dummy()
+    OUTBOX_DEAD_LETTER_TOTAL = _Dummy()
+from src.events.publisher import publish_graph_committed_many
+
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_SEC = float(os.environ.get("OUTBOX_POLL_SEC", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SEC = float(os.environ.get("OUTBOX_BACKOFF_BASE_SEC", "2"))
+OUTBOX_BACKOFF_MAX_SEC = float(os.environ.get("OUTBOX_BACKOFF_MAX_SEC", "600"))
+
+def _fail(cur, ids, error: str) -> int:
+    # base * 2^attempts с потолком и равномерным джиттером 50-100%, чтобы сбойные события не шли волной
+    cur.execute(
+        "UPDATE events_outbox SET attempts=attempts+1, last_error=%s, "
+        "next_attempt_at=LOCALTIMESTAMP + make_interval(secs => LEAST(%s, %s * power(2, attempts)) * (0.5 + random() / 2)) "
+        "WHERE event_id = ANY(%s)",
+        (error, OUTBOX_BACKOFF_MAX_SEC, OUTBOX_BACKOFF_BASE_SEC, ids),
+    )
+    cur.execute(
+        "WITH dead AS ("
+        "  DELETE FROM events_outbox WHERE event_id = ANY(%s) AND attempts >= %s"
+        "  RETURNING event_id, tenant_id, event_type, payload, attempts, last_error, created_at"
+        ") "
+        "INSERT INTO events_outbox_dead (event_id, tenant_id, event_type, payload, attempts, last_error, created_at) "
+        "SELECT event_id, tenant_id, event_type, payload, attempts, last_error, created_at FROM dead "
+        "ON CONFLICT (event_id) DO UPDATE SET attempts=EXCLUDED.attempts, last_error=EXCLUDED.last_error, dead_at=NOW()",
+        (ids, OUTBOX_MAX_ATTEMPTS),
+    )
+    dead = max(0, cur.rowcount or 0)
+    if dead:
+        OUTBOX_DEAD_LETTER_TOTAL.inc(dead)
+        logger.warning("outbox_events_dead_lettered", events=dead, error=error)
+    return dead
+
+def process_once(limit: int = OUTBOX_BATCH_SIZE) -> Dict:
+    # строки остаются заблокированными до COMMIT: параллельный relay их пропустит, а не опубликует повторно
+    with pg_tx() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT event_id, event_type, payload FROM events_outbox WHERE published=FALSE AND next_attempt_at <= LOCALTIMESTAMP "
+            "ORDER BY next_attempt_at, created_at LIMIT %s FOR UPDATE SKIP LOCKED",
+            (limit,),
+        )
+        rows = cur.fetchall()
+        ids = [r[0] for r in rows if r[1] == "graph_committed"]
+        unsupported = [r[0] for r in rows if r[1] != "graph_committed"]
+        if unsupported:
+            _fail(cur, unsupported, "unsupported_event_type")
+            OUTBOX_PUBLISH_TOTAL.labels(result="unsupported").inc(len(unsupported))
+        if not ids:
+            return {"processed": 0}
+        try:
+            publish_graph_committed_many(r[2] for r in rows if r[1] == "graph_committed")
+        except Exception as err:
+            _fail(cur, ids, str(err))
+            OUTBOX_PUBLISH_TOTAL.labels(result="failed").inc(len(ids))
+            logger.warning("outbox_publish_failed", events=len(ids), error=str(err))
+            return {"processed": 0}
+        cur.execute("UPDATE events_outbox SET published=TRUE WHERE event_id = ANY(%s)", (ids,))
+    OUTBOX_PUBLISH_TOTAL.labels(result="success").inc(len(ids))
+    return {"processed": len(ids)}
+
+def process_retry(limit: int = OUTBOX_BATCH_SIZE) -> Dict:
+    return {"retried": process_once(limit)["processed"]}
+
+def refresh_lag() -> Dict:
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*), EXTRACT(EPOCH FROM LOCALTIMESTAMP - MIN(created_at)) FROM events_outbox WHERE published=FALSE")
+        row = cur.fetchone()
+    pending, lag = int(row[0] or 0), max(0.0, float(row[1] or 0.0))
+    OUTBOX_PENDING.set(pending)
+    OUTBOX_LAG_SECONDS.set(lag)
+    return {"pending": pending, "lag_sec": lag}
+
+def drain(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    total = 0
+    while True:
+        n = process_once(limit)["processed"]
+        total += n
+        if n < limit:
+            return total
+
+def _listen():
+    conn = get_conn()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {OUTBOX_CHANNEL}")
+    return conn
+
+def run_forever(limit: int = OUTBOX_BATCH_SIZE, poll_sec: float = OUTBOX_POLL_SEC, stop: Optional[threading.Event] = None) -> None:
+    stop = stop or threading.Event()
+    listen = None
+    backoff = 1.0
+    logger.info("outbox_relay_started", batch=limit, poll_sec=poll_sec)
+    while not stop.is_set():
+        try:
+            if listen is None:
+                # подписка до дренажа: события, пришедшие во время дренажа, разбудят следующий цикл
+                listen = _listen()
+            published = drain(limit)
+            stats = refresh_lag()
+            if published:
+                logger.info("outbox_relay_published", events=published, **stats)
+            # таймаут страхует от потерянных уведомлений и событий, вставленных без NOTIFY
+            if select.select([listen], [], [], poll_sec)[0]:
+                listen.poll()
+                listen.notifies.clear()
+            backoff = 1.0
+        except Exception as e:
+            logger.warning("outbox_relay_error", error=str(e))
+            if listen is not None:
+                try:
+                    listen.close()
+                except Exception:
+                    pass
+                listen = None
+            stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+    if listen is not None:
+        listen.close()
+    logger.info("outbox_relay_stopped")
+
+if __name__ == "__main__":
+    _stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    signal.signal(signal.SIGINT, lambda *_: _stop.set())
+    run_forever(stop=_stop)
@@ -1,13 +1,66 @@
-from typing import Dict, List
+import os
+import signal
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
 from qdrant_client import QdrantClient
-from qdrant_client.models import FieldCondition, Filter, MatchValue, Distance, VectorParams
+from qdrant_client.models import FieldCondition, Filter, MatchValue, Distance, PointStruct, VectorParams
 from src.config.settings import settings
-from src.events.publisher import get_redis
-from src.services.graph.neo4j_repo import node_by_uid
+from src.core.logging import logger
+from src.events.consumer import StreamConsumer
+from src.events.publisher import GRAPH_COMMITTED_STREAM
+from src.services.graph.neo4j_repo import nodes_by_uids
 from src.services.embeddings.provider import get_provider
+try:
+    from prometheus_client import Counter, Histogram
+    VECTOR_SYNC_EVENTS_TOTAL = Counter("vector_sync_events_total", "graph_committed events handled by vector sync")
+    VECTOR_SYNC_POINTS_TOTAL = Counter("vector_sync_points_total", "Vector points written by vector sync", ["op"])
+    VECTOR_SYNC_BATCH_MS = Histogram("vector_sync_batch_ms", "Vector sync batch latency ms", ["stage"])
+except Exception:
+    class _Dummy:
+        def labels(self, *args, **kwargs): return self
+        def inc(self, *args, **kwargs): ...
+        def observe(self, *args, **kwargs): ...
+    VECTOR_SYNC_EVENTS_TOTAL = _Dummy()
+    VECTOR_SYNC_POINTS_TOTAL = _Dummy()
+    VECTOR_SYNC_BATCH_MS = _Dummy()
+
+VECTOR_SYNC_GROUP = "vector-sync"
+VECTOR_SYNC_EVENTS_PER_READ = int(os.environ.get("VECTOR_SYNC_EVENTS_PER_READ", "500"))
+VECTOR_SYNC_UPSERT_BATCH = int(os.environ.get("VECTOR_SYNC_UPSERT_BATCH", "256"))
+# фиксированное пространство имен: id точки однозначно выводится из (tenant_id, uid), повторная синхронизация перезаписывает точку
+POINT_NAMESPACE = uuid.UUID("6f0c5f0e-2d1b-4c55-9a51-6b3e1f9d7a42")
+
+_client: Optional[QdrantClient] = None
+_dims: Dict[str, int] = {}
+
+def _qdrant() -> QdrantClient:
+    global _client
+    if _client is None:
+        _client = QdrantClient(url=str(settings.qdrant_url))
+    return _client
+
+def point_id(tenant_id: str, uid: str) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{tenant_id}:{uid}"))
+
+def _collection_dim(client: QdrantClient, collection: str) -> int:
+    if collection in _dims:
+        return _dims[collection]
+    cols = [c.name for c in client.get_collections().collections]
+    dim = int(settings.qdrant_default_vector_dim)
+    if collection not in cols:
+        client.create_collection(collection, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    else:
+        try:
+            dim = int(client.get_collection(collection).config.params.vectors.size)  # type: ignore
+        except Exception:
+            dim = int(settings.qdrant_default_vector_dim)
+    _dims[collection] = dim
+    return dim
 
 def mark_entities_updated(tenant_id: str, targets: List[str], collection: str = "kb_entities") -> int:
-    client = QdrantClient(url=str(settings.qdrant_url))
+    client = _qdrant()
     cols = [c.name for c in client.get_collections().collections]
     if collection not in cols:
         client.create_collection(collection, vectors_config=VectorParams(size=8, distance=Distance.COSINE))
@@ -18,36 +71,58 @@ def mark_entities_updated(tenant_id: str, targets: List[str], collection: str =
         count += 1
     return count
 
-def consume_graph_committed() -> Dict:
-    r = get_redis()
-    raw = r.rpop("events:graph_committed")
-    if not raw:
-        return {"processed": 0}
-    import json
-    ev = json.loads(raw)
-    tenant_id = ev.get("tenant_id")
-    targets = ev.get("targets") or []
-    if tenant_id and targets:
-        n = 0
-        client = QdrantClient(url=str(settings.qdrant_url))
-        cols = [c.name for c in client.get_collections().collections]
-        name = str(settings.qdrant_collection_name)
-        dim = int(settings.qdrant_default_vector_dim)
-        if name not in cols:
-            client.create_collection(name, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
-        else:
-            try:
-                info = client.get_collection(name)
-                dim = int(info.result.config.params.vectors.size)  # type: ignore
-            except Exception:
-                dim = int(settings.qdrant_default_vector_dim)
-        for uid in targets:
-            props = node_by_uid(uid, tenant_id)
-            name = props.get("name") or props.get("title") or uid
-            import uuid
-            vec = get_provider(dim_default=dim).embed_text(name)
-            pid = uuid.uuid4().int % (10**12)
-            client.upsert(collection_name=name, points=[{"id": pid, "vector": vec, "payload": {"tenant_id": tenant_id, "uid": uid, "name": name}}])
-            n += 1
-        return {"processed": n}
-    return {"processed": 0}
+def _targets(events: List[Dict]) -> List[Tuple[str, str]]:
+    keys: Dict[Tuple[str, str], None] = {}
+    for ev in events:
+        tenant_id = ev.get("tenant_id")
+        if not tenant_id:
+            continue
+        for uid in ev.get("targets") or []:
+            keys[(tenant_id, uid)] = None
+    return list(keys)
+
+def sync_events(events: List[Dict]) -> int:
+    VECTOR_SYNC_EVENTS_TOTAL.inc(len(events))
+    keys = _targets(events)
+    if not keys:
+        return 0
+    client = _qdrant()
+    collection = str(settings.qdrant_collection_name)
+    dim = _collection_dim(client, collection)
+    t0 = time.perf_counter()
+    props = nodes_by_uids(keys)
+    VECTOR_SYNC_BATCH_MS.labels(stage="fetch").observe((time.perf_counter() - t0) * 1000)
+    found = [k for k in keys if k in props]
+    missing = len(keys) - len(found)
+    # коммиты не удаляют узлы, поэтому отсутствие в графе - это узел без метки или сбой чтения: точку не трогаем
+    if missing:
+        VECTOR_SYNC_POINTS_TOTAL.labels(op="missing").inc(missing)
+        logger.warning("vector_sync_targets_missing", missing=missing, sample=[u for t, u in keys if (t, u) not in props][:5])
+    if not found:
+        return 0
+    titles = [props[k].get("name") or props[k].get("title") or k[1] for k in found]
+    t0 = time.perf_counter()
+    provider = get_provider(dim_default=dim)
+    vectors = provider.embed_texts(titles)
+    VECTOR_SYNC_BATCH_MS.labels(stage="embed").observe((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    for i in range(0, len(found), VECTOR_SYNC_UPSERT_BATCH):
+        points = [
+            PointStruct(id=point_id(t, u), vector=vec, payload={"tenant_id": t, "uid": u, "name": title})
+            for (t, u), vec, title in zip(found[i:i + VECTOR_SYNC_UPSERT_BATCH], vectors[i:i + VECTOR_SYNC_UPSERT_BATCH], titles[i:i + VECTOR_SYNC_UPSERT_BATCH])
+        ]
+        client.upsert(collection_name=collection, points=points)
+    VECTOR_SYNC_BATCH_MS.labels(stage="upsert").observe((time.perf_counter() - t0) * 1000)
+    VECTOR_SYNC_POINTS_TOTAL.labels(op="upserted").inc(len(found))
+    logger.info("vector_sync_batch", events=len(events), targets=len(keys), upserted=len(found), missing=missing)
+    return len(found)
+
+def consume_graph_committed(consumer: Optional[str] = None, count: int = VECTOR_SYNC_EVENTS_PER_READ, block_ms: Optional[int] = None, stream: str = GRAPH_COMMITTED_STREAM) -> Dict:
+    c = StreamConsumer(VECTOR_SYNC_GROUP, consumer=consumer, stream=stream, count=count, block_ms=block_ms)
+    return {"processed": c.consume(sync_events)}
+
+if __name__ == "__main__":
+    _stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    signal.signal(signal.SIGINT, lambda *_: _stop.set())
+    StreamConsumer(VECTOR_SYNC_GROUP, count=VECTOR_SYNC_EVENTS_PER_READ).run_forever(sync_events, stop=_stop)
@@ -1,6 +1,7 @@
 import json, uuid
 from redis import Redis
 from src.config.settings import settings
+from src.events.publisher import GRAPH_COMMITTED_STREAM
 from src.db.pg import ensure_tables, get_conn
 from src.workers.outbox_publisher import process_once
 
@@ -19,8 +20,9 @@ def test_outbox_publishes_graph_committed_to_redis():
     res = process_once(limit=10)
     assert res["processed"] >= 1
     r = Redis.from_url(str(settings.redis_url))
-    raw = r.lpop("events:graph_committed")
-    assert raw is not None
+    entries = r.xrevrange(GRAPH_COMMITTED_STREAM, count=1)
+    assert entries
+    raw = entries[0][1][b"data"]
     s = raw.decode("utf-8") if isinstance(raw, (bytes, bytearray)) else str(raw)
     got = json.loads(s)
     assert got["tenant_id"] == tid
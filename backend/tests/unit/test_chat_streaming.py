@@ -0,0 +1,64 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api import graph
+from src.services.llm import answer_cache
+from src.services.llm.answer_cache import AnswerCache
+from src.services.llm.gateway import LLMUnavailable
+
+CTX = {"rel": "PREREQ", "props": {}, "from_title": "A", "to_title": "B"}
+PAYLOAD = {"question": "why?", "from_uid": "T1", "to_uid": "T2"}
+
+def events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+def _client(monkeypatch, stream):
+    monkeypatch.setattr(graph, "relation_context", lambda a, b: CTX)
+    monkeypatch.setattr(graph, "llm_stream", stream)
+    monkeypatch.setattr(answer_cache, "current_graph_version", lambda tid: 1)
+    monkeypatch.setattr(answer_cache, "_cache", AnswerCache(maxsize=10, ttl_sec=60))
+    app = FastAPI()
+    app.include_router(graph.router)
+    return TestClient(app)
+
+def test_graph_chat_streams_tokens_and_replays_from_cache(monkeypatch):
+    calls = []
+
+    async def fake_stream(messages, model, tenant_id=None):
+        calls.append(model)
+        yield {"delta": "Тема "}
+        yield {"delta": "B"}
+        yield {"done": True, "content": "Тема B", "usage": {"total_tokens": 5}, "model": model}
+
+    client = _client(monkeypatch, fake_stream)
+    r = client.post("/v1/graph/chat?stream=true", json=PAYLOAD)
+    assert r.headers["content-type"].startswith("text/event-stream") and r.headers["x-cache"] == "MISS"
+    evs = events(r.text)
+    assert [e for e, _ in evs] == ["delta", "delta", "done"]
+    assert evs[-1][1] == {"answer": "Тема B", "usage": {"total_tokens": 5}, "context": CTX}
+
+    r = client.post("/v1/graph/chat", json=PAYLOAD, headers={"Accept": "text/event-stream"})
+    assert r.headers["x-cache"] == "HIT" and len(calls) == 1
+    assert events(r.text) == [("delta", {"text": "Тема B"}), ("done", {"answer": "Тема B", "usage": {"total_tokens": 5}, "context": CTX})]
+
+def test_errors_before_first_token_keep_http_status(monkeypatch):
+    async def failing(messages, model, tenant_id=None):
+        raise LLMUnavailable("down", status=429)
+        yield
+
+    client = _client(monkeypatch, failing)
+    r = client.post("/v1/graph/chat?stream=true", json=PAYLOAD)
+    assert r.status_code == 503
+
+def test_errors_mid_stream_become_error_event(monkeypatch):
+    async def broken(messages, model, tenant_id=None):
+        yield {"delta": "Тема"}
+        raise LLMUnavailable("stream interrupted")
+
+    client = _client(monkeypatch, broken)
+    evs = events(client.post("/v1/graph/chat?stream=true", json=PAYLOAD).text)
+    assert [e for e, _ in evs] == ["delta", "error"]
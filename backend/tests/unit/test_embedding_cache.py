@@ -0,0 +1,46 @@
+from src.services.embeddings.cache import CachedEmbeddingProvider, SqliteEmbeddingStore, _pack, _unpack
+from src.services.embeddings.provider import HashEmbeddingProvider
+
+class CountingProvider(HashEmbeddingProvider):
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.seen = []
+
+    def embed_texts(self, texts):
+        self.seen.extend(texts)
+        return super().embed_texts(texts)
+
+class DictStore:
+    def __init__(self):
+        self.items = {}
+
+    def get_many(self, keys):
+        return {k: _unpack(self.items[k]) for k in keys if k in self.items}
+
+    def put_many(self, items):
+        self.items.update((k, _pack(v)) for k, v in items.items())
+
+def test_cache_embeds_each_canonical_text_once_across_tiers(tmp_path):
+    inner = CountingProvider(8)
+    redis_tier = DictStore()
+    cached = CachedEmbeddingProvider(inner, local=SqliteEmbeddingStore(str(tmp_path / "emb.sqlite")), remote=redis_tier)
+    first = cached.embed_texts(["Дроби", "  Дроби ", "Степени"])
+    assert inner.seen == ["Дроби", "Степени"]
+    assert first[0] == first[1] and len(first[2]) == 8
+    assert cached.embed_texts(["Степени", "Дроби"]) == [first[2], first[0]]
+    assert inner.seen == ["Дроби", "Степени"]
+    assert len(redis_tier.items) == 2
+
+    other_node = CachedEmbeddingProvider(CountingProvider(8), local=SqliteEmbeddingStore(":memory:"), remote=redis_tier)
+    assert other_node.embed_texts(["Дроби"]) == [first[0]]
+    assert other_node.inner.seen == []
+    assert CachedEmbeddingProvider(CountingProvider(16)).key("x") != cached.key("x")
+
+def test_sqlite_store_evicts_least_recently_used(tmp_path):
+    store = SqliteEmbeddingStore(str(tmp_path / "lru.sqlite"), max_entries=10)
+    store.put_many({f"k{i}": [float(i)] for i in range(10)})
+    store.get_many(["k0"])
+    store.put_many({"k10": [10.0]})
+    assert len(store) <= 10
+    assert store.get_many(["k0", "k10"]).keys() == {"k0", "k10"}
+    assert store.get_many(["k1"]) == {}
@@ -0,0 +1,79 @@
+from src.services.graph import utils as graph_utils
+
+class FakeResult:
+    def __init__(self, rec):
+        self.rec = rec
+
+    def single(self):
+        return self.rec
+
+class FakeTx:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query, after, batch):
+        label = query.split("(n:`", 1)[1].split("`", 1)[0]
+        self.graph.queries.append((label, after))
+        page = [u for u in sorted(self.graph.nodes[label]) if u > after][:batch]
+        self.graph.labeled.update((label, u) for u in page)
+        return FakeResult({"c": len(page), "last": page[-1] if page else None})
+
+class FakeSession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def run(self, query, **kw):
+        if query.startswith("CALL db.labels()"):
+            return [{"label": l} for l in list(self.graph.nodes) + ["Entity", "User"]]
+        if query.startswith("SHOW INDEXES"):
+            return [{"labels": ["Topic"]}]
+        self.graph.schema.append(query)
+        return []
+
+    def execute_write(self, fn, *args):
+        return fn(FakeTx(self.graph), *args)
+
+class FakeGraph:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.queries = []
+        self.labeled = set()
+        self.schema = []
+
+class FakeRepo:
+    graph = None
+
+    def __init__(self):
+        self.driver = self
+
+    def session(self):
+        return FakeSession(self.graph)
+
+    def close(self):
+        pass
+
+def test_backfill_pages_each_label_by_uid_cursor_and_resumes(monkeypatch):
+    graph = FakeGraph({"Topic": ["t1", "t2", "t3"], "Concept": ["c1", "c2"]})
+    FakeRepo.graph = graph
+    monkeypatch.setattr(graph_utils, "Neo4jRepo", FakeRepo)
+    saved = {}
+
+    first = graph_utils.backfill_entity_label(batch_size=2, max_batches=2, on_batch=lambda label, st: saved.__setitem__(label, st))
+    assert first["done"] is False
+    assert graph.queries == [("Concept", ""), ("Concept", "c2")]
+    assert saved["Concept"] == {"last_uid": "c2", "scanned": 2, "done": True}
+    # у Concept нет индекса по uid, а Topic уже покрыт ограничением
+    assert any("FOR (n:`Concept`) ON (n.uid)" in q for q in graph.schema)
+    assert not any("FOR (n:`Topic`) ON (n.uid)" in q for q in graph.schema)
+
+    graph.queries.clear()
+    second = graph_utils.backfill_entity_label(batch_size=2, progress=saved, on_batch=lambda label, st: saved.__setitem__(label, st))
+    assert second["done"] is True and second["pending"] == []
+    assert graph.queries == [("Topic", ""), ("Topic", "t2")]
+    assert graph.labeled == {("Topic", "t1"), ("Topic", "t2"), ("Topic", "t3"), ("Concept", "c1"), ("Concept", "c2")}
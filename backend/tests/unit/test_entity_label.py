@@ -0,0 +1,20 @@
+from src.services.graph.neo4j_writer import merge_node, update_node, merge_rel, update_rel
+
+class FakeTx:
+    def __init__(self):
+        self.queries = []
+
+    def run(self, query, **params):
+        self.queries.append(query)
+
+def test_writers_label_and_match_entities():
+    tx = FakeTx()
+    merge_node(tx, "acme", "Topic", "TOP-1", {"title": "T"}, {"source_chunk_id": "CH-1", "quote": "q"})
+    update_node(tx, "acme", "TOP-1", {"title": "T2"})
+    merge_rel(tx, "acme", "PREREQ", "TOP-1", "TOP-2", "R-1", {})
+    update_rel(tx, "acme", None, "TOP-1", "TOP-2", "R-1", {})
+    assert "SET n:Entity" in tx.queries[0]
+    for q in tx.queries[1:]:
+        if q.lstrip().startswith("MATCH"):
+            assert "(n {" not in q and "(a {" not in q and "(b {" not in q
+            assert ":Entity {" in q
@@ -1,14 +1,13 @@
-from src.events.publisher import publish_graph_committed, get_redis
+from src.events.publisher import publish_graph_committed, get_redis, GRAPH_COMMITTED_STREAM
 import json, uuid
 
-def test_publish_graph_committed_pushes_to_list():
+def test_publish_graph_committed_appends_to_stream():
     r = get_redis()
-    key = "events:graph_committed"
-    before = r.llen(key)
+    before = r.xlen(GRAPH_COMMITTED_STREAM)
     ev = {"tenant_id": "tenant-"+uuid.uuid4().hex[:6], "proposal_id": "P-"+uuid.uuid4().hex[:6], "graph_version": 42}
     publish_graph_committed(ev)
-    after = r.llen(key)
+    after = r.xlen(GRAPH_COMMITTED_STREAM)
     assert after == before + 1
-    raw = r.lpop(key)
-    data = json.loads(raw)
+    _id, fields = r.xrevrange(GRAPH_COMMITTED_STREAM, count=1)[0]
+    data = json.loads(fields[b"data"])
     assert data["graph_version"] == 42
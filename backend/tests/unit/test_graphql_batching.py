@@ -0,0 +1,61 @@
+import asyncio
+from src.api.graphql import schema
+from src.services.graph.batch_loaders import GraphLoaders
+
+ERRORS = [f"ERR-{i}" for i in range(25)]
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def run(self, query, params):
+        self.driver.queries.append(query)
+        keys = params["uids"]
+        if "(:Topic {uid:u})-[:USES_SKILL]->(:Skill)<-[:TRIGGERS]" in query:
+            return FakeResult([{"key": k, "uid": e, "title": e} for k in keys for e in ERRORS])
+        if "[:TRIGGERS]->(sk:Skill)" in query:
+            return FakeResult([{"key": k, "uid": "SKL-1", "title": "Skill"} for k in keys])
+        if "[:ILLUSTRATED_BY]" in query:
+            return FakeResult([{"key": k, "uid": f"EX-{k}", "title": "Ex", "statement": "s", "difficulty": 3} for k in keys])
+        return FakeResult([])
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+def _run(query, drv):
+    loaders = GraphLoaders(driver_factory=lambda: drv)
+    return asyncio.run(schema.execute(query, context_value={"loaders": loaders}))
+
+def test_errors_by_topic_runs_constant_number_of_queries():
+    drv = FakeDriver()
+    res = _run('query { errorsByTopic(topic_uid: "TOP-1") { uid title triggers { uid } examples { uid } } }', drv)
+    assert res.errors is None
+    assert len(res.data["errorsByTopic"]) == len(ERRORS)
+    assert res.data["errorsByTopic"][3]["examples"] == [{"uid": "EX-ERR-3"}]
+    assert len(drv.queries) == 3
+
+def test_topic_fields_are_fetched_once_per_loader():
+    drv = FakeDriver()
+    res = _run('query { a: topic(uid: "TOP-1") { title goals { uid } objectives { uid } } b: topic(uid: "TOP-2") { title goals { uid } } }', drv)
+    assert res.errors is None
+    assert len(drv.queries) == 2
@@ -0,0 +1,77 @@
+import asyncio
+from graphql import parse
+from src.api.graphql import schema
+from src.services.graph import graphql_cost, persisted_queries
+from src.services.graph.batch_loaders import GraphLoaders
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def run(self, query, params):
+        self.driver.queries.append(query)
+        return FakeResult([{"key": k, "uid": f"ERR-{k}", "title": "Err"} for k in params["uids"]])
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+def _run(query, drv=None):
+    loaders = GraphLoaders(driver_factory=lambda: drv or FakeDriver())
+    return asyncio.run(schema.execute(query, context_value={"loaders": loaders}))
+
+def test_cost_accounts_for_list_multipliers_and_fragments():
+    q = parse(
+        "query { errorsByTopic(topic_uid: \"T\") { ...E } } "
+        "fragment E on ErrorNode { uid triggers { uid } examples { uid title } }"
+    )
+    cost = graphql_cost.analyze_query(schema._schema, q)
+    assert cost.depth == 3
+    assert cost.breadth == 7
+    assert cost.cost == 30 + 30 * 5 + 30 * 10
+
+def test_expensive_query_is_rejected_before_execution():
+    aliases = " ".join(f"g{i}: graph {{ nodes {{ uid }} edges {{ source }} }}" for i in range(4))
+    res = _run("query { " + aliases + " }")
+    assert res.data is None
+    assert res.errors[0].extensions["code"] == "QUERY_TOO_EXPENSIVE"
+
+def test_depth_limit(monkeypatch):
+    monkeypatch.setattr(graphql_cost, "MAX_DEPTH", 2)
+    res = _run('query { errorsByTopic(topic_uid: "T") { triggers { uid } } }')
+    assert res.errors and "depth" in res.errors[0].message
+
+def test_persisted_query_results_cached_per_graph_version(monkeypatch):
+    version = {"v": 1}
+    monkeypatch.setattr(persisted_queries, "current_graph_version", lambda tid: version["v"])
+    persisted_queries.result_cache.clear()
+    query = 'query { errorsBySkill(skill_uid: "SK-1") { uid title } }'
+    assert persisted_queries.resolve_persisted_query(persisted_queries.registry, query, {"persistedQuery": {"sha256Hash": persisted_queries.query_hash(query)}}) == query
+    drv = FakeDriver()
+    first = _run(query, drv)
+    second = _run(query, drv)
+    assert first.errors is None and second.data == first.data
+    assert len(drv.queries) == 1
+    version["v"] = 2
+    _run(query, drv)
+    assert len(drv.queries) == 2
+    assert persisted_queries.resolve_persisted_query(persisted_queries.registry, None, {"persistedQuery": {"sha256Hash": persisted_queries.query_hash(query)}}) == query
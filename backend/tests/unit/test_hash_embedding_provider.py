@@ -7,3 +7,9 @@ def test_hash_embedding_provider_dim():
     p16 = HashEmbeddingProvider(dim=16)
     v16 = p16.embed_text("hello")
     assert len(v16) == 16
+
+def test_hash_embedding_batch_matches_single():
+    texts = ["hello", "", "привет мир", "x" * 1000]
+    for dim in (8, 16, 40):
+        p = HashEmbeddingProvider(dim=dim)
+        assert p.embed_texts(texts) == [p.embed_text(t) for t in texts]
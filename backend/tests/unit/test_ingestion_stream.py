@@ -0,0 +1,103 @@
+import io
+from types import SimpleNamespace
+import pytest
+from src.workers.ingestion import ingest_stream, iter_chunks, iter_words, normalize_text
+
+TEXT = "  Ｈｅｌｌｏ\tмир  " + " ".join(f"слово{i}" for i in range(500)) + "\n конец"
+
+def test_iter_words_matches_whole_document_normalization_across_blocks():
+    expected = normalize_text(TEXT).split(" ")
+    assert list(iter_words(io.BytesIO(TEXT.encode("utf-8")), read_size=7)) == expected
+    assert list(iter_words(io.StringIO(TEXT), read_size=5)) == expected
+
+def test_iter_words_splits_text_without_whitespace():
+    blob = "a" * 10000
+    words = list(iter_words(io.StringIO("start " + blob + " end"), read_size=300, max_word_chars=256))
+    assert words[0] == "start" and words[-1] == "end"
+    assert all(len(w) <= 256 for w in words)
+    assert "".join(words[1:-1]) == blob
+
+def test_iter_chunks_respects_token_budget_and_overlaps():
+    words = [f"{i:02d}" for i in range(100)]
+    chunks = list(iter_chunks(words, max_tokens=20, overlap_tokens=4))
+    parts = [c["text"].split(" ") for c in chunks]
+    assert all(len(p) <= 20 for p in parts)
+    for prev, nxt in zip(parts, parts[1:]):
+        assert nxt[:4] == prev[-4:]
+    assert parts[-1][-1] == "99"
+    assert {w for p in parts for w in p} == set(words)
+
+class FakeQdrant:
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    def get_collections(self):
+        return SimpleNamespace(collections=[SimpleNamespace(name="kb_chunks")])
+
+    def upsert(self, collection_name, points):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("qdrant unavailable")
+        self.batches.append(len(points))
+
+def test_ingest_stream_upserts_fixed_size_batches():
+    client = FakeQdrant()
+    res = ingest_stream("t", "doc", io.BytesIO(TEXT.encode("utf-8")), batch_size=4, max_inflight=1, client=client)
+    assert res["chunks"] == res["upserted"] == sum(client.batches)
+    assert all(n == 4 for n in client.batches[:-1])
+
+def test_ingest_stream_surfaces_writer_errors():
+    with pytest.raises(RuntimeError):
+        ingest_stream("t", "doc", io.StringIO(TEXT), batch_size=2, max_inflight=1, client=FakeQdrant(fail_after=1))
+
+class DictManifest:
+    def __init__(self, rows=None):
+        self.rows = dict(rows or {})
+        self.run_id = None
+
+    def start(self, run_id):
+        self.run_id = run_id
+        return self
+
+    def touch(self, ids):
+        known = {i for i in ids if i in self.rows}
+        self.rows.update((i, self.run_id) for i in known)
+        return known
+
+    def add(self, ids):
+        self.rows.update((i, self.run_id) for i in ids)
+
+    def stale(self, limit):
+        return [i for i, r in self.rows.items() if r != self.run_id][:limit]
+
+    def remove(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+class RecordingQdrant(FakeQdrant):
+    def __init__(self):
+        super().__init__()
+        self.ids = set()
+
+    def upsert(self, collection_name, points):
+        super().upsert(collection_name, points)
+        self.ids.update(p.id for p in points)
+
+    def delete(self, collection_name, points_selector):
+        self.ids.difference_update(points_selector.points)
+
+def test_reingestion_skips_unchanged_chunks_and_sweeps_removed_ones():
+    client = RecordingQdrant()
+    manifest = DictManifest()
+    first = ingest_stream("t", "doc", io.StringIO(TEXT), batch_size=4, max_inflight=1, client=client, manifest=manifest.start("r1"))
+    assert first["upserted"] == first["chunks"] and first["skipped"] == 0
+    points = set(client.ids)
+
+    again = ingest_stream("t", "doc", io.StringIO(TEXT), batch_size=4, max_inflight=1, client=client, manifest=manifest.start("r2"))
+    assert again["upserted"] == 0 and again["skipped"] == first["chunks"] and again["deleted"] == 0
+    assert client.ids == points
+
+    shorter = TEXT[: len(TEXT) // 2]
+    third = ingest_stream("t", "doc", io.StringIO(shorter), batch_size=4, max_inflight=1, client=client, manifest=manifest.start("r3"))
+    assert third["deleted"] > 0
+    assert len(client.ids) == len(manifest.rows) == third["upserted"] + third["skipped"]
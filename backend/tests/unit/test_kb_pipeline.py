@@ -0,0 +1,100 @@
+import asyncio
+from src.services.kb import builder, jsonl_io
+from src.services.kb.jsonl_io import load_jsonl
+from src.services.kb.pipeline import StagedPipeline
+
+def test_pipeline_shares_llm_budget_and_reports_progress():
+    state = {"now": 0, "peak": 0}
+    progress = []
+
+    async def run():
+        pipe = StagedPipeline(budget=2, queue_size=1, on_progress=lambda stage, stats: progress.append((stage, stats["done"])))
+
+        async def llm():
+            async with pipe.budget:
+                state["now"] += 1
+                state["peak"] = max(state["peak"], state["now"])
+                await asyncio.sleep(0.01)
+                state["now"] -= 1
+
+        async def first(i):
+            await llm()
+            if i == 3:
+                raise ValueError("bad item")
+            await pipe.put("second", i)
+
+        async def second(i):
+            await llm()
+
+        pipe.stage("first", first, workers=4)
+        pipe.stage("second", second, workers=4)
+
+        async def source():
+            for i in range(10):
+                await pipe.put("first", i)
+
+        return await pipe.run(source)
+
+    stats = asyncio.run(run())
+    assert stats == {"first": {"queued": 10, "done": 9, "failed": 1}, "second": {"queued": 9, "done": 9, "failed": 0}}
+    assert state["peak"] == 2
+    assert ("second", 9) in progress
+
+def _patch_generators(monkeypatch, tmp_path, fail_skills_for=None, sections_error=None):
+    monkeypatch.setattr(jsonl_io, "KB_DIR", str(tmp_path))
+    flushes = []
+    append_many = jsonl_io.append_jsonl_many
+    monkeypatch.setattr(jsonl_io, "append_jsonl_many", lambda path, recs: flushes.append(len(recs)) or append_many(path, recs))
+    monkeypatch.setattr(builder, "generate_goals_and_objectives", lambda: None)
+    monkeypatch.setattr(builder, "normalize_kb", lambda: None)
+
+    async def topics(title, language, count):
+        return [{"title": f"{title}-t{i}", "description": ""} for i in range(count)]
+
+    async def skills(title, language, count):
+        if title == fail_skills_for:
+            raise builder.LLMError("rate limited")
+        return [{"title": f"{title}-s{i}", "definition": ""} for i in range(count)]
+
+    async def methods(title, count):
+        return [{"title": f"{title}-m{i}", "method_text": "x"} for i in range(count)]
+
+    async def examples(title, count, difficulty):
+        return [{"title": f"{title}-e{i}", "statement": "x", "difficulty": difficulty} for i in range(count)]
+
+    async def sections(title, language, count):
+        if sections_error:
+            raise sections_error
+        return [f"{title}-{i}" for i in range(count)]
+
+    monkeypatch.setattr(builder, "generate_sections_openai_async", sections)
+    monkeypatch.setattr(builder, "generate_topics_for_section_openai_async", topics)
+    monkeypatch.setattr(builder, "generate_skills_for_topic_openai_async", skills)
+    monkeypatch.setattr(builder, "generate_methods_for_skill_openai_async", methods)
+    monkeypatch.setattr(builder, "generate_examples_for_topic_openai_async", examples)
+    return flushes
+
+def test_generate_subject_runs_stages_and_flushes_in_batches(monkeypatch, tmp_path):
+    flushes = _patch_generators(monkeypatch, tmp_path)
+    res = asyncio.run(builder.generate_subject_openai_async("SUB-T", "Test", "ru", sections_seed=["A", "B"], topics_per_section=3, skills_per_topic=2, methods_per_skill=2, examples_per_topic=2, concurrency=3))
+    assert (res["sections"], res["topics"]) == (2, 6)
+    assert len(load_jsonl(str(tmp_path / "skills.jsonl"))) == 12
+    assert len(load_jsonl(str(tmp_path / "skill_methods.jsonl"))) == 24
+    assert len(load_jsonl(str(tmp_path / "examples.jsonl"))) == 12
+    assert res["stages"]["methods"]["done"] == 12
+    assert sum(flushes) == res["records"] == 1 + 2 + 6 + 12 * 2 + 12 + 24 * 2
+    # одна запись на файл за вызов была бы >90 перезаписей
+    assert len(flushes) <= 10
+
+def test_generate_subject_reports_failed_items(monkeypatch, tmp_path):
+    _patch_generators(monkeypatch, tmp_path, fail_skills_for="A-t0")
+    res = asyncio.run(builder.generate_subject_openai_async("SUB-T", "Test", "ru", sections_seed=["A"], topics_per_section=2, skills_per_topic=1, methods_per_skill=1, examples_per_topic=1))
+    assert res["ok"] is False and res["failed"] == {"skills": 1}
+    assert res["stages"]["examples"]["done"] == 2
+
+def test_generate_subject_without_seed_reports_unavailable_llm(monkeypatch, tmp_path):
+    _patch_generators(monkeypatch, tmp_path, sections_error=builder.LLMError("LLM unavailable"))
+    res = asyncio.run(builder.generate_subject_openai_async("SUB-T", "Test", "ru"))
+    assert res["ok"] is False and res["failed"] == {"sections": 1}
+    assert (res["sections"], res["topics"]) == (0, 0)
+    assert [r["uid"] for r in load_jsonl(str(tmp_path / "subjects.jsonl"))] == ["SUB-T"]
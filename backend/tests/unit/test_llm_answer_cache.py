@@ -0,0 +1,59 @@
+import asyncio
+import time
+from src.services.llm import answer_cache
+from src.services.llm.answer_cache import AnswerCache, answer_key, cache_directives, cached_answer
+
+class FakeRedis:
+    def __init__(self):
+        self.items = {}
+
+    def get(self, key):
+        return self.items.get(key)
+
+    def ttl(self, key):
+        return 60
+
+    def set(self, key, value, ex=None):
+        self.items[key] = value
+
+MESSAGES = [{"role": "system", "content": "expert"}, {"role": "user", "content": "Q: why?\nFrom: A (T1)"}]
+
+def _run(cache, version, monkeypatch, cache_control=None, messages=MESSAGES):
+    calls = []
+
+    async def ask():
+        calls.append(1)
+        return {"answer": f"v{version}", "usage": {"total_tokens": 10}}
+
+    monkeypatch.setattr(answer_cache, "current_graph_version", lambda tid: version)
+    res, hit = asyncio.run(cached_answer("acme", "gpt-4o-mini", messages, ask, cache_control=cache_control, cache=cache))
+    return res, hit, len(calls)
+
+def test_answers_are_reused_until_graph_version_changes(monkeypatch):
+    cache = AnswerCache(maxsize=10, ttl_sec=60)
+    assert _run(cache, 1, monkeypatch)[1:] == (False, 1)
+    spaced = [dict(m, content="  " + m["content"].replace(" ", "  ")) for m in MESSAGES]
+    res, hit, calls = _run(cache, 1, monkeypatch, messages=spaced)
+    assert (res["answer"], hit, calls) == ("v1", True, 0)
+    assert _run(cache, 2, monkeypatch)[1:] == (False, 1)
+
+def test_no_cache_revalidates_and_no_store_bypasses(monkeypatch):
+    cache = AnswerCache(maxsize=10, ttl_sec=60)
+    _run(cache, 1, monkeypatch)
+    assert _run(cache, 1, monkeypatch, cache_control="no-cache")[1:] == (False, 1)
+    assert _run(cache, 3, monkeypatch, cache_control="no-store")[1:] == (False, 1)
+    assert _run(cache, 3, monkeypatch)[1:] == (False, 1)
+    assert cache_directives("max-age=0, No-Cache") == (True, False)
+
+def test_redis_tier_is_shared_and_local_tier_expires(monkeypatch):
+    redis = FakeRedis()
+    first = AnswerCache(maxsize=1, ttl_sec=0.05, redis=redis)
+    _run(first, 1, monkeypatch)
+    other = AnswerCache(maxsize=10, ttl_sec=60, redis=redis)
+    assert _run(other, 1, monkeypatch)[1:] == (True, 0)
+    time.sleep(0.06)
+    key = answer_key("acme", 1, "gpt-4o-mini", MESSAGES)
+    assert first._local_get(key) is None
+    first.set("other", {"answer": "x"})
+    first.set(key, {"answer": "y"})
+    assert len(first) == 1
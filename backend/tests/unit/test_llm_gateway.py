@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from src.services.llm.gateway import LLMGateway, LLMUnavailable, TokenBucket, parse_reset
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def ok(content="ok", headers=None):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}], "model": "m"}, headers=headers or {})
+
+def test_parse_reset_understands_openai_durations():
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert parse_reset("1.5") == 1.5
+    assert parse_reset(None) is None
+
+def test_retries_429_honouring_retry_after():
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after": "0.3"}, text="slow down")
+        return ok("done")
+
+    gw = LLMGateway(api_key="k", transport=httpx.MockTransport(handler), max_retries=2)
+    try:
+        assert gw.chat_sync(MESSAGES)["content"] == "done"
+    finally:
+        gw.close()
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.3
+
+def test_exhausted_retries_and_auth_errors_are_unavailable():
+    gw = LLMGateway(api_key="k", transport=httpx.MockTransport(lambda r: httpx.Response(401, text="bad key")), max_retries=0)
+    try:
+        with pytest.raises(LLMUnavailable) as e:
+            gw.chat_sync(MESSAGES)
+        assert e.value.status == 401
+    finally:
+        gw.close()
+
+def test_rate_limit_headers_update_buckets():
+    headers = {"x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s", "x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "100"}
+    gw = LLMGateway(api_key="k", transport=httpx.MockTransport(lambda r: ok(headers=headers)))
+    try:
+        gw.chat_sync(MESSAGES)
+    finally:
+        gw.close()
+    assert gw.requests.capacity == 60 and gw.requests.per_sec == 1.0
+    assert gw.requests.wait(1) > 1.5
+    assert gw.tokens.capacity == 6000 and gw.tokens.tokens <= 100
+
+def test_token_bucket_waits_for_refill():
+    b = TokenBucket(10, 10)
+    assert b.wait(10) == 0
+    b.take(10)
+    assert b.wait(5) == pytest.approx(0.5, abs=0.05)
+
+def test_tenant_concurrency_is_bounded_and_async_chat_shares_the_gateway():
+    lock = threading.Lock()
+    state = {"now": 0, "peak": 0}
+
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            with lock:
+                state["now"] += 1
+                state["peak"] = max(state["peak"], state["now"])
+            await asyncio.sleep(0.05)
+            with lock:
+                state["now"] -= 1
+            return ok()
+
+    gw = LLMGateway(api_key="k", transport=Transport(), tenant_concurrency=2, max_concurrency=8)
+
+    async def run():
+        return await asyncio.gather(*(gw.chat(MESSAGES, tenant_id="t1") for _ in range(6)))
+
+    try:
+        res = asyncio.run(run())
+        assert gw.chat_sync(MESSAGES, tenant_id="t2")["content"] == "ok"
+    finally:
+        gw.close()
+    assert len(res) == 6 and state["peak"] == 2
+
+def sse(*chunks):
+    return "".join(f"data: {c}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+def test_stream_yields_deltas_then_final_usage():
+    body = sse('{"choices":[{"delta":{"content":"Hel"}}]}', '{"choices":[{"delta":{"content":"lo"}}]}', '{"choices":[],"usage":{"total_tokens":7},"model":"m"}')
+    seen = []
+
+    def handler(request):
+        seen.append(request.read())
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    gw = LLMGateway(api_key="k", transport=httpx.MockTransport(handler))
+
+    async def run():
+        return [item async for item in gw.stream(MESSAGES)]
+
+    try:
+        items = asyncio.run(run())
+    finally:
+        gw.close()
+    assert items[:2] == [{"delta": "Hel"}, {"delta": "lo"}]
+    assert items[2] == {"done": True, "content": "Hello", "usage": {"total_tokens": 7}, "model": "m"}
+    assert b'"stream":true' in seen[0].replace(b" ", b"")
+
+def test_closing_stream_cancels_request_and_frees_slot():
+    closed = threading.Event()
+
+    class Hanging(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b'data: {"choices":[{"delta":{"content":"a"}}]}\n\n'
+            await asyncio.sleep(30)
+
+        async def aclose(self):
+            closed.set()
+
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if b'"stream"' not in request.content:
+                return ok("after")
+            return httpx.Response(200, stream=Hanging())
+
+    gw = LLMGateway(api_key="k", transport=Transport(), max_concurrency=1)
+
+    async def run():
+        items = gw.stream(MESSAGES)
+        first = await items.__anext__()
+        await items.aclose()
+        return first
+
+    try:
+        assert asyncio.run(run()) == {"delta": "a"}
+        assert closed.wait(2)
+        # единственный слот освобожден: следующий запрос не ждет
+        assert gw.chat_sync(MESSAGES)["content"] == "after"
+    finally:
+        gw.close()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from src.services.vector.base import VectorPoint
+from src.services.vector.local_index import LocalVectorIndex
+
+def _points(vecs, start=0):
+    return [VectorPoint(f"c{start + i}", v.tolist(), {"title": f"t{start + i}"}) for i, v in enumerate(vecs)]
+
+def test_flat_index_persists_and_overwrites(tmp_path):
+    rnd = np.random.default_rng(1)
+    vecs = rnd.normal(size=(50, 8)).astype(np.float32)
+    idx = LocalVectorIndex(path=str(tmp_path), collection="concepts", dim=8)
+    idx.upsert(_points(vecs))
+    assert idx.search(vecs[7].tolist(), top_k=1)[0][0] == "c7"
+    idx.upsert([VectorPoint("c7", vecs[3].tolist(), {"title": "moved"})])
+    idx.close()
+
+    again = LocalVectorIndex(path=str(tmp_path), collection="concepts", dim=8)
+    assert again.health()["count"] == 50
+    top = again.search(vecs[3].tolist(), top_k=2)
+    assert {i for i, _ in top} == {"c3", "c7"} and top[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert again.payload("c7") == {"title": "moved"}
+    with pytest.raises(RuntimeError):
+        LocalVectorIndex(path=str(tmp_path), collection="concepts", dim=8).ensure_collection()
+    again.close()
+
+def test_graph_index_recall_matches_brute_force(tmp_path):
+    rnd = np.random.default_rng(2)
+    vecs = rnd.normal(size=(1500, 16)).astype(np.float32)
+    idx = LocalVectorIndex(path=str(tmp_path), collection="big", dim=16, graph_min=300, m=12, ef_search=64, ef_build=48)
+    for i in range(0, len(vecs), 500):
+        idx.upsert(_points(vecs[i:i + 500], start=i))
+    assert idx.health()["mode"] == "graph"
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    hits = 0
+    queries = rnd.normal(size=(50, 16)).astype(np.float32)
+    for q in queries:
+        truth = {f"c{i}" for i in np.argsort(-(unit @ (q / np.linalg.norm(q))))[:10]}
+        hits += len(truth & {i for i, _ in idx.search(q.tolist(), top_k=10)})
+    assert hits / (10 * len(queries)) >= 0.9
+    idx.close()
+
+def test_settings_select_local_backend(tmp_path, monkeypatch):
+    from src.services.vector import qdrant_service
+    from src.config.settings import VectorBackend, settings
+    monkeypatch.setattr(settings, "vector_backend", VectorBackend.local)
+    monkeypatch.setattr(settings, "vector_local_path", str(tmp_path))
+    qdrant_service.set_vector_service(None)
+    try:
+        svc = qdrant_service.get_vector_service()
+        assert isinstance(svc, LocalVectorIndex) and svc.dir.startswith(str(tmp_path))
+    finally:
+        qdrant_service.set_vector_service(None)
@@ -0,0 +1,56 @@
+import asyncio
+from src.api import construct
+from src.api.construct import MagicFillInput, magic_fill
+from src.services.ai_engine import ai_engine
+from src.services.ai_engine.ai_engine import GeneratedBundle, GeneratedConcept
+from src.services.embeddings.provider import HashEmbeddingProvider
+from src.services.vector import qdrant_service
+from src.services.vector.base import VectorPoint
+from src.services.vector.local_index import LocalVectorIndex
+
+class CountingProvider(HashEmbeddingProvider):
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.calls = []
+
+    def embed_texts(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_texts(texts)
+
+def _concept(title, definition):
+    return GeneratedConcept(title=title, definition=definition, reasoning="")
+
+def test_magic_fill_embeds_searches_and_upserts_once_per_bundle(tmp_path, monkeypatch):
+    provider = CountingProvider(16)
+    store = LocalVectorIndex(path=str(tmp_path), collection="concepts", dim=16, provider=provider)
+    store.upsert([VectorPoint("CN-existing", HashEmbeddingProvider(16).embed_text("Дроби Часть целого"), {"title": "Дроби"})])
+    searches = []
+    store_search_many = store.search_many
+    monkeypatch.setattr(store, "search_many", lambda embs, top_k=5: searches.append(len(embs)) or store_search_many(embs, top_k))
+    bundle = GeneratedBundle(skills=[], concepts=[
+        _concept("Дроби", "Часть целого"),
+        _concept("Степени", "Произведение равных множителей"),
+        _concept(" степени", "Повторное умножение"),
+        _concept("Корни", "Обратная операция к степени"),
+    ])
+
+    async def fake_generate(topic, language):
+        return bundle
+
+    monkeypatch.setattr(ai_engine, "generate_concepts_and_skills", fake_generate)
+    qdrant_service.set_vector_service(store)
+    try:
+        res = asyncio.run(magic_fill(MagicFillInput(topic_uid="T1", topic_title="Алгебра")))
+    finally:
+        qdrant_service.set_vector_service(None)
+
+    results = res["results"]
+    assert results[0] == {"merged_into": "CN-existing", "title": "Дроби"}
+    assert results[2] == {"merged_into": results[1]["created"], "title": " степени"}
+    assert "created" in results[3]
+    assert len(provider.calls) == 1 and len(provider.calls[0]) == 4
+    assert searches == [4]
+    assert len(store) == 3
+    assert construct._concept_uid("T1", "Степени") == construct._concept_uid("T1", " степени ")
+    assert len({construct._concept_uid("T1", f"Концепт {i}") for i in range(2000)}) == 2000
+    store.close()
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from src.core import migrations
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.log.append(sql.strip().split()[0:3])
+        if sql.startswith("SELECT version FROM schema_migrations"):
+            self.rows = [(v,) for v in sorted(self.conn.done)]
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self.conn.pending.add(params[0])
+
+    def fetchall(self):
+        return self.rows
+
+class FakeConn:
+    def __init__(self):
+        self.autocommit = True
+        self.done = set()
+        self.pending = set()
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.done |= self.pending
+        self.pending = set()
+
+    def rollback(self):
+        self.pending = set()
+
+def test_migrate_applies_pending_versions_once_under_advisory_lock(monkeypatch):
+    conn = FakeConn()
+
+    @contextmanager
+    def fake_pg_conn():
+        yield conn
+
+    monkeypatch.setattr(migrations, "pg_conn", fake_pg_conn)
+    monkeypatch.setattr(migrations, "ensure_schema_version", lambda: None)
+    monkeypatch.setattr(migrations, "_APPLIED_IN_PROCESS", 0)
+    res = migrations.migrate()
+    assert res["applied"] == [m.version for m in migrations.MIGRATIONS]
+    assert conn.done == {m.version for m in migrations.MIGRATIONS}
+    assert conn.log[0][:2] == ["SELECT", "pg_advisory_lock(%s)"]
+    assert conn.log[-1][:2] == ["SELECT", "pg_advisory_unlock(%s)"]
+    assert conn.autocommit is True
+    monkeypatch.setattr(migrations, "_APPLIED_IN_PROCESS", 0)
+    assert migrations.migrate()["applied"] == []
+    assert migrations.CODE_SCHEMA_VERSION == migrations.MIGRATIONS[-1].version
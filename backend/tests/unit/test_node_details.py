@@ -0,0 +1,60 @@
+import src.services.graph.neo4j_repo as repo_mod
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def single(self):
+        return self.row
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def run(self, query, params=None):
+        self.driver.queries.append((query, params))
+        return FakeResult(self.driver.row)
+
+class FakeDriver:
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+        self.closed = False
+
+    def session(self):
+        return FakeSession(self)
+
+    def close(self):
+        self.closed = True
+
+def test_node_details_single_query_grouped(monkeypatch):
+    row = {
+        "props": {"uid": "TOP-1", "title": "T"},
+        "labels": ["Entity", "Topic"],
+        "incoming": [{"rel": "CONTAINS", "count": 1, "items": [{"uid": "SEC-1", "title": "S", "kind": "Section"}]}],
+        "outgoing": [
+            {"rel": "USES_SKILL", "count": 120, "items": [{"uid": f"SK-{i}", "title": None, "kind": "Skill"} for i in range(5)]},
+            {"rel": "PREREQ", "count": 1, "items": [{"uid": "TOP-0", "title": "P", "kind": "Topic"}]},
+        ],
+    }
+    drv = FakeDriver(row)
+    monkeypatch.setattr(repo_mod, "get_driver", lambda: drv)
+    data = repo_mod.get_node_details("TOP-1", limit_per_rel=5)
+    assert len(drv.queries) == 1 and drv.queries[0][1]["lim"] == 5
+    assert drv.closed
+    assert data["kind"] == "Topic"
+    assert data["incoming"] == [{"rel": "CONTAINS", "uid": "SEC-1", "title": "S", "kind": "Section"}]
+    assert len(data["outgoing"]) == 6 and data["outgoing_count"] == 121
+    assert data["outgoing_groups"][0]["count"] == 120
+
+def test_node_details_not_found_closes_driver(monkeypatch):
+    drv = FakeDriver(None)
+    monkeypatch.setattr(repo_mod, "get_driver", lambda: drv)
+    assert repo_mod.get_node_details("NOPE") == {}
+    assert drv.closed
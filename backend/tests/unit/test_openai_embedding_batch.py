@@ -0,0 +1,28 @@
+import json
+import httpx
+from src.services.embeddings import provider as emb
+from src.services.embeddings.provider import OpenAIEmbeddingProvider, split_batches
+
+def test_split_batches_respects_item_and_token_limits():
+    texts = ["a" * 30] * 5
+    assert [(s, len(b)) for s, b in split_batches(texts, max_items=2, max_tokens=10_000)] == [(0, 2), (2, 2), (4, 1)]
+    assert [(s, len(b)) for s, b in split_batches(texts, max_items=100, max_tokens=25)] == [(0, 2), (2, 2), (4, 1)]
+
+def test_openai_provider_batches_retries_and_keeps_order(monkeypatch):
+    calls = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append(body["input"])
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(body["input"])]
+        return httpx.Response(200, json={"data": list(reversed(data))})
+
+    monkeypatch.setattr(emb.time, "sleep", lambda s: None)
+    monkeypatch.setattr(emb, "split_batches", lambda texts: split_batches(texts, max_items=2))
+    p = OpenAIEmbeddingProvider(dim=2, api_key="k", concurrency=1)
+    p._client = httpx.Client(transport=httpx.MockTransport(handler))
+    out = p.embed_texts(["a", "bb", "ccc", "dddd", "eeeee"])
+    assert out == [[1.0, 0.0], [2.0, 0.0], [3.0, 0.0], [4.0, 0.0], [5.0, 0.0]]
+    assert [len(c) for c in calls] == [2, 2, 2, 1]
@@ -3,7 +3,7 @@ from src.services.proposal_service import create_draft_proposal
 from src.db.pg import ensure_tables, get_conn
 from src.workers.commit import commit_proposal
 from src.workers.outbox_publisher import process_once
-from src.events.publisher import get_redis
+from src.events.publisher import get_redis, GRAPH_COMMITTED_STREAM
 import json, uuid
 
 def test_outbox_publisher_publishes_graph_committed():
@@ -19,9 +19,8 @@ def test_outbox_publisher_publishes_graph_committed():
     res = commit_proposal(p.proposal_id)
     assert res["ok"] is True
     r = get_redis()
-    key = "events:graph_committed"
-    before = r.llen(key)
+    before = r.xlen(GRAPH_COMMITTED_STREAM)
     pr = process_once(limit=10)
-    after = r.llen(key)
+    after = r.xlen(GRAPH_COMMITTED_STREAM)
     assert pr["processed"] >= 1
     assert after == before + pr["processed"]
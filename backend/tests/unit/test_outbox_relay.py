@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from src.workers import outbox_publisher
+
+class FakeCursor:
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+class FakeConn:
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+
+    def cursor(self):
+        return FakeCursor(self.rows, self.log)
+
+def _patch(monkeypatch, rows, publish):
+    log = []
+
+    @contextmanager
+    def fake_tx():
+        yield FakeConn(rows, log)
+
+    monkeypatch.setattr(outbox_publisher, "pg_tx", fake_tx)
+    monkeypatch.setattr(outbox_publisher, "publish_graph_committed_many", publish)
+    return log
+
+def test_batch_is_claimed_published_in_one_call_and_marked_with_any(monkeypatch):
+    rows = [("EV-1", "graph_committed", {"v": 1}), ("EV-2", "other", {}), ("EV-3", "graph_committed", {"v": 3})]
+    calls = []
+    log = _patch(monkeypatch, rows, lambda evs: calls.append(list(evs)))
+    assert outbox_publisher.process_once(limit=50) == {"processed": 2}
+    assert calls == [[{"v": 1}, {"v": 3}]]
+    assert "FOR UPDATE SKIP LOCKED" in log[0][0] and log[0][1] == (50,)
+    assert "next_attempt_at" in log[1][0] and log[1][1][0] == "unsupported_event_type" and log[1][1][-1] == ["EV-2"]
+    assert "events_outbox_dead" in log[2][0] and log[2][1] == (["EV-2"], outbox_publisher.OUTBOX_MAX_ATTEMPTS)
+    assert log[3] == ("UPDATE events_outbox SET published=TRUE WHERE event_id = ANY(%s)", (["EV-1", "EV-3"],))
+    assert len(log) == 4
+
+def test_publish_failure_keeps_events_unpublished(monkeypatch):
+    def boom(evs):
+        raise ConnectionError("redis down")
+
+    log = _patch(monkeypatch, [("EV-1", "graph_committed", {})], boom)
+    assert outbox_publisher.process_once(limit=10) == {"processed": 0}
+    assert "next_attempt_at <= LOCALTIMESTAMP" in log[0][0]
+    assert log[1][1][0] == "redis down" and log[1][1][-1] == ["EV-1"]
+    assert "events_outbox_dead" in log[2][0]
+    assert not any("published=TRUE" in sql for sql, _ in log)
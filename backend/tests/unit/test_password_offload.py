@@ -0,0 +1,29 @@
+import asyncio
+import time
+import pytest
+from src.services.auth import passwords
+
+def test_offload_fails_fast_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_EXECUTOR", "thread")
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_MAX_PENDING", 2)
+    monkeypatch.setattr(passwords, "_executor", None)
+
+    async def main():
+        results = await asyncio.gather(*(passwords._offload(time.sleep, 0.05) for _ in range(3)), return_exceptions=True)
+        return results
+
+    results = asyncio.run(main())
+    assert sum(isinstance(r, passwords.PasswordHasherBusy) for r in results) == 1
+    assert passwords.pending() == 0
+    passwords.shutdown_executor()
+
+def test_hash_and_verify_roundtrip_in_process_pool(monkeypatch):
+    monkeypatch.setattr(passwords, "_executor", None)
+
+    async def main():
+        h = await passwords.hash_password_async("s3cret")
+        return h, await passwords.verify_password_async("s3cret", h), await passwords.verify_password_async("nope", h)
+
+    h, ok, bad = asyncio.run(main())
+    passwords.shutdown_executor()
+    assert h.startswith("$2") and ok is True and bad is False
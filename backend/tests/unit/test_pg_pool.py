@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import pytest
+from psycopg2 import extensions as pg_ext
+from src.db import pool as pool_mod
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.status = pg_ext.TRANSACTION_STATUS_IDLE
+        self.commits = 0
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+        self.status = pg_ext.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = pg_ext.TRANSACTION_STATUS_IDLE
+
+class FakeThreadedPool:
+    def __init__(self, minconn, maxconn, dsn):
+        self._pool = []
+        self.created = 0
+        self.discarded = 0
+
+    def getconn(self):
+        if self._pool:
+            return self._pool.pop()
+        self.created += 1
+        return FakeConn()
+
+    def putconn(self, conn, close=False):
+        if close:
+            self.discarded += 1
+        else:
+            self._pool.append(conn)
+
+    def closeall(self):
+        self._pool.clear()
+
+@pytest.fixture
+def pg(monkeypatch):
+    monkeypatch.setattr(pool_mod, "ThreadedConnectionPool", FakeThreadedPool)
+    p = pool_mod.PgPool("postgresql://fake", minconn=0, maxconn=2, timeout=0.05)
+    monkeypatch.setattr(pool_mod, "get_pool", lambda: p)
+    return p
+
+def test_connections_are_reused_and_saturation_times_out(pg):
+    for _ in range(5):
+        with pool_mod.pg_conn() as conn:
+            assert conn.autocommit is True
+    assert pg._pool.created == 1
+    with pg.connection(), pg.connection():
+        assert pg.stats()["in_use"] == 2
+        with pytest.raises(pool_mod.PoolTimeout):
+            with pg.connection():
+                pass
+    assert pg.stats()["in_use"] == 0
+
+def test_tx_commits_or_rolls_back_and_drops_broken_connections(pg):
+    with pool_mod.pg_tx() as conn:
+        conn.status = pg_ext.TRANSACTION_STATUS_INTRANS
+    assert conn.commits == 1 and conn.autocommit is False
+    with pytest.raises(ValueError):
+        with pool_mod.pg_tx() as conn:
+            conn.status = pg_ext.TRANSACTION_STATUS_INTRANS
+            raise ValueError("boom")
+    assert conn.rollbacks == 1
+    with pool_mod.pg_conn() as conn:
+        conn.closed = 1
+    assert pg._pool.discarded == 1
+
+def test_async_facade_bounds_concurrency(monkeypatch):
+    monkeypatch.setattr(pool_mod, "PG_POOL_MAX_SIZE", 2)
+    pool_mod._ASYNC_SLOTS.clear()
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work(i):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        threading.Event().wait(0.01)
+        with lock:
+            active["now"] -= 1
+        return i
+
+    async def main():
+        return await asyncio.gather(*(pool_mod.pg_async(work, i) for i in range(8)))
+
+    assert asyncio.run(main()) == list(range(8))
+    assert active["peak"] <= 2
@@ -0,0 +1,76 @@
+import jwt
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from src.api import deps
+from src.config.settings import settings
+from src.core.context import extract_tenant_id_from_request
+from src.services.auth import principal_cache
+from src.services.auth.users_repo import User
+
+SECRET = "test-secret"
+
+def _token(**claims):
+    return jwt.encode({"sub": "7", "type": "access", "tenant_id": "acme", **claims}, SECRET, algorithm="HS256")
+
+def test_token_decoded_once_and_user_served_from_cache(monkeypatch):
+    monkeypatch.setattr(settings.jwt_secret_key, "get_secret_value", lambda: SECRET)
+    decodes = {"n": 0}
+    real_decode = jwt.decode
+
+    def counting_decode(*a, **k):
+        decodes["n"] += 1
+        return real_decode(*a, **k)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    loads = {"n": 0}
+
+    def loader(uid):
+        loads["n"] += 1
+        return User(id=uid, email="a@b.c", password_hash="x", role="admin", is_active=True)
+
+    principal_cache.user_cache.clear()
+    monkeypatch.setattr(deps, "get_cached_user", lambda uid: principal_cache.get_cached_user(uid, loader=loader))
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def tenant_mw(request, call_next):
+        request.state.tid = extract_tenant_id_from_request(request)
+        return await call_next(request)
+
+    @app.get("/x")
+    def x(request: Request, user=Depends(deps.require_admin)):
+        return {"uid": user.id, "tid": request.state.tid}
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {_token()}"}
+    for _ in range(3):
+        assert client.get("/x", headers=headers).json() == {"uid": 7, "tid": "acme"}
+    assert decodes["n"] == 3
+    assert loads["n"] == 1
+
+    principal_cache._handle_message({"type": "message", "data": b"7"})
+    client.get("/x", headers=headers)
+    assert loads["n"] == 2
+
+def test_user_cache_is_bounded_and_expires():
+    c = principal_cache.UserCache(maxsize=2, ttl_sec=60)
+    for i in range(3):
+        c.put(User(id=i, email="", password_hash="", role="user", is_active=True))
+    assert len(c) == 2 and c.get(0) is None and c.get(2) is not None
+    c.ttl_sec = -1
+    c.put(User(id=5, email="", password_hash="", role="user", is_active=True))
+    assert c.get(5) is None
+
+def test_tokens_are_rejected_when_secret_is_not_configured(monkeypatch):
+    monkeypatch.setattr(settings.jwt_secret_key, "get_secret_value", lambda: "")
+    monkeypatch.setattr(deps, "get_cached_user", lambda uid: User(id=uid, email="a@b.c", password_hash="x", role="admin", is_active=True))
+    app = FastAPI()
+
+    @app.get("/x")
+    def x(user=Depends(deps.require_admin)):
+        return {"uid": user.id}
+
+    forged = jwt.encode({"sub": "1", "type": "access"}, "", algorithm="HS256")
+    res = TestClient(app).get("/x", headers={"Authorization": f"Bearer {forged}"})
+    assert res.status_code == 401
@@ -1,9 +1,9 @@
 from src.db.pg import ensure_schema_version, set_tenant_schema_version
-from src.core.migrations import check_and_gatekeep
+from src.core.migrations import CODE_SCHEMA_VERSION, check_and_gatekeep
 
 def test_schema_gatekeeper_tenant():
     ensure_schema_version()
     set_tenant_schema_version("acme", 0)
     assert check_and_gatekeep("acme") is False
-    set_tenant_schema_version("acme", 2)
+    set_tenant_schema_version("acme", CODE_SCHEMA_VERSION)
     assert check_and_gatekeep("acme") is True
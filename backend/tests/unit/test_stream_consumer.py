@@ -0,0 +1,71 @@
+import json
+import pytest
+from src.events.consumer import StreamConsumer
+
+class FakePipe:
+    def __init__(self, r):
+        self.r = r
+        self.ops = []
+
+    def xadd(self, stream, fields):
+        self.ops.append(lambda: self.r.dead.append((stream, fields)))
+
+    def xack(self, stream, group, *ids):
+        self.ops.append(lambda: self.r.xack(stream, group, *ids))
+
+    def execute(self):
+        for op in self.ops:
+            op()
+
+class FakeRedis:
+    def __init__(self, fresh, stalled, delivered):
+        self.fresh = fresh
+        self.stalled = stalled
+        self.delivered = delivered
+        self.acked = []
+        self.dead = []
+
+    def xgroup_create(self, *a, **k):
+        pass
+
+    def xautoclaim(self, stream, group, consumer, min_idle, start_id="0-0", count=None):
+        return [b"0-0", self.stalled]
+
+    def xpending_range(self, stream, group, min, max, count, consumername=None):
+        return [{"message_id": mid, "times_delivered": self.delivered[mid]} for mid, _ in self.stalled]
+
+    def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        return [(b"s", self.fresh[:count])]
+
+    def xack(self, stream, group, *ids):
+        self.acked.extend(ids)
+
+    def pipeline(self, transaction=False):
+        return FakePipe(self)
+
+def _msg(mid, ev):
+    return (mid, {b"data": json.dumps(ev).encode()})
+
+def test_consume_reclaims_stalled_dead_letters_poison_and_acks_batch():
+    r = FakeRedis(
+        fresh=[_msg(b"3-0", {"n": 3}), (b"4-0", {b"data": b"not json"})],
+        stalled=[_msg(b"1-0", {"n": 1}), _msg(b"2-0", {"n": 2}), (b"0-5", None)],
+        delivered={b"1-0": 2, b"2-0": 9, b"0-5": 1},
+    )
+    seen = []
+    c = StreamConsumer("vector-sync", consumer="c1", stream="s", count=10, block_ms=None, max_deliveries=5, r=r)
+    assert c.consume(lambda evs: seen.extend(evs) or len(evs)) == 2
+    assert seen == [{"n": 1}, {"n": 3}]
+    assert [f[b"source_id"] for _, f in r.dead] == [b"2-0"]
+    assert sorted(r.acked) == [b"0-5", b"1-0", b"2-0", b"3-0", b"4-0"]
+
+def test_failed_handler_leaves_batch_pending():
+    r = FakeRedis(fresh=[_msg(b"1-0", {"n": 1})], stalled=[], delivered={})
+    c = StreamConsumer("vector-sync", consumer="c1", stream="s", block_ms=None, r=r)
+
+    def boom(evs):
+        raise RuntimeError("qdrant down")
+
+    with pytest.raises(RuntimeError):
+        c.consume(boom)
+    assert r.acked == []
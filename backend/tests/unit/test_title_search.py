@@ -0,0 +1,52 @@
+from src.services.search import title_search
+from src.services.search.title_search import KbTitleIndex, build_lucene_query, fulltext_index_statements
+
+ENTRIES = [
+    {"uid": "TOP-1", "type": "Topic", "title": "Линейные уравнения", "text": "Решение уравнений с одной переменной"},
+    {"uid": "TOP-2", "type": "Topic", "title": "Квадратные уравнения", "text": "Дискриминант"},
+    {"uid": "SKL-1", "type": "Skill", "title": "Решение линейных уравнений", "text": ""},
+    {"uid": "TOP-3", "type": "Topic", "title": "Линейная функция", "text": "", "tenant_id": "other"},
+]
+
+def test_lucene_query_escapes_and_prefixes():
+    assert build_lucene_query("линейн") == "title:(линейн)^2 OR (линейн)"
+    assert build_lucene_query("Линейные ур", prefix=True) == "title:(линейные AND ур*)^2 OR (линейные AND ур*)"
+    assert build_lucene_query("(+) ~ :") == ""
+    assert all("IF NOT EXISTS" in s for s in fulltext_index_statements())
+
+def test_kb_index_ranks_title_matches_and_filters():
+    idx = KbTitleIndex(ENTRIES)
+    res = idx.search("уравнения", limit=10)
+    assert [r["uid"] for r in res] == ["TOP-2", "TOP-1"]
+    assert [r["uid"] for r in idx.search("уравнения", labels=["skill"])] == []
+    assert idx.search("линейн", prefix=False) == []
+
+def test_kb_index_prefix_autocomplete_and_tenant_scope():
+    idx = KbTitleIndex(ENTRIES)
+    uids = [r["uid"] for r in idx.search("линейн", prefix=True, limit=10)]
+    assert uids[0] in ("TOP-1", "TOP-3")
+    assert set(uids) == {"TOP-1", "SKL-1", "TOP-3"}
+    scoped = [r["uid"] for r in idx.search("линейн", prefix=True, tenant_id="acme", limit=10)]
+    assert "TOP-3" not in scoped and "TOP-1" in scoped
+
+def test_fulltext_limit_applies_after_tenant_filter(monkeypatch):
+    # у чужого арендатора больше совпадений по тому же префиксу и они выше по score
+    nodes = [{"uid": f"OTH-{i}", "tenant_id": "other", "score": 10.0 - i} for i in range(5)]
+    nodes += [{"uid": f"ACME-{i}", "tenant_id": "acme", "score": 1.0 - i / 10} for i in range(3)]
+
+    class FakeRepo:
+        def __init__(self, max_retries=None):
+            pass
+
+        def read(self, query, params):
+            assert "{limit: $fetch}" in query
+            hits = sorted(nodes, key=lambda n: -n["score"])[: params["fetch"]]
+            hits = [n for n in hits if n["tenant_id"] in (None, params["tid"])]
+            return [{"uid": n["uid"], "type": "Topic", "title": "Линейные уравнения", "score": n["score"]} for n in hits][: params["limit"]]
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(title_search, "Neo4jRepo", FakeRepo)
+    res = title_search._fulltext_search("линейн", ["Topic"], "acme", 2, prefix=True)
+    assert [r["uid"] for r in res] == ["ACME-0", "ACME-1"]
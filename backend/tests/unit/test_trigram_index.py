@@ -0,0 +1,48 @@
+from src.services.search import trigram
+from src.services.search.trigram import TrigramIndex, fuzzy_search, trigrams
+
+ENTRIES = [
+    {"uid": "TOP-LOG", "type": "Topic", "title": "Логарифмы"},
+    {"uid": "TOP-LIN", "type": "Topic", "title": "Линейные уравнения"},
+    {"uid": "SKL-LIN", "type": "Skill", "title": "Решение линейных уравнений"},
+    {"uid": "TOP-PY", "type": "Topic", "title": "Python basics"},
+]
+
+def test_trigrams_are_word_padded():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+    assert trigrams("") == set()
+
+def test_cyrillic_query_with_typo():
+    idx = TrigramIndex(ENTRIES)
+    res = idx.search("логарифм", limit=3)
+    assert res[0]["uid"] == "TOP-LOG"
+
+def test_latin_transliteration_matches_cyrillic_title():
+    idx = TrigramIndex(ENTRIES)
+    assert idx.search("logarifmy", limit=1)[0]["uid"] == "TOP-LOG"
+    assert idx.search("lineinye uravneniya", limit=1)[0]["uid"] == "TOP-LIN"
+
+def test_label_filter_and_entity_dedup():
+    idx = TrigramIndex(ENTRIES)
+    res = idx.search("линейные уравнения", labels=["Skill"], limit=5)
+    assert [r["uid"] for r in res] == ["SKL-LIN"]
+    uids = [r["uid"] for r in idx.search("линейные уравнения", limit=5)]
+    assert len(uids) == len(set(uids))
+    assert idx.search("zzzz") == []
+
+def test_kb_fallback_is_tenant_scoped(monkeypatch):
+    entries = [
+        {"uid": "TOP-A", "type": "Topic", "title": "Логарифмы", "tenant_id": "acme"},
+        {"uid": "TOP-B", "type": "Topic", "title": "Логарифмы", "tenant_id": "other"},
+        {"uid": "TOP-S", "type": "Topic", "title": "Логарифмы", "tenant_id": None},
+    ]
+    monkeypatch.setattr(trigram, "neo4j_configured", lambda: False)
+    monkeypatch.setattr(trigram, "load_kb_entries", lambda: entries)
+    monkeypatch.setattr(trigram, "read_graph_version", lambda tid: 0)
+    monkeypatch.setattr(trigram, "kb_signature", lambda: "sig")
+    trigram.invalidate()
+    try:
+        assert {r["uid"] for r in fuzzy_search("логарифмы", tenant_id="acme")["items"]} == {"TOP-A", "TOP-S"}
+        assert {r["uid"] for r in fuzzy_search("логарифмы", tenant_id="other")["items"]} == {"TOP-B", "TOP-S"}
+    finally:
+        trigram.invalidate()
@@ -0,0 +1,90 @@
+import asyncio
+import importlib
+import sys
+from types import SimpleNamespace
+import qdrant_client
+from src.services.embeddings.provider import HashEmbeddingProvider
+
+def test_import_does_not_touch_qdrant(monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("QdrantClient created at import time")
+    monkeypatch.setattr(qdrant_client, "QdrantClient", boom)
+    # модуль возвращается в sys.modules после теста: другие тесты держат ссылки на исходный
+    monkeypatch.delitem(sys.modules, "src.services.vector.qdrant_service", raising=False)
+    mod = importlib.import_module("src.services.vector.qdrant_service")
+    assert mod.get_vector_service().last_health["ok"] is None
+
+class FakeQdrant:
+    def __init__(self, existing=()):
+        self.collections = {name: dim for name, dim in existing}
+        self.calls = []
+
+    def get_collections(self):
+        self.calls.append("get_collections")
+        return SimpleNamespace(collections=[SimpleNamespace(name=n) for n in self.collections])
+
+    def get_collection(self, name):
+        self.calls.append("get_collection")
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(vectors=SimpleNamespace(size=self.collections[name]))))
+
+    def create_collection(self, collection_name, vectors_config):
+        self.collections[collection_name] = vectors_config.size
+
+    def upsert(self, collection_name, points):
+        self.calls.append(("upsert", collection_name, len(points)))
+
+def test_service_creates_configured_collection_once():
+    from src.services.vector.qdrant_service import VectorService, embed_texts, set_vector_service, upsert_concept
+    client = FakeQdrant()
+    svc = VectorService(collection="concepts_ut", dim=8, client=client, provider=HashEmbeddingProvider(8))
+    set_vector_service(svc)
+    try:
+        assert svc.health()["ok"] is True
+        assert client.collections == {"concepts_ut": 8}
+        vecs = asyncio.run(embed_texts(["a", "b"]))
+        asyncio.run(upsert_concept("00000000-0000-0000-0000-000000000001", "a", "def", vecs[0]))
+        assert client.calls.count("get_collections") == 1
+        assert ("upsert", "concepts_ut", 1) in client.calls
+    finally:
+        set_vector_service(None)
+
+def test_health_reports_dim_mismatch_without_recreating():
+    from src.services.vector.qdrant_service import VectorService
+    client = FakeQdrant(existing=[("concepts_ut", 1536)])
+    svc = VectorService(collection="concepts_ut", dim=8, client=client)
+    res = svc.health()
+    assert res["ok"] is True and res["dim"] == 1536
+    assert client.collections == {"concepts_ut": 1536}
+
+def test_search_uses_query_points_and_falls_back_to_search():
+    from src.services.vector.qdrant_service import VectorService, point_id
+    hit = SimpleNamespace(id=point_id("C-1"), score=0.9, payload={"uid": "C-1"})
+
+    class NewClient(FakeQdrant):
+        def query_points(self, collection_name, query, limit, with_payload):
+            return SimpleNamespace(points=[hit])
+
+    class OldClient(FakeQdrant):
+        def search(self, collection_name, query_vector, limit, with_payload):
+            return [hit]
+
+    for client in (NewClient([("c", 4)]), OldClient([("c", 4)])):
+        svc = VectorService(collection="c", dim=4, client=client)
+        assert svc.search([0.1, 0.2, 0.3, 0.4], top_k=1) == [("C-1", 0.9)]
+
+def test_qdrant_backend_requires_api_key_but_local_index_falls_back_to_hash(monkeypatch, tmp_path):
+    import pytest
+    from pydantic import SecretStr
+    from src.config.settings import settings
+    from src.services.vector.local_index import LocalVectorIndex
+    from src.services.vector.qdrant_service import VectorService
+    monkeypatch.setattr(settings, "openai_api_key", SecretStr(""))
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("EMBEDDINGS_DIM", "16")
+    with pytest.raises(RuntimeError):
+        VectorService(collection="c", dim=8, client=FakeQdrant()).provider
+    idx = LocalVectorIndex(path=str(tmp_path), dim=8)
+    try:
+        assert isinstance(idx.provider, HashEmbeddingProvider) and len(idx.provider.embed_text("x")) == 8
+    finally:
+        idx.close()
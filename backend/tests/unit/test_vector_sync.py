@@ -4,9 +4,12 @@ import uuid, json
 
 def test_consume_graph_committed_no_targets():
     r = get_redis()
-    r.lpush("events:graph_committed", json.dumps({"tenant_id":"t-"+uuid.uuid4().hex[:6]}))
-    res = consume_graph_committed()
+    stream = "events:test:" + uuid.uuid4().hex[:8]
+    r.xadd(stream, {"data": json.dumps({"tenant_id":"t-"+uuid.uuid4().hex[:6]})})
+    res = consume_graph_committed(stream=stream)
     assert res["processed"] == 0
+    assert r.xpending(stream, "vector-sync")["pending"] == 0
+    r.delete(stream)
 
 def test_consume_graph_committed_with_targets():
     r = get_redis()
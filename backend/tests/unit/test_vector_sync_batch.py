@@ -0,0 +1,42 @@
+from src.services.embeddings.provider import HashEmbeddingProvider
+from src.workers import vector_sync
+
+class FakeQdrant:
+    def __init__(self):
+        self.upserts = []
+        self.deleted = []
+
+    def upsert(self, collection_name, points):
+        self.upserts.append(points)
+
+    def delete(self, collection_name, points_selector):
+        self.deleted.extend(points_selector.points)
+
+def test_sync_events_dedupes_targets_and_uses_stable_point_ids(monkeypatch):
+    fake = FakeQdrant()
+    fetched = []
+
+    def fake_nodes(keys):
+        fetched.append(list(keys))
+        return {("t1", "A"): {"name": "Alpha"}, ("t2", "A"): {"title": "Other"}}
+
+    monkeypatch.setattr(vector_sync, "_qdrant", lambda: fake)
+    monkeypatch.setattr(vector_sync, "_collection_dim", lambda client, collection: 16)
+    monkeypatch.setattr(vector_sync, "nodes_by_uids", fake_nodes)
+    monkeypatch.setattr(vector_sync, "get_provider", lambda dim_default: HashEmbeddingProvider(dim_default))
+    monkeypatch.setattr(vector_sync, "VECTOR_SYNC_UPSERT_BATCH", 1)
+    events = [
+        {"tenant_id": "t1", "targets": ["A", "MISSING"]},
+        {"tenant_id": "t1", "targets": ["A"]},
+        {"tenant_id": "t2", "targets": ["A"]},
+        {"targets": ["X"]},
+    ]
+    assert vector_sync.sync_events(events) == 2
+    assert fetched == [[("t1", "A"), ("t1", "MISSING"), ("t2", "A")]]
+    # не найденный в графе узел пропускается, а его точка не удаляется
+    assert fake.deleted == []
+    points = [p for batch in fake.upserts for p in batch]
+    assert len(fake.upserts) == 2
+    assert [p.id for p in points] == [vector_sync.point_id("t1", "A"), vector_sync.point_id("t2", "A")]
+    assert [p.payload["name"] for p in points] == ["Alpha", "Other"]
+    assert vector_sync.point_id("t1", "A") == vector_sync.point_id("t1", "A") != vector_sync.point_id("t2", "A")
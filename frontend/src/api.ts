@@ -97,6 +97,10 @@ export type NodeDetails = {
   labels?: string[]
   incoming: Array<{ rel: string; uid: string; title?: string }>
   outgoing: Array<{ rel: string; uid: string; title?: string }>
+  incoming_groups?: Array<{ rel: string; count: number; items: Array<{ uid: string; title?: string; kind?: string }> }>
+  outgoing_groups?: Array<{ rel: string; count: number; items: Array<{ uid: string; title?: string; kind?: string }> }>
+  incoming_count?: number
+  outgoing_count?: number
   [key: string]: unknown
 }
 
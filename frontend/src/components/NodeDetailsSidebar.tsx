@@ -104,7 +104,7 @@ export function NodeDetailsSidebar({ uid, onClose, onAskAI }: Props) {
             <div style={{ fontSize: 13, fontWeight: 600, marginBottom: 8, color: '#2ec4b6' }}>Свойства</div>
             <div style={{ display: 'flex', flexDirection: 'column', gap: 6 }}>
               {Object.entries(data)
-                .filter(([k]) => !['uid', 'title', 'kind', 'labels', 'incoming', 'outgoing'].includes(k))
+                .filter(([k]) => !['uid', 'title', 'kind', 'labels', 'incoming', 'outgoing', 'incoming_groups', 'outgoing_groups', 'incoming_count', 'outgoing_count'].includes(k))
                 .map(([k, v]) => (
                   <div key={k} style={{ fontSize: 12, display: 'flex', justifyContent: 'space-between' }}>
                     <span style={{ color: 'var(--muted)' }}>{k}:</span>